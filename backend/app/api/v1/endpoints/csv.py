@@ -1,17 +1,45 @@
-import os
+import json
+import time
 from datetime import datetime
-from typing import List
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from fastapi.responses import JSONResponse
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query, Header
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 
 from app.schemas.csv import (
     CSVUploadResponse, 
+    CSVAppendResponse,
+    DatasetInfo,
+    FileListResponse,
     AnalysisRequest, 
     AnalysisResponse, 
+    BatchAnalysisRequest,
+    BatchAnalysisItem,
+    BatchAnalysisResponse,
+    CacheStatsResponse,
+    AnswerCacheStatsResponse,
+    CodeStoreStatsResponse,
+    CatalogStatsResponse,
+    ResultStoreStatsResponse,
+    SearchIndexStatsResponse,
     ErrorResponse
 )
-from app.utils.csv_handler import CSVHandler
-from app.utils.langchain_service import LangChainService
+from app.utils.csv_handler import CSVHandler, SavedUpload
+from app.utils.dataframe_cache import dataframe_cache
+from app.utils.answer_cache import answer_cache
+from app.utils.code_store import code_store
+from app.utils.worker_pool import worker_pool
+from app.utils.insight_jobs import insight_jobs
+from app.utils.large_files import large_files
+from app.utils.llm_gateway import llm_gateway
+from app.utils.catalog import catalog, Blob, DatasetEntry
+from app.utils.search_index import search_indexes
+from app.utils.result_store import (
+    result_store, encode_json, encode_arrow, choose_encoding, compress, ARROW_MEDIA_TYPE
+)
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from app.utils.langchain_service import LangChainService
 
 router = APIRouter()
 
@@ -25,10 +53,14 @@ def get_langchain_service():
     """Dependency to get LangChain service."""
     global langchain_service
     if langchain_service is None:
-        try:
-            langchain_service = LangChainService()
-        except ValueError as e:
-            raise HTTPException(status_code=500, detail=str(e))
+        with llm_gateway.import_lock:
+            if langchain_service is None:
+                try:
+                    # Imported here so LangChain loads with the first analysis or warm-up, not at startup
+                    from app.utils.langchain_service import LangChainService
+                    langchain_service = LangChainService()
+                except ValueError as e:
+                    raise HTTPException(status_code=500, detail=str(e))
     return langchain_service
 
 
@@ -39,18 +71,46 @@ async def upload_csv(file: UploadFile = File(...)):
         # Validate file
         csv_handler.validate_file(file)
         
-        # Save file
-        file_path = await csv_handler.save_file(file)
+        # Stream file to a fresh object path, hashing it as it arrives
+        saved = await csv_handler.save_file(file, catalog.new_object_path())
         
-        # Read CSV and get info
-        df = csv_handler.read_csv(file_path)
-        rows, columns = csv_handler.get_csv_info(df)
+        # Same order as appends: the filename, so an append can't interleave with its replacement,
+        # then the content, so it is stored and processed once and not collected while assigned
+        async with catalog.lock(f"file:{file.filename}"):
+            previous = catalog.get(file.filename)
+            async with catalog.lock(saved.sha256):
+                blob = catalog.get_blob(saved.sha256)
+                deduplicated = blob is not None
+                if deduplicated:
+                    # Already stored and processed: drop the copy and reuse what was learned
+                    csv_handler.delete_file(saved.file_path)
+                    catalog.deduplicated_uploads += 1
+                else:
+                    try:
+                        blob = await process_upload(saved)
+                    except BaseException:
+                        csv_handler.delete_file(saved.file_path)
+                        raise
+                entry = catalog.assign(file.filename, blob.sha256)
+            
+            # The replaced content goes once nothing points at it, after the new content's lock is released
+            if previous and previous.blob.sha256 != blob.sha256:
+                await catalog.collect(previous.blob.sha256)
+        
+        # Generate insights in the background so the first dashboard view is served from storage
+        if settings.insights_precompute_on_upload:
+            await insight_jobs.submit(file.filename, blob.file_path, settings.insights_precompute_priority)
         
         return CSVUploadResponse(
             filename=file.filename,
-            size=file.size or 0,
-            rows=rows,
-            columns=columns,
+            size=blob.size,
+            rows=blob.rows,
+            columns=blob.columns,
+            memory_bytes_before=blob.memory_bytes_before,
+            memory_bytes_after=blob.memory_bytes_after,
+            large_file=blob.large_file,
+            version=entry.version,
+            deduplicated=deduplicated,
             message="File uploaded successfully"
         )
         
@@ -60,28 +120,168 @@ async def upload_csv(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Error uploading file: {str(e)}")
 
 
+async def process_upload(saved: SavedUpload) -> Blob:
+    """Parse, convert and profile a newly stored content, and record it in the catalog."""
+    large_file = large_files.is_large(saved.file_path)
+    memory_bytes_before = memory_bytes_after = None
+    if large_file:
+        # Never loaded whole: build the stratified sample (which also profiles the file) in chunks
+        await worker_pool.run("load_sample", large_files.get_sample, saved.file_path)
+        rows, columns = saved.rows, saved.columns
+    else:
+        # Parse once, convert to a columnar sidecar and profile it for later reads
+        df = await worker_pool.run("read_csv", csv_handler.read_csv, saved.file_path)
+        # Infer and store a compact schema, then keep the frame cast to it
+        optimized = await worker_pool.run("optimize_dtypes", csv_handler.optimize_dtypes, saved.file_path, df)
+        df = optimized.df
+        await worker_pool.run("write_columnar", csv_handler.write_columnar, saved.file_path, df)
+        await worker_pool.run("profile", csv_handler.get_profile, saved.file_path, df)
+        if settings.search_index_on_upload:
+            # Index text columns now and store the indexes, so lookups in any process never scan the new file
+            await worker_pool.run("build_search_index", csv_handler.write_search_index, saved.file_path, df)
+        rows, columns = csv_handler.get_csv_info(df)
+        memory_bytes_before, memory_bytes_after = optimized.memory_bytes_before, optimized.memory_bytes_after
+    
+    return catalog.add_blob(Blob(
+        sha256=saved.sha256,
+        file_path=saved.file_path,
+        size=saved.size,
+        rows=rows,
+        columns=columns,
+        schema=csv_handler.read_schema(saved.file_path),
+        large_file=large_file,
+        memory_bytes_before=memory_bytes_before,
+        memory_bytes_after=memory_bytes_after
+    ))
+
+
+@router.post("/{filename}/append", response_model=CSVAppendResponse)
+async def append_csv(filename: str, file: UploadFile = File(...)):
+    """Append rows to an uploaded CSV file without re-ingesting what is already stored."""
+    try:
+        # Check if file exists
+        catalog.get_path(filename)
+        
+        # Validate file
+        csv_handler.validate_file(file)
+        
+        # Appends to one file run one at a time so parts and profiles stay in order
+        async with catalog.lock(f"file:{filename}"):
+            entry = catalog.get(filename)
+            if entry is None:
+                raise HTTPException(status_code=404, detail="File not found")
+            
+            # Uploads of the content being changed wait, so none is pointed at it mid-append
+            async with catalog.lock(entry.blob.sha256):
+                file_path = entry.blob.file_path
+                if catalog.is_shared(entry.blob.sha256):
+                    # Other filenames keep the stored content; this one gets its own copy
+                    file_path = await worker_pool.run(
+                        "copy_file", csv_handler.copy_file, file_path, catalog.new_object_path()
+                    )
+                
+                try:
+                    delta = await csv_handler.receive_append(file_path, file)
+                    appended = await worker_pool.run("append", csv_handler.append_file, file_path, delta)
+                except BaseException:
+                    if file_path != entry.blob.file_path:
+                        csv_handler.delete_file(file_path)
+                    raise
+                
+                # Versions chain, so the appended content is keyed by the hash append_file recorded
+                entry = catalog.record_append(filename, entry.blob.sha256, Blob(
+                    sha256=csv_handler.read_metadata(file_path)["sha256"],
+                    file_path=file_path,
+                    size=appended.size,
+                    rows=appended.rows,
+                    columns=appended.columns,
+                    schema=csv_handler.read_schema(file_path),
+                    large_file=large_files.is_large(file_path)
+                ))
+        
+        return CSVAppendResponse(
+            filename=filename,
+            appended_rows=appended.appended_rows,
+            rows=appended.rows,
+            size=appended.size,
+            columns=appended.columns,
+            version=entry.version,
+            message="Rows appended successfully"
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error appending to file: {str(e)}")
+
+
 @router.post("/analyze", response_model=AnalysisResponse)
 async def analyze_csv(
     request: AnalysisRequest,
-    langchain_service: LangChainService = Depends(get_langchain_service)
+    langchain_service: "LangChainService" = Depends(get_langchain_service)
 ):
     """Analyze uploaded CSV file with user query."""
     try:
         # Check if file exists
-        file_path = os.path.join("uploads", request.filename)
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=404, detail="File not found")
+        file_path = catalog.get_path(request.filename)
+        
+        if large_files.is_large(file_path):
+            # Answered out of core, or from a sample
+            analysis_result = await langchain_service.analyze_large_file(file_path, request.query, request.approximate)
+            return build_analysis_response(request, analysis_result)
         
         # Read CSV
-        df = csv_handler.read_csv(file_path)
+        df = await worker_pool.run("read_csv", csv_handler.read_csv, file_path)
         
         # Perform analysis
-        analysis_result = await langchain_service.analyze_csv(df, request.query)
+        analysis_result = await langchain_service.analyze_csv(df, request.query, file_path)
+        
+        return build_analysis_response(request, analysis_result)
         
-        return AnalysisResponse(
-            query=request.query,
-            analysis=analysis_result,
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error analyzing file: {str(e)}")
+
+
+@router.post("/analyze/batch", response_model=BatchAnalysisResponse)
+async def analyze_csv_batch(
+    request: BatchAnalysisRequest,
+    langchain_service: "LangChainService" = Depends(get_langchain_service)
+):
+    """Answer many queries about one uploaded CSV file, loading it once."""
+    try:
+        if len(request.queries) > settings.batch_max_queries:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Too many queries. Maximum per batch: {settings.batch_max_queries}"
+            )
+        
+        # Check if file exists
+        file_path = catalog.get_path(request.filename)
+        
+        started = time.perf_counter()
+        
+        if large_files.is_large(file_path):
+            analysis_results = await langchain_service.analyze_large_file_batch(
+                file_path, request.queries, request.approximate, request.concurrency
+            )
+        else:
+            # Read CSV once for the whole batch
+            df = await worker_pool.run("read_csv", csv_handler.read_csv, file_path)
+            
+            # Perform analysis
+            analysis_results = await langchain_service.analyze_batch(
+                df, request.queries, file_path, request.concurrency
+            )
+        
+        return BatchAnalysisResponse(
             filename=request.filename,
+            results=[
+                BatchAnalysisItem(query=query, **analysis_result)
+                for query, analysis_result in zip(request.queries, analysis_results)
+            ],
+            total_seconds=time.perf_counter() - started,
             timestamp=datetime.now().isoformat()
         )
         
@@ -91,33 +291,207 @@ async def analyze_csv(
         raise HTTPException(status_code=500, detail=f"Error analyzing file: {str(e)}")
 
 
-@router.get("/files", response_model=List[str])
-async def list_files():
-    """List all uploaded CSV files."""
+@router.post("/analyze/stream")
+async def analyze_csv_stream(
+    request: AnalysisRequest,
+    langchain_service: "LangChainService" = Depends(get_langchain_service)
+):
+    """Analyze uploaded CSV file, streaming progress as Server-Sent Events."""
+    # Check if file exists
+    file_path = catalog.get_path(request.filename)
+    
+    # Read CSV before streaming starts so errors still get a status code
+    large_file = large_files.is_large(file_path)
+    if not large_file:
+        df = await worker_pool.run("read_csv", csv_handler.read_csv, file_path)
+    
+    async def event_stream():
+        yield format_sse("started", {"query": request.query, "filename": request.filename})
+        try:
+            if large_file:
+                # Large files have no intermediate events, just the result
+                analysis_result = await langchain_service.analyze_large_file(file_path, request.query, request.approximate)
+                yield format_sse("result", build_analysis_response(request, analysis_result).model_dump())
+                return
+            
+            async for event, data in langchain_service.analyze_csv_events(
+                df, request.query, file_path, stream_tokens=True
+            ):
+                if event == "result":
+                    data = build_analysis_response(request, data).model_dump()
+                yield format_sse(event, data)
+        except HTTPException as e:
+            yield format_sse("error", {"status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            yield format_sse("error", {"status_code": 500, "detail": f"Error analyzing file: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def build_analysis_response(request: AnalysisRequest, analysis_result: Dict[str, Any]) -> AnalysisResponse:
+    """Build the API response from a LangChainService analysis result."""
+    return AnalysisResponse(
+        query=request.query,
+        analysis=analysis_result["analysis"],
+        filename=request.filename,
+        timestamp=datetime.now().isoformat(),
+        execution=analysis_result.get("execution"),
+        source=analysis_result.get("source", "llm"),
+        prompt_tokens=analysis_result.get("prompt_tokens"),
+        approximate=analysis_result.get("approximate", False),
+        approximate_reason=analysis_result.get("approximate_reason"),
+        sample_rows=analysis_result.get("sample_rows"),
+        total_rows=analysis_result.get("total_rows"),
+        error_bounds=analysis_result.get("error_bounds"),
+        result_id=analysis_result.get("result_id"),
+        result_rows=analysis_result.get("result_rows"),
+        result_columns=analysis_result.get("result_columns")
+    )
+
+
+@router.get("/results/{result_id}")
+async def get_result_page(
+    result_id: str,
+    cursor: int = Query(default=0, ge=0),
+    limit: int = Query(default=settings.result_page_rows, ge=1, le=settings.result_max_page_rows),
+    format: str = Query(default="json", pattern="^(json|arrow)$"),
+    compression: Optional[str] = Query(default=None, pattern="^(none|gzip|zstd)$"),
+    accept_encoding: str = Header(default="")
+):
+    """Get a page of a stored analysis result as typed columnar JSON or an Arrow IPC stream."""
     try:
-        upload_dir = "uploads"
-        if not os.path.exists(upload_dir):
-            return []
+        encoding = choose_encoding(compression, accept_encoding)
+        
+        def encode_page() -> tuple:
+            page, total_rows, next_cursor = result_store.page(result_id, cursor, limit)
+            if format == "arrow":
+                body = encode_arrow(page)
+            else:
+                body = encode_json(page, result_id, total_rows, cursor, next_cursor)
+            return compress(body, encoding), total_rows, next_cursor
         
-        files = [f for f in os.listdir(upload_dir) if f.endswith('.csv')]
-        return files
+        (body, content_encoding), total_rows, next_cursor = await worker_pool.run("encode_result", encode_page)
+        result_store.record_served(len(body))
+        
+        headers = {"X-Total-Rows": str(total_rows), "Vary": "Accept-Encoding"}
+        if next_cursor is not None:
+            headers["X-Next-Cursor"] = str(next_cursor)
+        if content_encoding:
+            headers["Content-Encoding"] = content_encoding
+        return Response(
+            content=body,
+            media_type=ARROW_MEDIA_TYPE if format == "arrow" else "application/json",
+            headers=headers
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading result: {str(e)}")
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def build_dataset_info(entry: DatasetEntry) -> DatasetInfo:
+    """Build the API listing item for a catalog entry."""
+    return DatasetInfo(
+        filename=entry.filename,
+        version=entry.version,
+        sha256=entry.blob.sha256,
+        size=entry.blob.size,
+        rows=entry.blob.rows,
+        column_count=len(entry.blob.columns),
+        columns=entry.blob.columns,
+        column_schema=entry.blob.schema,
+        large_file=entry.blob.large_file,
+        uploaded_at=entry.uploaded_at,
+        updated_at=entry.updated_at
+    )
+
+
+@router.get("/files", response_model=FileListResponse)
+async def list_files(
+    limit: int = Query(default=100, ge=1, le=1000),
+    offset: int = Query(default=0, ge=0)
+):
+    """List uploaded CSV files from the catalog, a page at a time."""
+    try:
+        entries, total = catalog.list(limit, offset)
+        return FileListResponse(
+            files=[build_dataset_info(entry) for entry in entries],
+            total=total,
+            limit=limit,
+            offset=offset
+        )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error listing files: {str(e)}")
 
 
+@router.get("/files/{filename}", response_model=DatasetInfo)
+async def get_file(filename: str):
+    """Get an uploaded CSV file's catalog entry."""
+    entry = catalog.get(filename)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return build_dataset_info(entry)
+
+
 @router.delete("/files/{filename}")
 async def delete_file(filename: str):
-    """Delete an uploaded CSV file."""
+    """Delete an uploaded CSV file, and its stored content once no other file shares it."""
     try:
-        file_path = os.path.join("uploads", filename)
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=404, detail="File not found")
-        
-        os.remove(file_path)
+        async with catalog.lock(f"file:{filename}"):
+            sha256 = catalog.remove(filename)
+            if sha256 is None:
+                raise HTTPException(status_code=404, detail="File not found")
+            await catalog.collect(sha256)
         return {"message": f"File {filename} deleted successfully"}
         
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error deleting file: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error deleting file: {str(e)}") 
+
+
+@router.get("/cache/stats", response_model=CacheStatsResponse)
+async def cache_stats():
+    """Get hit/miss counters for the parsed DataFrame cache."""
+    return CacheStatsResponse(**dataframe_cache.stats())
+
+
+@router.get("/cache/answers/stats", response_model=AnswerCacheStatsResponse)
+async def answer_cache_stats():
+    """Get hit/miss counters for the analysis answer cache."""
+    return AnswerCacheStatsResponse(**answer_cache.stats())
+
+
+@router.get("/cache/code/stats", response_model=CodeStoreStatsResponse)
+async def code_store_stats():
+    """Get counters for the generated-code store."""
+    return CodeStoreStatsResponse(**code_store.stats())
+
+
+@router.get("/cache/results/stats", response_model=ResultStoreStatsResponse)
+async def result_store_stats():
+    """Get counters for stored analysis results."""
+    return ResultStoreStatsResponse(**result_store.stats())
+
+
+@router.get("/cache/search/stats", response_model=SearchIndexStatsResponse)
+async def search_index_stats():
+    """Get counters for this process's column search indexes."""
+    return SearchIndexStatsResponse(**search_indexes.stats())
+
+
+@router.get("/catalog/stats", response_model=CatalogStatsResponse)
+async def catalog_stats():
+    """Get file, stored content and deduplication counters for the dataset catalog."""
+    return CatalogStatsResponse(**catalog.stats())
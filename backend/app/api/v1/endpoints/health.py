@@ -1,7 +1,21 @@
 from datetime import datetime
-from fastapi import APIRouter
-from app.schemas.csv import HealthResponse
+from fastapi import APIRouter, Response
+from app.schemas.csv import (
+    HealthResponse,
+    ReadinessResponse,
+    WorkerPoolStatsResponse,
+    SandboxStatsResponse,
+    LLMGatewayStatsResponse,
+    InsightJobStatsResponse,
+    SharedDatasetStatsResponse
+)
 from app.core.config import settings
+from app.utils.worker_pool import worker_pool
+from app.utils.code_sandbox import code_sandbox
+from app.utils.llm_gateway import llm_gateway
+from app.utils.insight_jobs import insight_jobs
+from app.utils.shared_datasets import shared_datasets
+from app.utils.warm_up import warm_up
 
 router = APIRouter()
 
@@ -13,4 +27,42 @@ async def health_check():
         status="healthy",
         version=settings.version,
         timestamp=datetime.now().isoformat()
-    ) 
\ No newline at end of file
+    )
+
+
+@router.get("/health/ready", response_model=ReadinessResponse)
+async def readiness_check(response: Response):
+    """Readiness check: 503 until startup warm-up has finished, so traffic waits for warm services."""
+    if not warm_up.ready:
+        response.status_code = 503
+    return ReadinessResponse(**warm_up.stats())
+
+
+@router.get("/health/workers", response_model=WorkerPoolStatsResponse)
+async def worker_stats():
+    """Worker pool queue depth and per-task timing metrics."""
+    return WorkerPoolStatsResponse(**worker_pool.stats())
+
+
+@router.get("/health/sandbox", response_model=SandboxStatsResponse)
+async def sandbox_stats():
+    """Code sandbox pool size and timeout/memory kill counters."""
+    return SandboxStatsResponse(**code_sandbox.stats())
+
+
+@router.get("/health/llm", response_model=LLMGatewayStatsResponse)
+async def llm_stats():
+    """LLM gateway concurrency, coalescing, retry and queue-wait metrics."""
+    return LLMGatewayStatsResponse(**llm_gateway.stats())
+
+
+@router.get("/health/insight-jobs", response_model=InsightJobStatsResponse)
+async def insight_job_stats():
+    """Insight job queue depth, deduplication and stored-result counters."""
+    return InsightJobStatsResponse(**insight_jobs.stats())
+
+
+@router.get("/health/shared-memory", response_model=SharedDatasetStatsResponse)
+async def shared_memory_stats():
+    """Datasets published to shared memory, the processes attached to them and eviction counters."""
+    return SharedDatasetStatsResponse(**shared_datasets.stats())
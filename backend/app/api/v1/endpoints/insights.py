@@ -1,49 +1,74 @@
-import os
 from datetime import datetime
-from fastapi import APIRouter, HTTPException, Depends
-from app.schemas.insights import InsightsRequest, InsightsResponse
-from app.utils.csv_handler import CSVHandler
-from app.utils.insights_service import InsightsService
+from fastapi import APIRouter, HTTPException
+from app.schemas.insights import InsightsRequest, InsightsResponse, InsightJobRequest, InsightJobResponse
+from app.utils.insight_jobs import insight_jobs, InsightJob, COMPLETED
+from app.utils.catalog import catalog
 
 router = APIRouter()
 
-# Initialize services
-csv_handler = CSVHandler()
-insights_service = None
-
-
-def get_insights_service():
-    """Dependency to get insights service."""
-    global insights_service
-    if insights_service is None:
-        try:
-            insights_service = InsightsService()
-        except ValueError as e:
-            raise HTTPException(status_code=500, detail=str(e))
-    return insights_service
-
 
 @router.post("/generate", response_model=InsightsResponse)
-async def generate_insights(
-    request: InsightsRequest,
-    insights_service: InsightsService = Depends(get_insights_service)
-):
+async def generate_insights(request: InsightsRequest):
     """Generate structured insights (card and chart) from uploaded CSV file."""
     try:
         # Check if file exists
-        file_path = os.path.join("uploads", request.filename)
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=404, detail="File not found")
+        file_path = catalog.get_path(request.filename)
+        
+        # Run through the job queue, sharing a precomputed or in-progress result for this file version
+        job = await insight_jobs.submit(request.filename, file_path)
+        job = await insight_jobs.wait(job.job_id)
+        if job.status != COMPLETED:
+            raise HTTPException(status_code=500, detail=f"Error generating insights: {job.error}")
         
-        # Read CSV
-        df = csv_handler.read_csv(file_path)
+        return InsightsResponse(**job.result)
         
-        # Generate insights
-        insights_result = await insights_service.generate_insights(df, request.filename)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating insights: {str(e)}")
+
+
+def _job_response(job: InsightJob) -> InsightJobResponse:
+    """Build the API response for a job."""
+    return InsightJobResponse(
+        job_id=job.job_id,
+        filename=job.filename,
+        status=job.status,
+        priority=job.priority,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        result=job.result,
+        error=job.error
+    )
+
+
+@router.post("/jobs", response_model=InsightJobResponse, status_code=202)
+async def submit_insights_job(request: InsightJobRequest):
+    """Queue insights generation and return a job id to poll."""
+    try:
+        file_path = catalog.get_path(request.filename)
         
-        return insights_result
+        job = await insight_jobs.submit(request.filename, file_path, request.priority)
+        return _job_response(job)
         
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating insights: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error submitting insights job: {str(e)}")
+
+
+@router.get("/jobs/{job_id}", response_model=InsightJobResponse)
+async def get_insights_job(job_id: str):
+    """Get a job's status, and its insights once completed."""
+    job = insight_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_response(job)
+
+
+@router.delete("/jobs/{job_id}", response_model=InsightJobResponse)
+async def cancel_insights_job(job_id: str):
+    """Cancel a queued or running job."""
+    job = insight_jobs.cancel(job_id)
+    return _job_response(job)
@@ -11,6 +11,9 @@ class Settings(BaseSettings):
     project_name: str = "CSV Analysis API"
     version: str = "1.0.0"
     
+    # Startup Configuration
+    startup_mode: str = "background"  # "eager", "background" or "lazy"
+    
     # CORS Configuration
     frontend_url: str = "http://localhost:3000"
     backend_url: str = "http://localhost:8000"
@@ -18,10 +21,126 @@ class Settings(BaseSettings):
     # OpenAI Configuration
     openai_api_key: Optional[str] = None
     
+    # LLM Provider Configuration
+    llm_provider: str = "openai"  # "openai" or "fake"
+    llm_model: str = "gpt-4o"
+    llm_temperature: float = 0.1
+    llm_recording_path: Optional[str] = None
+    fake_llm_latency_seconds: float = 0.0
+    
+    # LLM Gateway Configuration
+    llm_max_concurrency: int = 16
+    llm_max_retries: int = 4
+    llm_retry_base_delay_seconds: float = 0.5
+    llm_retry_max_delay_seconds: float = 20.0
+    llm_max_connections: int = 32
+    llm_max_keepalive_connections: int = 16
+    llm_timeout_seconds: float = 60.0
+    
     # File Upload Configuration
-    max_file_size: int = 10 * 1024 * 1024  # 10MB
+    max_file_size: int = 10 * 1024 * 1024 * 1024  # 10GB
     allowed_extensions: list = [".csv"]
     upload_dir: str = "uploads"
+    upload_chunk_size: int = 1024 * 1024  # 1MB
+    
+    # Large File Configuration
+    large_file_threshold_bytes: int = 256 * 1024 * 1024  # 256MB; larger files are never loaded whole
+    large_file_chunk_rows: int = 1_000_000
+    duckdb_memory_limit: str = "1GB"
+    duckdb_threads: int = 4
+    
+    # Approximate Answer Configuration
+    approx_sample_rows: int = 100_000
+    approx_max_strata: int = 50
+    approx_bootstrap_rounds: int = 20
+    approx_confidence: float = 0.95
+    approx_seed: int = 0
+    
+    # Columnar Sidecar Configuration
+    columnar_sidecar_enabled: bool = True
+    columnar_memory_map: bool = True
+    
+    # Dtype Optimization Configuration
+    dtype_optimization_enabled: bool = True
+    category_max_ratio: float = 0.05  # distinct/non-null values at or below this become categories
+    category_max_unique: int = 1000  # and at most this many distinct values
+    csv_engine: str = "c"  # "c" or "pyarrow"
+    
+    # Worker Pool Configuration
+    worker_pool_max_workers: int = 4
+    worker_pool_max_queue: int = 16
+    
+    # Batch Analysis Configuration
+    batch_max_queries: int = 50
+    batch_concurrency: int = 8
+    
+    # Code Sandbox Configuration
+    sandbox_workers: int = 2
+    sandbox_timeout_seconds: float = 30.0
+    sandbox_max_rss_bytes: int = 2 * 1024 * 1024 * 1024  # 2GB
+    
+    # DataFrame Cache Configuration
+    dataframe_cache_max_bytes: int = 512 * 1024 * 1024  # 512MB
+    
+    # Shared Dataset Memory Configuration
+    shared_datasets_enabled: bool = True
+    shared_datasets_dir: str = "/dev/shm/csv-analysis-datasets"  # shared by all workers on the host
+    shared_datasets_max_bytes: Optional[int] = None  # default: half the directory's free space, at most 4GB
+    
+    # Prompt Context Configuration
+    context_token_budget: int = 2000
+    context_sample_rows: int = 5
+    context_max_cell_chars: int = 40
+    context_cache_entries: int = 128
+    
+    # Search Index Configuration
+    search_index_enabled: bool = True
+    search_index_min_rows: int = 10_000  # smaller columns are scanned
+    search_index_max_bytes: int = 256 * 1024 * 1024  # 256MB per process
+    search_index_on_upload: bool = True
+    
+    # Query Planner Configuration
+    query_planner_enabled: bool = True
+    
+    # Chart Configuration
+    chart_top_n: int = 10
+    chart_max_points: int = 200
+    
+    # Insight Jobs Configuration
+    insight_jobs_workers: int = 2
+    insight_jobs_path: str = "cache/insight_jobs.sqlite3"
+    insight_jobs_max_stored: int = 1000
+    insight_jobs_lease_seconds: float = 30.0  # unfinished jobs of a process silent this long are taken over
+    insights_precompute_on_upload: bool = False
+    insights_precompute_priority: int = -10
+    
+    # Observability Configuration
+    otel_enabled: bool = True  # emits spans only when opentelemetry is installed
+    debug_timings_enabled: bool = True
+    debug_timings_header: str = "X-Debug-Timings"
+    
+    # Answer Cache Configuration
+    answer_cache_backend: str = "memory"  # "memory" or "sqlite"
+    answer_cache_path: str = "cache/answers.sqlite3"
+    answer_cache_ttl_seconds: float = 24 * 60 * 60
+    answer_cache_max_entries: int = 10000
+    
+    # Result Store Configuration
+    result_store_dir: str = "cache/results"
+    result_store_max_bytes: int = 1024 * 1024 * 1024  # 1GB
+    result_store_ttl_seconds: float = 60 * 60
+    result_preview_rows: int = 20  # rows of a tabular result shown in the analysis text
+    result_preview_columns: int = 20
+    result_page_rows: int = 1000
+    result_max_page_rows: int = 100_000
+    result_compression_min_bytes: int = 1024
+    
+    # Catalog Configuration
+    catalog_path: str = "cache/catalog.sqlite3"
+    
+    # Code Store Configuration
+    code_store_path: str = "cache/code.sqlite3"
+    code_store_max_entries: int = 10000
     
     class Config:
         env_file = ".env"
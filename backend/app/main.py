@@ -1,22 +1,68 @@
 import os
-from fastapi import FastAPI
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from dotenv import load_dotenv
 
 from app.core.config import settings
 from app.api.v1.api import api_router
+from app.api.v1.endpoints.csv import get_langchain_service
+from app.utils.code_sandbox import code_sandbox
+from app.utils.insight_jobs import insight_jobs
+from app.utils.worker_pool import worker_pool
+from app.utils.llm_gateway import llm_gateway
+from app.utils.dataframe_cache import dataframe_cache
+from app.utils.answer_cache import answer_cache
+from app.utils.code_store import code_store
+from app.utils.large_files import large_files
+from app.utils.catalog import catalog
+from app.utils.result_store import result_store
+from app.utils.search_index import search_indexes
+from app.utils.shared_datasets import shared_datasets
+from app.utils.warm_up import warm_up
+from app.utils.instrumentation import (
+    metrics, request_timings, server_timing, PROMETHEUS_CONTENT_TYPE
+)
 
 # Load environment variables
 load_dotenv()
 
+
+# Started by warm-up rather than on import, so /health answers before LangChain has loaded
+warm_up.add("sandbox", code_sandbox.warm_up)
+warm_up.add("analysis", get_langchain_service)
+warm_up.add("insights", insight_jobs.get_service)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Catalog files uploaded before the catalog existed, warm up services as STARTUP_MODE says and
+    start insight job workers on startup; stop warm-up, the workers and sandbox on shutdown."""
+    await asyncio.to_thread(catalog.adopt_uploads)
+    if settings.startup_mode == "eager":
+        await warm_up.run()
+    elif settings.startup_mode == "background":
+        warm_up.start()
+    else:
+        warm_up.defer()
+    insight_jobs.start()
+    yield
+    await warm_up.stop()
+    await insight_jobs.stop()
+    await asyncio.to_thread(code_sandbox.shutdown)
+
+
 # Create FastAPI app
 app = FastAPI(
     title=settings.project_name,
     version=settings.version,
     description="CSV Analysis API with LangChain integration",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -31,6 +77,54 @@ app.add_middleware(
 # Include API router
 app.include_router(api_router, prefix=settings.api_v1_str)
 
+# Expose existing service counters as gauges on /metrics
+metrics.register_collector("worker_pool", worker_pool.stats)
+metrics.register_collector("sandbox", code_sandbox.stats)
+metrics.register_collector("llm_gateway", llm_gateway.stats)
+metrics.register_collector("insight_jobs", insight_jobs.stats)
+metrics.register_collector("dataframe_cache", dataframe_cache.stats)
+metrics.register_collector("answer_cache", answer_cache.stats)
+metrics.register_collector("code_store", code_store.stats)
+metrics.register_collector("large_files", large_files.stats)
+metrics.register_collector("catalog", catalog.stats)
+metrics.register_collector("results", result_store.stats)
+metrics.register_collector("search_index", search_indexes.stats)
+metrics.register_collector("shared_datasets", shared_datasets.stats)
+metrics.register_collector("startup", warm_up.stats)
+
+
+@app.middleware("http")
+async def request_metrics(request: Request, call_next):
+    """Time every request by route; with the debug header, return its stage timings."""
+    debug = settings.debug_timings_enabled and request.headers.get(settings.debug_timings_header)
+    timings = [] if debug else None
+    token = request_timings.set(timings)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        request_timings.reset(token)
+    elapsed = time.perf_counter() - started
+    
+    # Label by route template, not raw path, to keep the number of series bounded
+    route = request.scope.get("route")
+    metrics.observe(
+        "http_request_duration_seconds",
+        elapsed,
+        method=request.method,
+        route=getattr(route, "path", "unmatched"),
+        status=str(response.status_code)
+    )
+    if timings is not None:
+        response.headers["Server-Timing"] = server_timing(timings + [("total", elapsed)])
+    return response
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Metrics in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 
 @app.get("/")
 async def root():
@@ -8,13 +8,62 @@ class CSVUploadResponse(BaseModel):
     size: int
     rows: int
     columns: List[str]
+    memory_bytes_before: Optional[int] = None
+    memory_bytes_after: Optional[int] = None
+    large_file: bool = Field(default=False, description="Over the large-file threshold: never loaded whole, answered with SQL or from a sample")
+    version: int = Field(default=1, description="Counts the uploads and appends that changed this filename's content")
+    deduplicated: bool = Field(default=False, description="The content was already stored, so it was not processed again")
     message: str = "File uploaded successfully"
 
 
+class CSVAppendResponse(BaseModel):
+    """Response model for appending rows to an uploaded CSV."""
+    filename: str
+    appended_rows: int
+    rows: int
+    size: int
+    columns: List[str]
+    version: int
+    message: str = "Rows appended successfully"
+
+
+class DatasetInfo(BaseModel):
+    """Catalog entry for one uploaded CSV file."""
+    filename: str
+    version: int
+    sha256: str
+    size: int
+    rows: int
+    column_count: int
+    columns: List[str]
+    column_schema: Optional[Dict[str, str]] = Field(default=None, description="Compact dtype per column, if one was inferred")
+    large_file: bool = False
+    uploaded_at: str
+    updated_at: str
+
+
+class FileListResponse(BaseModel):
+    """Response model for a page of uploaded CSV files."""
+    files: List[DatasetInfo]
+    total: int
+    limit: int
+    offset: int
+
+
 class AnalysisRequest(BaseModel):
     """Request model for CSV analysis."""
     query: str = Field(..., description="The analysis query for the CSV data")
     filename: str = Field(..., description="The filename to analyze")
+    approximate: bool = Field(default=False, description="For large files, answer from a stratified sample with error bounds")
+
+
+class ExecutionStats(BaseModel):
+    """Resource usage of one sandboxed code execution."""
+    wall_seconds: float
+    cpu_seconds: float
+    peak_rss_increase_bytes: int = Field(
+        description="Peak growth of resident memory while the code ran, over what was held when it started"
+    )
 
 
 class AnalysisResponse(BaseModel):
@@ -23,6 +72,195 @@ class AnalysisResponse(BaseModel):
     analysis: str
     filename: str
     timestamp: str
+    execution: Optional[ExecutionStats] = None
+    source: str = Field(default="llm", description="What served the answer: planner, llm, answer_cache or code_cache")
+    prompt_tokens: Optional[int] = Field(default=None, description="Tokens in the prompt sent to the LLM, if one was called")
+    approximate: bool = Field(default=False, description="Whether the answer was estimated from a sample")
+    approximate_reason: Optional[str] = Field(
+        default=None, description="Why the answer is approximate: requested, or exact_unavailable without DuckDB"
+    )
+    sample_rows: Optional[int] = None
+    total_rows: Optional[int] = None
+    error_bounds: Optional[Dict[str, List[Optional[float]]]] = Field(
+        default=None, description="Interval [lower, upper] per result label, or under \"value\" for a single number"
+    )
+    result_id: Optional[str] = Field(
+        default=None, description="Id of the full tabular result, to page through at /csv/results/{result_id}"
+    )
+    result_rows: Optional[int] = None
+    result_columns: Optional[List[str]] = None
+
+
+class BatchAnalysisRequest(BaseModel):
+    """Request model for answering many queries about one CSV file."""
+    filename: str = Field(..., description="The filename to analyze")
+    queries: List[str] = Field(..., min_length=1, description="The analysis queries, answered in order")
+    concurrency: Optional[int] = Field(default=None, ge=1, description="Maximum LLM calls in flight at once")
+    approximate: bool = Field(default=False, description="For large files, answer from a stratified sample with error bounds")
+
+
+class BatchAnalysisItem(BaseModel):
+    """Result of one query in a batch analysis."""
+    query: str
+    analysis: Optional[str] = None
+    error: Optional[str] = None
+    elapsed_seconds: float
+    execution: Optional[ExecutionStats] = None
+    source: Optional[str] = None
+    prompt_tokens: Optional[int] = None
+    approximate: bool = False
+    approximate_reason: Optional[str] = None
+    error_bounds: Optional[Dict[str, List[Optional[float]]]] = None
+    result_id: Optional[str] = None
+    result_rows: Optional[int] = None
+    result_columns: Optional[List[str]] = None
+
+
+class BatchAnalysisResponse(BaseModel):
+    """Response model for batch CSV analysis."""
+    filename: str
+    results: List[BatchAnalysisItem]
+    total_seconds: float
+    timestamp: str
+
+
+class CacheStatsResponse(BaseModel):
+    """Response model for DataFrame cache statistics."""
+    hits: int
+    misses: int
+    hit_rate: float
+    evictions: int
+    entries: int
+    current_bytes: int
+    max_bytes: int
+
+
+class SharedDatasetStatsResponse(BaseModel):
+    """Response model for shared dataset memory statistics."""
+    enabled: bool
+    datasets: int
+    shared_bytes: int
+    max_bytes: int
+    attached_processes: int
+    attached_here: int
+    attaches: int
+    publishes: int
+    evictions: int
+    rejected: int
+
+
+class WarmUpComponent(BaseModel):
+    """Warm-up state of one startup component."""
+    status: str = Field(..., description="pending, running, ready, failed or deferred")
+    seconds: Optional[float] = None
+    error: Optional[str] = None
+
+
+class ReadinessResponse(BaseModel):
+    """Response model for the readiness check."""
+    status: str = Field(..., description="warming, ready or degraded")
+    ready: bool
+    warm_up_seconds: Optional[float] = None
+    components: Dict[str, WarmUpComponent]
+
+
+class WorkerPoolStatsResponse(BaseModel):
+    """Response model for worker pool statistics."""
+    max_workers: int
+    max_queue: int
+    in_flight: int
+    queued: int
+    rejected: int
+    tasks: Dict[str, Dict[str, float]]
+
+
+class SandboxStatsResponse(BaseModel):
+    """Response model for code sandbox statistics."""
+    size: int
+    live_workers: int
+    idle_workers: int
+    executions: int
+    timeouts: int
+    memory_kills: int
+    respawns: int
+
+
+class AnswerCacheStatsResponse(BaseModel):
+    """Response model for answer cache statistics."""
+    backend: str
+    entries: int
+    answer_hits: int
+    misses: int
+    hit_rate: float
+
+
+class ResultStoreStatsResponse(BaseModel):
+    """Response model for stored analysis result statistics."""
+    results: int
+    stored_bytes: int
+    max_bytes: int
+    stores: int
+    rejected: int
+    evictions: int
+    pages: int
+    bytes_served: int
+    json_encoder: str
+    zstd_available: bool
+
+
+class SearchIndexStatsResponse(BaseModel):
+    """Response model for column search index statistics."""
+    enabled: bool
+    indexes: int
+    current_bytes: int
+    max_bytes: int
+    builds: int
+    build_seconds: float
+    indexed_lookups: int
+    scans: int
+    evictions: int
+
+
+class CodeStoreStatsResponse(BaseModel):
+    """Response model for generated-code store statistics."""
+    entries: int
+    hits: int
+    misses: int
+    stored: int
+    rejected: int
+    invalidations: int
+    hit_rate: float
+
+
+class CatalogStatsResponse(BaseModel):
+    """Response model for dataset catalog statistics."""
+    files: int
+    blobs: int
+    stored_bytes: int
+    deduplicated_uploads: int
+
+
+class InsightJobStatsResponse(BaseModel):
+    """Response model for insight job queue statistics."""
+    workers: int
+    queued: int
+    running: int
+    submitted: int
+    deduplicated: int
+    served_from_storage: int
+
+
+class LLMGatewayStatsResponse(BaseModel):
+    """Response model for LLM gateway statistics."""
+    max_concurrency: int
+    in_flight: int
+    waiting: int
+    calls: int
+    coalesced: int
+    retries: int
+    rate_limited: int
+    queue_wait_avg_seconds: float
+    queue_wait_max_seconds: float
 
 
 class ErrorResponse(BaseModel):
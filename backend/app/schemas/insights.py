@@ -1,4 +1,4 @@
-from typing import List, Union
+from typing import List, Literal, Optional, Union
 from pydantic import BaseModel, Field
 
 
@@ -12,6 +12,20 @@ class Card(BaseModel):
     type: str = Field(default="card", description="The type of component, should be 'card'")
 
 
+class ChartSpec(BaseModel):
+    """What a chart shows; the series itself is computed from the data."""
+    
+    title: str = Field(description="The title of the chart")
+    dimension: str = Field(description="Column for the X-axis: a category, date or numeric column")
+    measure: Optional[str] = Field(default=None, description="Numeric column to aggregate, omit to count rows")
+    aggregation: Literal["count", "sum", "mean", "median", "min", "max"] = Field(
+        default="count", description="How to aggregate the measure for each X-axis value"
+    )
+    bucket: Optional[Literal["day", "week", "month", "quarter", "year"]] = Field(
+        default=None, description="Time bucket when the dimension is a date column, omit to pick one automatically"
+    )
+
+
 class Chart(BaseModel):
     """Chart configuration with title, labels, and data."""
     
@@ -19,6 +33,17 @@ class Chart(BaseModel):
     labels: List[str] = Field(description="List of labels for the X-axis")
     data: List[float] = Field(description="List of numeric values for the Y-axis corresponding to each label")
     type: str = Field(default="chart", description="The type of component, should be 'chart'")
+    spec: Optional[ChartSpec] = Field(default=None, description="The spec the series was computed from")
+    total_points: Optional[int] = Field(
+        default=None, description="Points in the full series, before top-N grouping or downsampling"
+    )
+
+
+class InsightsPlan(BaseModel):
+    """What the LLM decides for insights: the card and the spec of the chart."""
+    
+    card: Card = Field(description="A card insight from the data")
+    chart: ChartSpec = Field(description="The chart to draw from the data")
 
 
 class InsightsResponse(BaseModel):
@@ -28,9 +53,31 @@ class InsightsResponse(BaseModel):
     chart: Chart = Field(description="A chart insight from the data")
     filename: str = Field(description="The filename that was analyzed")
     timestamp: str = Field(description="Timestamp of the analysis")
+    prompt_tokens: Optional[int] = Field(default=None, description="Tokens in the prompt sent to the LLM")
 
 
 class InsightsRequest(BaseModel):
     """Request model for insights generation."""
     
-    filename: str = Field(description="The filename to analyze for insights") 
\ No newline at end of file
+    filename: str = Field(description="The filename to analyze for insights") 
+
+
+class InsightJobRequest(BaseModel):
+    """Request model for submitting an insights job."""
+    
+    filename: str = Field(description="The filename to analyze for insights")
+    priority: int = Field(default=0, description="Jobs with higher priority run first")
+
+
+class InsightJobResponse(BaseModel):
+    """Status, and once completed the result, of an insights job."""
+    
+    job_id: str = Field(description="The job identifier to poll")
+    filename: str = Field(description="The filename being analyzed")
+    status: str = Field(description="queued, running, completed, failed or cancelled")
+    priority: int = Field(description="The job's priority")
+    created_at: str = Field(description="When the job was submitted")
+    started_at: Optional[str] = Field(default=None, description="When the job started running")
+    finished_at: Optional[str] = Field(default=None, description="When the job finished")
+    result: Optional[InsightsResponse] = Field(default=None, description="The insights, once completed")
+    error: Optional[str] = Field(default=None, description="Why the job failed or was cancelled")
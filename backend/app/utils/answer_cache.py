@@ -0,0 +1,187 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from app.core.config import settings
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a question so trivially different phrasings share a cache key."""
+    query = query.lower().strip()
+    query = re.sub(r"[?!.,;:]+(\s|$)", r"\1", query)
+    return re.sub(r"\s+", " ", query).strip()
+
+
+class AnswerCacheBackend(ABC):
+    """Storage interface for cached answers: a TTL'd, size-bounded key-value store."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        """Initialize backend limits."""
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the stored value, or None if missing or expired."""
+
+    @abstractmethod
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """Store a value, evicting least recently used entries over capacity."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove a value if present."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of stored values, expired ones included until they are looked up."""
+
+
+class MemoryAnswerCache(AnswerCacheBackend):
+    """In-process LRU backend."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        super().__init__(ttl_seconds, max_entries)
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteAnswerCache(AnswerCacheBackend):
+    """On-disk backend shared across restarts and worker processes."""
+
+    def __init__(self, path: str, ttl_seconds: float, max_entries: int):
+        super().__init__(ttl_seconds, max_entries)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used)")
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM answers WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE answers SET last_used = ? WHERE key = ?", (now, key))
+            return json.loads(row[0])
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + self.ttl_seconds, now)
+            )
+            self._conn.execute(
+                "DELETE FROM answers WHERE key IN ("
+                "SELECT key FROM answers ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+
+class AnswerCache:
+    """Cache of analysis answers keyed by dataset content and normalized query."""
+
+    def __init__(self, backend: AnswerCacheBackend):
+        """Initialize the cache over a storage backend."""
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.answer_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _answer_key(dataset_hash: str, query: str) -> str:
+        return f"answer:{dataset_hash}:{normalize_query(query)}"
+
+    def get_answer(self, dataset_hash: str, query: str) -> Optional[Dict[str, Any]]:
+        """Return the stored answer for this exact dataset content and query."""
+        answer = self.backend.get(self._answer_key(dataset_hash, query))
+        with self._lock:
+            if answer is None:
+                self.misses += 1
+            else:
+                self.answer_hits += 1
+        return answer
+
+    def put(self, dataset_hash: str, query: str, analysis: str, code: str, result_id: Optional[str] = None) -> None:
+        """Store an answer, the code that produced it and the id of its stored tabular result, if any."""
+        answer = {"analysis": analysis, "code": code}
+        if result_id:
+            answer["result_id"] = result_id
+        self.backend.set(self._answer_key(dataset_hash, query), answer)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters."""
+        with self._lock:
+            lookups = self.answer_hits + self.misses
+            return {
+                "backend": type(self.backend).__name__,
+                "entries": len(self.backend),
+                "answer_hits": self.answer_hits,
+                "misses": self.misses,
+                "hit_rate": self.answer_hits / lookups if lookups else 0.0,
+            }
+
+
+def create_answer_cache() -> AnswerCache:
+    """Build the answer cache with the configured backend."""
+    if settings.answer_cache_backend == "sqlite":
+        backend = SQLiteAnswerCache(
+            settings.answer_cache_path,
+            settings.answer_cache_ttl_seconds,
+            settings.answer_cache_max_entries
+        )
+    else:
+        backend = MemoryAnswerCache(settings.answer_cache_ttl_seconds, settings.answer_cache_max_entries)
+    return AnswerCache(backend)
+
+
+answer_cache = create_answer_cache()
@@ -0,0 +1,296 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from fastapi import HTTPException
+from app.core.config import settings
+from app.utils.csv_handler import CSVHandler
+
+# Uploaded bytes live under the upload directory in here, one file per distinct content
+OBJECTS_DIR = "objects"
+
+
+@dataclass
+class Blob:
+    """One stored file content, shared by every filename uploaded with the same bytes."""
+    sha256: str
+    file_path: str
+    size: int
+    rows: int
+    columns: List[str]
+    schema: Optional[Dict[str, str]] = None
+    large_file: bool = False
+    memory_bytes_before: Optional[int] = None
+    memory_bytes_after: Optional[int] = None
+    created_at: str = ""
+
+
+@dataclass
+class DatasetEntry:
+    """A filename, the version it is at and the content it points to."""
+    filename: str
+    version: int
+    uploaded_at: str
+    updated_at: str
+    blob: Blob
+
+
+class DatasetCatalog:
+    """SQLite catalog mapping filenames to content-addressed stored files.
+
+    Each distinct content is stored and processed (parsed, converted, profiled)
+    once, under a unique path in the objects directory; filenames point at it
+    by SHA-256 and count versions as they are re-uploaded or appended to. Sizes,
+    row and column counts and schemas are kept in the catalog, so listing files
+    is an indexed query rather than a directory scan. Content no filename
+    points at any more is deleted with its derived files.
+    """
+
+    def __init__(self, path: str, upload_dir: str):
+        """Open (or create) the catalog database."""
+        self.upload_dir = upload_dir
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            "sha256 TEXT PRIMARY KEY, file_path TEXT NOT NULL, size INTEGER NOT NULL, rows INTEGER NOT NULL, "
+            "column_count INTEGER NOT NULL, columns TEXT NOT NULL, schema TEXT, large_file INTEGER NOT NULL, "
+            "memory_bytes_before INTEGER, memory_bytes_after INTEGER, created_at TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "filename TEXT PRIMARY KEY, sha256 TEXT NOT NULL, version INTEGER NOT NULL, "
+            "uploaded_at TEXT NOT NULL, updated_at TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS files_sha256 ON files (sha256)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS files_updated_at ON files (updated_at)")
+        self._db_lock = threading.Lock()
+
+        # Held while a content is stored, collected or appended to, or a filename changed, by key,
+        # with how many tasks hold or wait for each; unused locks are dropped
+        self._locks: Dict[str, Tuple[asyncio.Lock, int]] = {}
+        self.deduplicated_uploads = 0
+
+    @asynccontextmanager
+    async def lock(self, key: str) -> AsyncIterator[None]:
+        """Serialize work on one content hash or filename (keyed "file:<filename>").
+
+        Take a filename's lock before a content's, and at most one content lock at a time.
+        """
+        lock, users = self._locks.get(key, (None, 0))
+        lock = lock or asyncio.Lock()
+        self._locks[key] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self._locks[key]
+            if users > 1:
+                self._locks[key] = (lock, users - 1)
+            else:
+                del self._locks[key]
+
+    def new_object_path(self) -> str:
+        """A fresh path to store a new content at."""
+        directory = os.path.join(self.upload_dir, OBJECTS_DIR)
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f"{uuid.uuid4().hex}.csv")
+
+    def get(self, filename: str) -> Optional[DatasetEntry]:
+        """Return a filename's current entry."""
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT f.filename, f.version, f.uploaded_at, f.updated_at, b.* "
+                "FROM files f JOIN blobs b ON b.sha256 = f.sha256 WHERE f.filename = ?",
+                (filename,)
+            ).fetchone()
+        return self._entry_from_row(row) if row else None
+
+    def get_path(self, filename: str) -> str:
+        """Return where a filename's current content is stored."""
+        entry = self.get(filename)
+        if entry is None or not os.path.exists(entry.blob.file_path):
+            raise HTTPException(status_code=404, detail="File not found")
+        return entry.blob.file_path
+
+    def get_blob(self, sha256: str) -> Optional[Blob]:
+        """Return the stored content with this hash, if any."""
+        with self._db_lock:
+            row = self._conn.execute("SELECT * FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        return self._blob_from_row(row) if row else None
+
+    def is_shared(self, sha256: str) -> bool:
+        """Whether more than one filename points at this content."""
+        with self._db_lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM files WHERE sha256 = ?", (sha256,)).fetchone()[0]
+        return count > 1
+
+    def add_blob(self, blob: Blob) -> Blob:
+        """Record a newly stored and processed content."""
+        blob.created_at = blob.created_at or datetime.now().isoformat()
+        with self._db_lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self._blob_values(blob)
+            )
+        return blob
+
+    def assign(self, filename: str, sha256: str) -> DatasetEntry:
+        """Point a filename at a stored content as its next version; the same content again changes nothing.
+
+        The content it pointed at before is not deleted; collect() it once the content's lock is free.
+        """
+        now = datetime.now().isoformat()
+        with self._db_lock:
+            self._conn.execute(
+                "INSERT INTO files VALUES (?, ?, 1, ?, ?) ON CONFLICT (filename) DO UPDATE SET "
+                "sha256 = excluded.sha256, version = version + 1, updated_at = excluded.updated_at "
+                "WHERE sha256 != excluded.sha256",
+                (filename, sha256, now, now)
+            )
+        return self.get(filename)
+
+    def record_append(self, filename: str, previous_sha256: str, blob: Blob) -> DatasetEntry:
+        """Record the content a filename has after an append, as its next version.
+
+        Content appended to in place replaces the previous hash; a copy made
+        because the content was shared is added alongside it.
+        """
+        blob.created_at = datetime.now().isoformat()
+        with self._db_lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(
+                    "DELETE FROM blobs WHERE sha256 = ? AND file_path = ?", (previous_sha256, blob.file_path)
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self._blob_values(blob)
+                )
+                self._conn.execute(
+                    "UPDATE files SET sha256 = ?, version = version + 1, updated_at = ? WHERE filename = ?",
+                    (blob.sha256, blob.created_at, filename)
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(filename)
+
+    def remove(self, filename: str) -> Optional[str]:
+        """Forget a filename and return the hash of the content it pointed at, to collect(); None if unknown."""
+        with self._db_lock:
+            row = self._conn.execute("SELECT sha256 FROM files WHERE filename = ?", (filename,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("DELETE FROM files WHERE filename = ?", (filename,))
+        return row[0]
+
+    async def collect(self, sha256: str) -> None:
+        """Delete a content once no filename points at it, after uploads and appends of it finish.
+
+        Holding the content's lock keeps an upload of the same bytes from
+        pointing a filename at it between the check and the delete.
+        """
+        async with self.lock(sha256):
+            self._collect(sha256)
+
+    def list(self, limit: int, offset: int = 0) -> Tuple[List[DatasetEntry], int]:
+        """Return a page of entries in filename order, and the total number of filenames."""
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT f.filename, f.version, f.uploaded_at, f.updated_at, b.* "
+                "FROM files f JOIN blobs b ON b.sha256 = f.sha256 ORDER BY f.filename LIMIT ? OFFSET ?",
+                (limit, offset)
+            ).fetchall()
+            total = self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        return [self._entry_from_row(row) for row in rows], total
+
+    def adopt_uploads(self) -> int:
+        """Register CSVs stored directly in the upload directory before the catalog existed, once."""
+        with self._db_lock:
+            if self._conn.execute("SELECT 1 FROM files LIMIT 1").fetchone():
+                return 0
+        if not os.path.isdir(self.upload_dir):
+            return 0
+
+        adopted = 0
+        for name in sorted(os.listdir(self.upload_dir)):
+            file_path = os.path.join(self.upload_dir, name)
+            if not name.endswith(".csv") or not os.path.isfile(file_path):
+                continue
+            sha256 = CSVHandler.get_content_hash(file_path)
+            if self.get_blob(sha256) is None:
+                rows = (CSVHandler.read_metadata(file_path) or {}).get("rows")
+                with open(file_path, "rb") as f:
+                    columns = CSVHandler.sniff_header(f.read(CSVHandler.MAX_HEADER_BYTES))
+                self.add_blob(Blob(
+                    sha256=sha256,
+                    file_path=file_path,
+                    size=os.path.getsize(file_path),
+                    rows=rows if rows is not None else CSVHandler.count_rows(file_path),
+                    columns=columns,
+                    schema=CSVHandler.read_schema(file_path)
+                ))
+            self.assign(name, sha256)
+            adopted += 1
+        return adopted
+
+    def stats(self) -> Dict[str, Any]:
+        """Return filename, stored content and deduplication counters."""
+        with self._db_lock:
+            files = self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            blobs, stored_bytes = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        return {
+            "files": files,
+            "blobs": blobs,
+            "stored_bytes": stored_bytes,
+            "deduplicated_uploads": self.deduplicated_uploads,
+        }
+
+    def _collect(self, sha256: str) -> None:
+        """Delete a content and its derived files once no filename points at it."""
+        with self._db_lock:
+            if self._conn.execute("SELECT 1 FROM files WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone():
+                return
+            row = self._conn.execute("SELECT file_path FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+            self._conn.execute("DELETE FROM blobs WHERE sha256 = ?", (sha256,))
+        if row and os.path.exists(row[0]):
+            CSVHandler.delete_file(row[0])
+
+    @staticmethod
+    def _blob_values(blob: Blob) -> tuple:
+        return (
+            blob.sha256, blob.file_path, blob.size, blob.rows, len(blob.columns), json.dumps(blob.columns),
+            json.dumps(blob.schema) if blob.schema is not None else None, int(blob.large_file),
+            blob.memory_bytes_before, blob.memory_bytes_after, blob.created_at
+        )
+
+    @staticmethod
+    def _blob_from_row(row: tuple) -> Blob:
+        sha256, file_path, size, rows, _, columns, schema, large_file, before, after, created_at = row
+        return Blob(
+            sha256=sha256,
+            file_path=file_path,
+            size=size,
+            rows=rows,
+            columns=json.loads(columns),
+            schema=json.loads(schema) if schema is not None else None,
+            large_file=bool(large_file),
+            memory_bytes_before=before,
+            memory_bytes_after=after,
+            created_at=created_at
+        )
+
+    @staticmethod
+    def _entry_from_row(row: tuple) -> DatasetEntry:
+        filename, version, uploaded_at, updated_at = row[:4]
+        return DatasetEntry(filename, version, uploaded_at, updated_at, DatasetCatalog._blob_from_row(row[4:]))
+
+
+catalog = DatasetCatalog(settings.catalog_path, settings.upload_dir)
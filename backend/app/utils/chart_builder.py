@@ -0,0 +1,177 @@
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+from app.core.config import settings
+from app.schemas.insights import Chart, ChartSpec
+from app.utils.profiler import column_kind
+
+# Period frequency and approximate length in days of each time bucket, finest first
+BUCKETS = {
+    "day": ("D", 1.0),
+    "week": ("W", 7.0),
+    "month": ("M", 30.44),
+    "quarter": ("Q", 91.31),
+    "year": ("Y", 365.25),
+}
+
+LABEL_FORMATS = {"day": "%Y-%m-%d", "week": "%Y-%m-%d", "month": "%Y-%m", "quarter": "%Y-Q%q", "year": "%Y"}
+
+OTHER_LABEL = "Other"
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices of the points kept by Largest-Triangle-Three-Buckets downsampling.
+
+    The first and last points are always kept; in between, each bucket keeps the
+    point forming the largest triangle with the previously kept point and the
+    average of the next bucket, which preserves peaks and troughs.
+    """
+    n = len(x)
+    if n <= threshold:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1][:max(threshold, 0)])
+
+    # threshold - 2 buckets over the points between the first and the last
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    kept = np.empty(threshold, dtype=int)
+    kept[0], kept[-1] = 0, n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x, next_y = x[end:edges[i + 2]].mean(), y[end:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+
+        area = np.abs(
+            (x[a] - next_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (next_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+
+class ChartBuilder:
+    """Computes chart series from a spec with vectorized groupbys, so charts cover any number of rows."""
+
+    def __init__(self, top_n: int, max_points: int):
+        """Initialize the builder with the category and point limits of a chart."""
+        self.top_n = top_n
+        self.max_points = max_points
+
+    def build(self, df: pd.DataFrame, spec: ChartSpec) -> Chart:
+        """Aggregate the measure by the dimension: top-N categories, time buckets or a downsampled numeric axis."""
+        if spec.dimension not in df.columns:
+            raise ValueError(f"Unknown chart dimension: {spec.dimension}")
+
+        aggregation = spec.aggregation if spec.measure else "count"
+        values = None
+        if spec.measure:
+            if spec.measure not in df.columns:
+                raise ValueError(f"Unknown chart measure: {spec.measure}")
+            values = df[spec.measure]
+            if aggregation != "count" and column_kind(values) != "numeric":
+                raise ValueError(f"Chart measure {spec.measure} is not numeric")
+
+        keys = df[spec.dimension]
+        kind = column_kind(keys)
+        if spec.bucket or kind == "datetime":
+            labels, data, total = self._time_series(keys, values, aggregation, spec.bucket)
+        elif kind == "numeric":
+            labels, data, total = self._numeric_series(keys, values, aggregation)
+        else:
+            labels, data, total = self._top_categories(keys, values, aggregation)
+
+        return Chart(
+            title=spec.title,
+            labels=labels,
+            data=data,
+            spec=spec.model_copy(update={"aggregation": aggregation}),
+            total_points=total
+        )
+
+    @staticmethod
+    def default_spec(profile: Dict[str, Any]) -> Optional[ChartSpec]:
+        """Row counts by the first column with repeated values, for when the chosen spec can't be drawn."""
+        for col, stats in profile["columns"].items():
+            if stats["kind"] == "categorical" and stats.get("top_values"):
+                return ChartSpec(title=f"Rows by {col}", dimension=col)
+        return None
+
+    @staticmethod
+    def _aggregate(keys: pd.Series, values: Optional[pd.Series], aggregation: str, sort: bool) -> pd.Series:
+        """Aggregate values (or count rows) per key, dropping null keys and empty results."""
+        if values is None:
+            result = keys.groupby(keys, sort=sort, observed=True).size()
+        else:
+            result = values.groupby(keys, sort=sort, observed=True).agg(aggregation)
+        return result.dropna().astype(float)
+
+    def _top_categories(
+        self, keys: pd.Series, values: Optional[pd.Series], aggregation: str
+    ) -> Tuple[list, list, int]:
+        """Largest categories first, with the rest folded into "Other"."""
+        result = self._aggregate(keys, values, aggregation, sort=False).sort_values(ascending=False, kind="stable")
+        total = len(result)
+        if total <= self.top_n:
+            return [str(label) for label in result.index], result.tolist(), total
+
+        top = result.iloc[:self.top_n - 1]
+        rest = keys.notna() & ~keys.isin(top.index)
+        if aggregation == "count" and values is None:
+            other = float(rest.sum())
+        elif aggregation in ("count", "sum"):
+            # Additive, so the rest is the sum of the rest's groups
+            other = float(result.iloc[self.top_n - 1:].sum())
+        else:
+            other = float(values[rest].agg(aggregation))
+
+        labels = [str(label) for label in top.index] + [OTHER_LABEL]
+        return labels, top.tolist() + [other], total
+
+    def _time_series(
+        self, keys: pd.Series, values: Optional[pd.Series], aggregation: str, bucket: Optional[str]
+    ) -> Tuple[list, list, int]:
+        """Aggregate per time bucket in date order, downsampling if there are still too many buckets."""
+        dates = keys if pd.api.types.is_datetime64_any_dtype(keys) else pd.to_datetime(
+            keys, errors="coerce", format="mixed"
+        )
+        if getattr(dates.dt, "tz", None) is not None:
+            dates = dates.dt.tz_localize(None)
+        if dates.notna().sum() == 0:
+            raise ValueError(f"Chart dimension {keys.name} has no dates")
+
+        bucket = bucket or self._pick_bucket(dates)
+        periods = dates.dt.to_period(BUCKETS[bucket][0])
+        result = self._aggregate(periods, values, aggregation, sort=True)
+
+        index = result.index.start_time if bucket == "week" else result.index
+        labels = np.asarray(index.strftime(LABEL_FORMATS[bucket]))
+        x = result.index.asi8.astype(float)
+        return self._downsample(labels, x, result.to_numpy())
+
+    def _numeric_series(
+        self, keys: pd.Series, values: Optional[pd.Series], aggregation: str
+    ) -> Tuple[list, list, int]:
+        """Aggregate per distinct value in ascending order, downsampling long series."""
+        result = self._aggregate(keys, values, aggregation, sort=True)
+        labels = np.asarray(result.index.astype(str))
+        return self._downsample(labels, result.index.to_numpy(dtype=float), result.to_numpy())
+
+    def _pick_bucket(self, dates: pd.Series) -> str:
+        """The finest bucket that spreads the date range over at most max_points buckets."""
+        span_days = (dates.max() - dates.min()) / pd.Timedelta(days=1)
+        for bucket, (_, days) in BUCKETS.items():
+            if span_days / days < self.max_points:
+                return bucket
+        return "year"
+
+    def _downsample(self, labels: np.ndarray, x: np.ndarray, y: np.ndarray) -> Tuple[list, list, int]:
+        """Keep at most max_points points of an ordered series with LTTB."""
+        kept = lttb(x, y, self.max_points)
+        return labels[kept].tolist(), y[kept].tolist(), len(y)
+
+
+chart_builder = ChartBuilder(settings.chart_top_n, settings.chart_max_points)
@@ -0,0 +1,347 @@
+import ast
+import functools
+import io
+import logging
+import multiprocessing
+import os
+import queue
+import resource
+import threading
+import time
+import uuid
+import marshal
+from types import CodeType
+from collections import OrderedDict
+from contextlib import redirect_stdout
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from app.core.config import settings
+from app.utils.csv_handler import CSVHandler
+from app.utils.dataframe_cache import DataFrameCache
+from app.utils.shared_datasets import shared_datasets
+from app.utils.search_index import search_indexes, find_rows, match_rows
+from app.utils.instrumentation import read_rss
+
+logger = logging.getLogger(__name__)
+
+# Frames each worker keeps attached between executions
+WORKER_FRAME_SLOTS = 2
+
+# Indexed lookups generated code can call; row subsets (resamples) are data used once, so they are scanned
+SEARCH_HELPERS = {"find_rows": find_rows, "match_rows": match_rows}
+SUBSET_SEARCH_HELPERS = {
+    "find_rows": functools.partial(search_indexes.find_rows, build=False),
+    "match_rows": functools.partial(search_indexes.match_rows, build=False),
+}
+
+
+def compile_code(code: str) -> Tuple[CodeType, Optional[CodeType]]:
+    """Compile code like PythonAstREPLTool splits it: the statements, then a final expression if any."""
+    tree = ast.parse(code)
+    last = tree.body[-1:]
+    if last and isinstance(last[0], ast.Expr):
+        body = compile(ast.Module(tree.body[:-1], type_ignores=[]), "<generated>", "exec")
+        return body, compile(ast.Expression(last[0].value), "<generated>", "eval")
+    return compile(tree, "<generated>", "exec"), None
+
+
+def run_compiled(compiled: Tuple[CodeType, Optional[CodeType]], local_vars: Dict[str, Any]) -> Any:
+    """Run compiled code; return the last expression's value, or what was printed."""
+    body, expression = compiled
+    if expression is None:
+        io_buffer = io.StringIO()
+        with redirect_stdout(io_buffer):
+            exec(body, local_vars)
+        return io_buffer.getvalue()
+
+    exec(body, local_vars)
+    io_buffer = io.StringIO()
+    with redirect_stdout(io_buffer):
+        result = eval(expression, local_vars)
+
+    return io_buffer.getvalue() if result is None else result
+
+
+def _reset_peak_rss() -> bool:
+    """Reset this process's peak resident set (VmHWM) to its current size; False where Linux doesn't allow it."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _read_peak_rss() -> int:
+    """Read this process's peak resident set since the last reset, 0 if unavailable."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+def _worker_main(conn) -> None:
+    """Sandbox worker loop: attach frames, run code, report CPU and memory use."""
+    frames: "OrderedDict[Tuple, pd.DataFrame]" = OrderedDict()
+
+    # Imports are done, tell the parent this worker can take work
+    conn.send({"status": "ready"})
+
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+
+        key, shared_key, columnar_paths, file_path, code = (
+            message["key"], message["shared_key"], message["columnar_paths"], message["file_path"], message["code"]
+        )
+        compiled = message.get("compiled")
+        replicates = message.get("replicates")
+
+        # Attach the frame: from shared memory, by memory-mapping the columnar sidecar, or ask the parent for it once
+        df = frames.get(key)
+        if df is None:
+            df = CSVHandler.read_shared(shared_key) if shared_key else None
+            if df is None and columnar_paths:
+                df = CSVHandler.read_columnar(columnar_paths, memory_map=True)
+            if df is None:
+                conn.send({"status": "need_data"})
+                df = conn.recv()
+            if file_path:
+                # Search indexes the API process stored for the file, instead of building them here
+                CSVHandler.read_search_index(file_path, df)
+            frames[key] = df
+            if len(frames) > WORKER_FRAME_SLOTS:
+                frames.popitem(last=False)
+        frames.move_to_end(key)
+
+        # Memory use is measured from here, so imports and attached frames don't count against the code
+        peak_tracked = _reset_peak_rss()
+        conn.send({"status": "started", "rss": read_rss(os.getpid())})
+        before = resource.getrusage(resource.RUSAGE_SELF)
+        try:
+            # Stored code arrives as marshalled bytecode and skips parsing and compiling
+            compiled = marshal.loads(compiled) if compiled else compile_code(code)
+            # A writable copy: generated code often assigns in place, and frames attached from shared memory are read-only
+            result = run_compiled(compiled, {"df": shared_datasets.copy(df), "pd": pd, **SEARCH_HELPERS})
+            if replicates:
+                # Also run on row subsets of the frame (e.g. bootstrap resamples), in one round trip
+                result = [result] + [
+                    run_compiled(
+                        compiled, {"df": df.take(rows).reset_index(drop=True), "pd": pd, **SUBSET_SEARCH_HELPERS}
+                    )
+                    for rows in replicates
+                ]
+            reply = {"status": "ok", "result": result}
+        except Exception as e:
+            reply = {"status": "error", "error": e}
+        after = resource.getrusage(resource.RUSAGE_SELF)
+
+        reply["cpu_seconds"] = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+        # Exact where the peak was reset; the parent's sampling misses allocations freed between samples
+        reply["peak_rss"] = _read_peak_rss() if peak_tracked else 0
+        try:
+            conn.send(reply)
+        except Exception as e:
+            # Unpicklable results or exceptions are reported as text
+            conn.send({
+                "status": "error", "error": RuntimeError(str(e)),
+                "cpu_seconds": reply["cpu_seconds"], "peak_rss": reply["peak_rss"]
+            })
+
+
+class SandboxWorker:
+    """Handle to one pre-warmed worker process."""
+
+    def __init__(self, context):
+        """Start the worker process."""
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def wait_ready(self) -> None:
+        """Block until the worker has finished importing its dependencies."""
+        self.conn.recv()
+
+    def kill(self) -> None:
+        """Terminate the worker immediately."""
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self) -> None:
+        """Ask the worker to exit."""
+        try:
+            self.conn.send(None)
+            self.process.join(timeout=1)
+        except (OSError, EOFError):
+            pass
+        if self.process.is_alive():
+            self.kill()
+
+
+class CodeSandbox:
+    """Pool of worker processes that run generated pandas code with time and memory limits."""
+
+    def __init__(self, size: int, timeout: float, max_rss_bytes: int):
+        """Initialize the pool; processes start on first use or warm_up()."""
+        self.size = size
+        self.timeout = timeout
+        self.max_rss_bytes = max_rss_bytes
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: "queue.Queue[SandboxWorker]" = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.timeouts = 0
+        self.memory_kills = 0
+        self.respawns = 0
+
+    def warm_up(self) -> None:
+        """Start all worker processes."""
+        with self._lock:
+            started = []
+            while len(self._workers) < self.size:
+                worker = SandboxWorker(self._context)
+                self._workers.append(worker)
+                started.append(worker)
+
+            for worker in started:
+                worker.wait_ready()
+                self._idle.put(worker)
+
+    def shutdown(self) -> None:
+        """Stop all worker processes."""
+        with self._lock:
+            for worker in self._workers:
+                worker.stop()
+            self._workers = []
+            self._idle = queue.Queue()
+
+    def _respawn(self, worker: SandboxWorker) -> SandboxWorker:
+        """Kill a misbehaving worker and replace it with a fresh one."""
+        worker.kill()
+        replacement = SandboxWorker(self._context)
+        replacement.wait_ready()
+        with self._lock:
+            self._workers = [w for w in self._workers if w is not worker] + [replacement]
+            self.respawns += 1
+        return replacement
+
+    @staticmethod
+    def dataset_key(df: pd.DataFrame, file_path: Optional[str]) -> Tuple[Tuple, Optional[str], List[str]]:
+        """Identify the frame for worker-side reuse and find the shared dataset or sidecars to map it from."""
+        if file_path and os.path.exists(file_path):
+            shared_key = CSVHandler.shared_key(file_path) if shared_datasets.enabled else None
+            return DataFrameCache.make_key(file_path), shared_key, CSVHandler.get_columnar_paths(file_path)
+
+        # Frames without a backing file are sent every time
+        return ("frame", uuid.uuid4().hex), None, []
+
+    def execute(
+        self,
+        code: str,
+        df: pd.DataFrame,
+        file_path: Optional[str] = None,
+        compiled: Optional[bytes] = None,
+        replicates: Optional[List[np.ndarray]] = None
+    ) -> Tuple[Any, Dict[str, float]]:
+        """Run code (or its marshalled bytecode) against df in a worker; return the result and its resource usage.
+
+        With replicates (arrays of row positions), the result is a list: the result
+        on df followed by the result on each of those row selections. Memory is
+        reported and limited as the growth of the worker's resident set over what
+        it held once the frame was attached, not the worker's total.
+        """
+        self.warm_up()
+        key, shared_key, columnar_paths = self.dataset_key(df, file_path)
+        worker = self._idle.get()
+        started = time.perf_counter()
+        # The worker's resident set when the code started running; None while it attaches the frame
+        baseline_rss = None
+        peak_rss = 0
+
+        try:
+            deadline = started + self.timeout
+            try:
+                worker.conn.send({
+                    "key": key, "shared_key": shared_key, "columnar_paths": columnar_paths,
+                    "file_path": file_path if file_path and os.path.exists(file_path) else None, "code": code,
+                    "compiled": compiled,
+                    "replicates": replicates
+                })
+            except (EOFError, OSError):
+                worker = self._respawn(worker)
+                raise RuntimeError("Code execution worker died unexpectedly")
+
+            while True:
+                try:
+                    if worker.conn.poll(0.05):
+                        reply = worker.conn.recv()
+                        if reply["status"] == "started":
+                            baseline_rss = peak_rss = reply["rss"]
+                            continue
+                        if reply["status"] != "need_data":
+                            break
+                        worker.conn.send(df)
+                        continue
+                except (EOFError, OSError):
+                    # The pipe breaks when the worker dies; the liveness check below respawns it
+                    pass
+
+                if baseline_rss is not None:
+                    peak_rss = max(peak_rss, read_rss(worker.process.pid))
+                if baseline_rss is not None and peak_rss - baseline_rss > self.max_rss_bytes:
+                    self.memory_kills += 1
+                    worker = self._respawn(worker)
+                    raise MemoryError(
+                        f"Code execution exceeded the memory limit of {self.max_rss_bytes} bytes"
+                    )
+                if time.perf_counter() > deadline:
+                    self.timeouts += 1
+                    worker = self._respawn(worker)
+                    raise TimeoutError(f"Code execution exceeded the time limit of {self.timeout} seconds")
+                if not worker.process.is_alive():
+                    worker = self._respawn(worker)
+                    raise RuntimeError("Code execution worker died unexpectedly")
+        finally:
+            self._idle.put(worker)
+
+        if baseline_rss is not None:
+            peak_rss = max(peak_rss, read_rss(worker.process.pid), reply.get("peak_rss", 0))
+        stats = {
+            "wall_seconds": time.perf_counter() - started,
+            "cpu_seconds": reply["cpu_seconds"],
+            "peak_rss_increase_bytes": peak_rss - baseline_rss if baseline_rss is not None else 0,
+        }
+        self.executions += 1
+        logger.info("Sandboxed execution finished: %s", stats)
+
+        if reply["status"] == "error":
+            raise reply["error"]
+        return reply["result"], stats
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool size and kill/respawn counters."""
+        return {
+            "size": self.size,
+            "live_workers": len(self._workers),
+            "idle_workers": self._idle.qsize(),
+            "executions": self.executions,
+            "timeouts": self.timeouts,
+            "memory_kills": self.memory_kills,
+            "respawns": self.respawns,
+        }
+
+
+code_sandbox = CodeSandbox(
+    settings.sandbox_workers,
+    settings.sandbox_timeout_seconds,
+    settings.sandbox_max_rss_bytes
+)
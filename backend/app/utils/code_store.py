@@ -0,0 +1,162 @@
+import ast
+import hashlib
+import importlib.util
+import json
+import marshal
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+import pandas as pd
+from app.core.config import settings
+from app.utils.answer_cache import normalize_query
+from app.utils.code_sandbox import compile_code
+
+# Calls generated analysis code has no reason to make
+FORBIDDEN_CALLS = {"exec", "eval", "compile", "open", "input", "breakpoint", "globals", "locals", "vars"}
+
+
+def schema_fingerprint(df: pd.DataFrame) -> str:
+    """Identify a frame's schema by its column names and dtypes, in order."""
+    schema = [[str(col), str(dtype)] for col, dtype in df.dtypes.items()]
+    return hashlib.sha256(json.dumps(schema).encode()).hexdigest()
+
+
+def validate_code(code: str) -> bool:
+    """Check generated code parses and sticks to data analysis: no imports, dunders or dynamic code."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return False
+
+    if not tree.body:
+        return False
+
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            return False
+        if isinstance(node, ast.Attribute) and node.attr.startswith("__"):
+            return False
+        if isinstance(node, ast.Name) and node.id.startswith("__"):
+            return False
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FORBIDDEN_CALLS:
+            return False
+    return True
+
+
+@dataclass
+class StoredCode:
+    """Generated code with its validated, compiled form."""
+    code: str
+    compiled: bytes
+
+
+class CodeStore:
+    """Persistent store of generated code keyed by schema fingerprint and normalized query.
+
+    Code is validated and compiled once when stored; the marshalled bytecode is
+    what sandbox workers run, so a repeat question on any file with the same
+    schema skips both the LLM call and compilation.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        """Open (or create) the store's SQLite database."""
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS code ("
+            "schema TEXT NOT NULL, query TEXT NOT NULL, code TEXT NOT NULL, bytecode BLOB NOT NULL, "
+            "magic BLOB NOT NULL, last_used REAL NOT NULL, PRIMARY KEY (schema, query))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS code_last_used ON code (last_used)")
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.rejected = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def compile(code: str) -> Optional[bytes]:
+        """Validate code and compile it to marshalled bytecode, or None if it isn't acceptable."""
+        if not validate_code(code):
+            return None
+        return marshal.dumps(compile_code(code))
+
+    def get(self, fingerprint: str, query: str) -> Optional[StoredCode]:
+        """Return stored code for this schema and question."""
+        key = (fingerprint, normalize_query(query))
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT code, bytecode, magic FROM code WHERE schema = ? AND query = ?", key
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE code SET last_used = ? WHERE schema = ? AND query = ?", (time.time(),) + key)
+            self.hits += 1
+
+        code, bytecode, magic = row
+        if magic != importlib.util.MAGIC_NUMBER:
+            # Written by another Python version; recompile from the source
+            bytecode = self.compile(code)
+            if bytecode is None:
+                self.invalidate(fingerprint, query)
+                return None
+            self._write(key, code, bytecode)
+        return StoredCode(code=code, compiled=bytecode)
+
+    def put(self, fingerprint: str, query: str, code: str, compiled: Optional[bytes] = None) -> bool:
+        """Store code that answered the question; returns False if it doesn't pass validation."""
+        compiled = compiled or self.compile(code)
+        if compiled is None:
+            with self._lock:
+                self.rejected += 1
+            return False
+
+        self._write((fingerprint, normalize_query(query)), code, compiled)
+        with self._lock:
+            self.stored += 1
+        return True
+
+    def _write(self, key: tuple, code: str, compiled: bytes) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO code (schema, query, code, bytecode, magic, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                key + (code, compiled, importlib.util.MAGIC_NUMBER, time.time())
+            )
+            self._conn.execute(
+                "DELETE FROM code WHERE rowid IN ("
+                "SELECT rowid FROM code ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def invalidate(self, fingerprint: str, query: str) -> None:
+        """Forget code that failed to run."""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM code WHERE schema = ? AND query = ?", (fingerprint, normalize_query(query))
+            )
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return entry count and hit/miss/invalidation counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": self._conn.execute("SELECT COUNT(*) FROM code").fetchone()[0],
+                "hits": self.hits,
+                "misses": self.misses,
+                "stored": self.stored,
+                "rejected": self.rejected,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+code_store = CodeStore(settings.code_store_path, settings.code_store_max_entries)
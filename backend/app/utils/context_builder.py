@@ -0,0 +1,194 @@
+import math
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from app.core.config import settings
+from app.utils.csv_handler import CSVHandler
+from app.utils.profiler import DatasetProfiler
+
+# Keep at least this many described columns before giving up sample rows
+MIN_DETAIL_COLUMNS = 8
+
+# Characters per token assumed when no tokenizer is available
+CHARS_PER_TOKEN = 4
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def count_tokens(text: str) -> int:
+    """Count prompt tokens with the model's tokenizer, or estimate them without it."""
+    global _encoding
+    with _encoding_lock:
+        if _encoding is None:
+            try:
+                import tiktoken
+                _encoding = tiktoken.encoding_for_model(settings.llm_model)
+            except Exception:
+                # Unknown model, missing package or no network to fetch the vocabulary
+                _encoding = False
+
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def column_score(stats: Dict[str, Any]) -> float:
+    """Rank how much a column tells the model: filled, varied, groupable columns first."""
+    if not stats["count"]:
+        return 0.0
+
+    filled = 1.0 - stats["null_rate"]
+    if stats["distinct"] <= 1:
+        return 0.1 * filled
+    if stats["kind"] in ("numeric", "datetime"):
+        return filled
+
+    # Low-cardinality categories are what questions group by; near-unique text (ids, notes) least
+    if stats["distinct"] <= 50:
+        return 0.9 * filled
+    return filled * (0.6 if stats["distinct"] < stats["count"] / 2 else 0.3)
+
+
+@dataclass
+class DatasetContext:
+    """Prompt-ready description of a dataset version."""
+    text: str
+    tokens: int
+    columns: List[str]
+    sample_rows: int
+    truncated: bool
+
+
+class ContextBuilder:
+    """Builds the schema and sample section of prompts once per dataset version, within a token budget."""
+
+    def __init__(self, token_budget: int, sample_rows: int, max_cell_chars: int, max_entries: int):
+        """Initialize the builder and its LRU of built contexts."""
+        self.token_budget = token_budget
+        self.sample_rows = sample_rows
+        self.max_cell_chars = max_cell_chars
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, DatasetContext]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_context(
+        self, df: pd.DataFrame, file_path: Optional[str] = None, profile: Optional[Dict[str, Any]] = None
+    ) -> DatasetContext:
+        """Get the context for df, reusing the one built for this file version if any."""
+        key = None
+        if file_path:
+            key = (CSVHandler.get_content_hash(file_path), self.token_budget, self.sample_rows)
+            with self._lock:
+                context = self._entries.get(key)
+                if context is not None:
+                    self._entries.move_to_end(key)
+                    return context
+
+        if profile is None:
+            profile = CSVHandler.get_profile(file_path, df) if file_path else DatasetProfiler.profile(df)
+        context = self.build(df, profile)
+
+        if key is not None:
+            with self._lock:
+                self._entries[key] = context
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return context
+
+    def build(self, df: pd.DataFrame, profile: Dict[str, Any]) -> DatasetContext:
+        """Describe as many of the most informative columns and sample rows as fit the budget."""
+        ranked = sorted(
+            profile["columns"], key=lambda col: column_score(profile["columns"][col]), reverse=True
+        )
+
+        for sample_rows in (self.sample_rows, 1, 0):
+            # Binary search for the most columns that still fit
+            low, high = 0, len(ranked)
+            best = None
+            while low <= high:
+                k = (low + high) // 2
+                context = self._render(df, profile, ranked[:k], sample_rows)
+                if context.tokens <= self.token_budget:
+                    best, low = context, k + 1
+                else:
+                    high = k - 1
+
+            if best and (len(best.columns) >= min(MIN_DETAIL_COLUMNS, len(ranked)) or not sample_rows):
+                return best
+
+        # Even the column list alone is over budget; send it anyway, the model needs the names
+        return self._render(df, profile, [], 0)
+
+    def _render(
+        self, df: pd.DataFrame, profile: Dict[str, Any], columns: List[str], sample_rows: int
+    ) -> DatasetContext:
+        """Render the overview, per-column details and a sample of rows."""
+        order = {col: i for i, col in enumerate(profile["columns"])}
+        columns = sorted(columns, key=order.get)
+        total_columns = len(profile["columns"])
+        truncated = len(columns) < total_columns or sample_rows < self.sample_rows
+
+        lines = [
+            f"Dataset: {profile['rows']} rows x {total_columns} columns",
+            f"Column names: {', '.join(profile['columns'])}",
+            "",
+            f"Column details ({len(columns)} of {total_columns} most informative):"
+            if len(columns) < total_columns else "Column details:",
+        ]
+        lines += [self._describe_column(col, profile["columns"][col]) for col in columns]
+
+        sample = self._sample(df, columns, sample_rows)
+        if sample is not None:
+            lines += ["", f"Sample rows ({len(sample)} of {len(df)}):", sample.to_markdown()]
+
+        text = "\n".join(lines)
+        return DatasetContext(
+            text=text,
+            tokens=count_tokens(text),
+            columns=columns,
+            sample_rows=0 if sample is None else len(sample),
+            truncated=truncated
+        )
+
+    @staticmethod
+    def _describe_column(col: str, stats: Dict[str, Any]) -> str:
+        """One line of type, nulls, cardinality and range or top values for a column."""
+        line = (
+            f"- {col} ({stats['dtype']}, {stats['kind']}): "
+            f"nulls {stats['null_rate']:.1%}, distinct~{stats['distinct']}"
+        )
+        if stats["kind"] == "numeric" and stats.get("mean") is not None:
+            line += f", min {stats['min']}, median {stats['quantiles']['0.5']}, max {stats['max']}"
+        elif stats["kind"] == "datetime":
+            line += f", from {stats['min']} to {stats['max']}"
+        elif stats.get("top_values"):
+            line += ", top: " + ", ".join(value for value, _ in stats["top_values"][:5])
+        return line
+
+    def _sample(self, df: pd.DataFrame, columns: List[str], sample_rows: int) -> Optional[pd.DataFrame]:
+        """Pick complete rows spread across the dataset, with long cells shortened."""
+        if not columns or not sample_rows or df.empty:
+            return None
+
+        # Candidates are evenly spaced; the ones with fewest nulls win
+        candidates = np.unique(np.linspace(0, len(df) - 1, min(len(df), sample_rows * 4)).astype(int))
+        candidate_rows = df.iloc[candidates][columns]
+        nulls = candidate_rows.isna().sum(axis=1).to_numpy()
+        sample = candidate_rows.iloc[np.sort(np.argsort(nulls, kind="stable")[:sample_rows])]
+
+        limit = self.max_cell_chars
+        return sample.apply(lambda series: series.map(
+            lambda value: value[:limit - 1] + "…" if isinstance(value, str) and len(value) > limit else value
+        ) if not pd.api.types.is_numeric_dtype(series) else series)
+
+
+context_builder = ContextBuilder(
+    settings.context_token_budget,
+    settings.context_sample_rows,
+    settings.context_max_cell_chars,
+    settings.context_cache_entries
+)
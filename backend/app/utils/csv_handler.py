@@ -1,13 +1,79 @@
 import os
+import io
+import csv
+import json
+import shutil
+import time
+import hashlib
+from dataclasses import dataclass, asdict
+import numpy as np
 import pandas as pd
-from typing import List, Tuple, Optional
+import pyarrow as pa
+import pyarrow.feather as feather
+from pandas.api import types as ptypes
+from typing import List, Tuple, Optional, Dict, Any
 from fastapi import UploadFile, HTTPException
+from starlette.concurrency import run_in_threadpool
 from app.core.config import settings
+from app.utils.dataframe_cache import dataframe_cache
+from app.utils.shared_datasets import shared_datasets
+from app.utils.search_index import search_indexes
+from app.utils.profiler import DatasetProfiler
+from app.utils.dtype_optimizer import infer_schema, apply_schema, widen_schema, base_dtype, read_options
+from app.utils.instrumentation import metrics, stage
+
+
+@dataclass
+class SavedUpload:
+    """Facts about an upload gathered while it was streamed to disk."""
+    file_path: str
+    size: int
+    sha256: str
+    rows: int
+    columns: List[str]
+
+
+@dataclass
+class AppendedRows:
+    """Outcome of appending rows to a stored upload."""
+    file_path: str
+    appended_rows: int
+    rows: int
+    size: int
+    columns: List[str]
+
+
+@dataclass
+class OptimizedFrame:
+    """A DataFrame cast to its compact schema, with its memory footprint before and after."""
+    df: pd.DataFrame
+    memory_bytes_before: int
+    memory_bytes_after: int
 
 
 class CSVHandler:
     """Utility class for handling CSV files."""
     
+    # Derived files stored next to each uploaded CSV
+    COLUMNAR_SUFFIX = ".feather"
+    METADATA_SUFFIX = ".meta.json"
+    PROFILE_SUFFIX = ".profile.json"
+    SCHEMA_SUFFIX = ".schema.json"
+    SAMPLE_SUFFIX = ".sample.feather"
+    SEARCH_INDEX_SUFFIX = ".search.npz"
+    SIDECAR_SUFFIXES = [
+        COLUMNAR_SUFFIX, METADATA_SUFFIX, PROFILE_SUFFIX, SCHEMA_SUFFIX, SAMPLE_SUFFIX, SEARCH_INDEX_SUFFIX
+    ]
+    
+    # Appended rows get their own columnar part, <stem>.part-00001.feather and so on
+    COLUMNAR_PART_SUFFIX = ".part-"
+    
+    # Loaded profiles by file path, as (version, profile)
+    _profiles: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+    
+    # Upper bound on how much of the upload is buffered to find the header line
+    MAX_HEADER_BYTES = 64 * 1024
+    
     @staticmethod
     def validate_file(file: UploadFile) -> None:
         """Validate uploaded file."""
@@ -30,33 +96,588 @@ class CSVHandler:
             )
     
     @staticmethod
-    async def save_file(file: UploadFile) -> str:
-        """Save uploaded file and return file path."""
-        # Create upload directory if it doesn't exist
-        os.makedirs(settings.upload_dir, exist_ok=True)
+    async def _receive(file: UploadFile, temp_path: str, max_size: int) -> SavedUpload:
+        """Stream an upload to temp_path in fixed-size chunks, learning its size, hash, rows and header."""
+        hasher = hashlib.sha256()
+        started = time.perf_counter()
+        size = 0
+        line_breaks = 0
+        in_quotes = False
+        header = b""
+        last_byte = b""
+        
+        # Write chunks off the event loop, enforcing the size limit as bytes arrive
+        try:
+            with open(temp_path, "wb") as buffer:
+                while chunk := await file.read(settings.upload_chunk_size):
+                    size += len(chunk)
+                    if size > max_size:
+                        raise HTTPException(
+                            status_code=400,
+                            detail=f"File too large. Maximum size: {settings.max_file_size} bytes"
+                        )
+                    
+                    hasher.update(chunk)
+                    chunk_breaks, in_quotes = CSVHandler._count_line_breaks(chunk, in_quotes)
+                    line_breaks += chunk_breaks
+                    if b"\n" not in header and len(header) < CSVHandler.MAX_HEADER_BYTES:
+                        header += chunk[:CSVHandler.MAX_HEADER_BYTES - len(header)]
+                    last_byte = chunk[-1:]
+                    
+                    await run_in_threadpool(buffer.write, chunk)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        
+        columns = CSVHandler.sniff_header(header)
+        if not columns:
+            os.remove(temp_path)
+            raise HTTPException(status_code=400, detail="File is empty or has no header row")
+        
+        # A final line without a trailing newline is still a row
+        lines = line_breaks + (1 if last_byte and last_byte != b"\n" else 0)
+        
+        elapsed = time.perf_counter() - started
+        metrics.inc("upload_bytes_total", size)
+        if elapsed > 0:
+            metrics.observe("upload_bytes_per_second", size / elapsed)
+        
+        return SavedUpload(
+            file_path=temp_path,
+            size=size,
+            sha256=hasher.hexdigest(),
+            rows=max(lines - 1, 0),
+            columns=columns
+        )
+    
+    @staticmethod
+    def _count_line_breaks(chunk: bytes, in_quotes: bool) -> Tuple[int, bool]:
+        """Count the newlines that end CSV records, skipping those inside quoted fields.
+        
+        Takes and returns whether the chunk starts (and ends) inside a quoted field.
+        An escaped quote ("") toggles the state twice, so counting quotes is enough.
+        """
+        if b'"' not in chunk:
+            return (0 if in_quotes else chunk.count(b"\n")), in_quotes
+        
+        data = np.frombuffer(chunk, dtype=np.uint8)
+        quotes = np.flatnonzero(data == ord('"'))
+        newlines = np.flatnonzero(data == ord("\n"))
+        # A newline ends a record when an even number of quotes (after the chunk's start state) precede it
+        quotes_before = np.searchsorted(quotes, newlines) + in_quotes
+        breaks = int(np.count_nonzero(quotes_before % 2 == 0))
+        return breaks, (len(quotes) + in_quotes) % 2 == 1
+    
+    @staticmethod
+    def count_rows(file_path: str) -> int:
+        """Count a stored CSV's data rows without parsing it, like uploads are counted as they arrive."""
+        line_breaks = 0
+        in_quotes = False
+        last_byte = b""
+        with open(file_path, "rb") as f:
+            while chunk := f.read(settings.upload_chunk_size):
+                chunk_breaks, in_quotes = CSVHandler._count_line_breaks(chunk, in_quotes)
+                line_breaks += chunk_breaks
+                last_byte = chunk[-1:]
+        
+        # A final line without a trailing newline is still a row
+        lines = line_breaks + (1 if last_byte and last_byte != b"\n" else 0)
+        return max(lines - 1, 0)
+    
+    @staticmethod
+    async def save_file(file: UploadFile, file_path: str) -> SavedUpload:
+        """Stream uploaded file to file_path in fixed-size chunks and return what was learned."""
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        saved = await CSVHandler._receive(file, f"{file_path}.part", settings.max_file_size)
+        
+        # Drop anything derived from whatever was stored at this path before
+        dataframe_cache.invalidate(file_path)
+        CSVHandler.remove_sidecars(file_path)
+        os.replace(saved.file_path, file_path)
+        
+        saved.file_path = file_path
+        CSVHandler.write_metadata(file_path, asdict(saved))
+        return saved
+    
+    @staticmethod
+    async def receive_append(file_path: str, file: UploadFile) -> SavedUpload:
+        """Stream rows to append next to the stored file and check they have its columns."""
+        metadata = CSVHandler.read_metadata(file_path) or {}
+        stored_columns = metadata.get("columns")
+        if stored_columns is None:
+            with open(file_path, "rb") as f:
+                stored_columns = CSVHandler.sniff_header(f.read(CSVHandler.MAX_HEADER_BYTES))
+        
+        delta = await CSVHandler._receive(
+            file, f"{file_path}.append.part", settings.max_file_size - os.path.getsize(file_path)
+        )
+        if delta.columns != stored_columns:
+            os.remove(delta.file_path)
+            raise HTTPException(
+                status_code=400,
+                detail=f"Columns do not match the stored file. Expected: {stored_columns}"
+            )
+        if not delta.rows:
+            os.remove(delta.file_path)
+            raise HTTPException(status_code=400, detail="No rows to append")
+        
+        return delta
+    
+    @staticmethod
+    def append_file(file_path: str, delta: SavedUpload) -> AppendedRows:
+        """Append received rows to the stored CSV, its columnar sidecar, metadata and profile.
+        
+        Only the new rows are parsed and profiled; the stored profile is merged with
+        the delta's, and the rows go into a new sidecar part instead of rewriting it.
+        """
+        try:
+            # Parse and validate the new rows before the stored file is touched
+            base_profile = CSVHandler.get_profile(file_path)
+            new_rows = CSVHandler._read_delta(delta.file_path, base_profile)
+            columnar_paths = CSVHandler.get_columnar_paths(file_path)
+            
+            # Widen compact dtypes the new rows overflow before the CSV grows past the stored schema
+            schema = CSVHandler.read_schema(file_path)
+            if schema:
+                schema = widen_schema(schema, new_rows)
+                CSVHandler.write_schema(file_path, schema)
+                new_rows = apply_schema(new_rows, schema)
+            
+            with open(file_path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                needs_newline = False
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    needs_newline = f.read(1) != b"\n"
+            
+            with open(file_path, "ab") as f, open(delta.file_path, "rb") as source:
+                if needs_newline:
+                    f.write(b"\n")
+                # Skip the delta's header row; the stored file already has one
+                source.readline()
+                shutil.copyfileobj(source, f, settings.upload_chunk_size)
+        finally:
+            os.remove(delta.file_path)
+        
+        dataframe_cache.invalidate(file_path)
+        CSVHandler._append_columnar(file_path, new_rows, columnar_paths)
+        
+        # Versions chain, so the new hash depends on every earlier upload and append
+        metadata = CSVHandler.read_metadata(file_path) or {}
+        version = hashlib.sha256(f"{base_profile['version']}:{delta.sha256}".encode()).hexdigest()
+        rows = base_profile["rows"] + len(new_rows)
+        metadata.update({
+            "file_path": file_path,
+            "size": os.path.getsize(file_path),
+            "sha256": version,
+            "rows": rows,
+            "columns": delta.columns,
+        })
+        CSVHandler.write_metadata(file_path, metadata)
+        
+        profile = DatasetProfiler.merge(base_profile, DatasetProfiler.profile(new_rows))
+        CSVHandler._store_profile(file_path, version, profile)
+        
+        return AppendedRows(
+            file_path=file_path,
+            appended_rows=len(new_rows),
+            rows=rows,
+            size=metadata["size"],
+            columns=delta.columns
+        )
+    
+    @staticmethod
+    def _read_delta(delta_path: str, profile: Dict[str, Any]) -> pd.DataFrame:
+        """Parse appended rows with the stored column types, rejecting values that don't fit."""
+        # Compact dtypes are checked by kind; the caller widens them if the values need it
+        dtypes = {col: base_dtype(stats["dtype"]) for col, stats in profile["columns"].items()}
+        try:
+            df = pd.read_csv(delta_path, dtype={col: object for col, dtype in dtypes.items() if dtype == "object"})
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Error reading CSV file: {str(e)}")
+        
+        for col, dtype in dtypes.items():
+            if str(df[col].dtype) == dtype:
+                continue
+            try:
+                converted = df[col].astype(dtype)
+                # Float-to-int casts truncate silently, so insist nothing changed
+                if ptypes.is_numeric_dtype(df[col]) and not (converted == df[col]).all():
+                    raise ValueError
+            except (ValueError, TypeError):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Column '{col}' has values that do not fit the stored type {dtype}"
+                )
+            df[col] = converted
+        return df
+    
+    @staticmethod
+    def sniff_header(header: bytes) -> List[str]:
+        """Parse column names from the first line of a CSV."""
+        first_line = header.split(b"\n", 1)[0].decode("utf-8-sig", errors="replace").strip("\r")
+        if not first_line:
+            return []
+        return next(csv.reader(io.StringIO(first_line)))
+    
+    @staticmethod
+    def write_metadata(file_path: str, metadata: Dict[str, Any]) -> None:
+        """Persist upload metadata next to the CSV."""
+        metadata_path = CSVHandler.get_sidecar_path(file_path, CSVHandler.METADATA_SUFFIX)
+        with open(metadata_path, "w") as f:
+            json.dump(metadata, f)
+    
+    @staticmethod
+    def read_metadata(file_path: str) -> Optional[Dict[str, Any]]:
+        """Load upload metadata stored next to the CSV, if any."""
+        metadata_path = CSVHandler.get_sidecar_path(file_path, CSVHandler.METADATA_SUFFIX)
+        if not os.path.exists(metadata_path):
+            return None
+        with open(metadata_path) as f:
+            return json.load(f)
+    
+    @staticmethod
+    def write_schema(file_path: str, schema: Dict[str, str]) -> None:
+        """Persist the column dtypes later loads of the CSV are parsed with."""
+        schema_path = CSVHandler.get_sidecar_path(file_path, CSVHandler.SCHEMA_SUFFIX)
+        temp_path = f"{schema_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(schema, f)
+        os.replace(temp_path, schema_path)
+    
+    @staticmethod
+    def read_schema(file_path: str) -> Optional[Dict[str, str]]:
+        """Load the stored column dtypes of the CSV, if any."""
+        schema_path = CSVHandler.get_sidecar_path(file_path, CSVHandler.SCHEMA_SUFFIX)
+        if not os.path.exists(schema_path):
+            return None
+        with open(schema_path) as f:
+            return json.load(f)
+    
+    @staticmethod
+    def optimize_dtypes(file_path: str, df: pd.DataFrame) -> OptimizedFrame:
+        """Infer and store a compact schema for a new upload and cast its parsed frame to it."""
+        memory_before = int(df.memory_usage(deep=True).sum())
+        if not settings.dtype_optimization_enabled:
+            return OptimizedFrame(df, memory_before, memory_before)
+        
+        schema = infer_schema(df)
+        CSVHandler.write_schema(file_path, schema)
+        df = apply_schema(df.copy(deep=False), schema)
+        memory_after = int(df.memory_usage(deep=True).sum())
+        if shared_datasets.enabled:
+            df = CSVHandler._share(CSVHandler.shared_key(file_path), df)
+        
+        # Replace the default parse in the cache with the compact frame
+        dataframe_cache.put(dataframe_cache.make_key(file_path, None), df)
+        return OptimizedFrame(df, memory_before, memory_after)
+    
+    @staticmethod
+    def write_search_index(file_path: str, df: pd.DataFrame) -> int:
+        """Index a loaded file's text columns and store the indexes next to it; return how many."""
+        built = search_indexes.build(df)
+        if built:
+            index_path = CSVHandler.get_sidecar_path(file_path, CSVHandler.SEARCH_INDEX_SUFFIX)
+            search_indexes.save(df, index_path, CSVHandler.get_content_hash(file_path))
+        return built
+    
+    @staticmethod
+    def read_search_index(file_path: str, df: pd.DataFrame) -> int:
+        """Load the indexes stored for the file's current content as the indexes of df, the file loaded whole."""
+        index_path = CSVHandler.get_sidecar_path(file_path, CSVHandler.SEARCH_INDEX_SUFFIX)
+        if not search_indexes.enabled or not os.path.exists(index_path):
+            return 0
+        return search_indexes.load(df, index_path, CSVHandler.get_content_hash(file_path))
+    
+    @staticmethod
+    def get_profile(
+        file_path: str, df: Optional[pd.DataFrame] = None, total_rows: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Get the dataset profile for the current file version, building and storing it once.
+        
+        When df is a sample of a large file, total_rows is the row count of the whole file.
+        """
+        version = CSVHandler.get_content_hash(file_path)
+        
+        loaded = CSVHandler._profiles.get(file_path)
+        if loaded and loaded[0] == version:
+            return loaded[1]
         
-        # Generate unique filename
-        file_path = os.path.join(settings.upload_dir, file.filename)
+        profile_path = CSVHandler.get_sidecar_path(file_path, CSVHandler.PROFILE_SUFFIX)
+        profile = None
+        if os.path.exists(profile_path):
+            with open(profile_path) as f:
+                profile = json.load(f)
         
-        # Save file
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        if not profile or profile.get("version") != version:
+            if df is None:
+                df = CSVHandler.read_csv(file_path)
+            profile = DatasetProfiler.profile(df)
+            if total_rows is not None:
+                # Column statistics describe the sample, the row count the file
+                profile.update(rows=total_rows, sampled=True)
+            return CSVHandler._store_profile(file_path, version, profile)
         
-        return file_path
+        CSVHandler._profiles[file_path] = (version, profile)
+        return profile
+    
+    @staticmethod
+    def _store_profile(file_path: str, version: str, profile: Dict[str, Any]) -> Dict[str, Any]:
+        """Persist a profile for one file version and keep it loaded."""
+        profile["version"] = version
+        profile_path = CSVHandler.get_sidecar_path(file_path, CSVHandler.PROFILE_SUFFIX)
+        temp_path = f"{profile_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(profile, f)
+        os.replace(temp_path, profile_path)
+        
+        CSVHandler._profiles[file_path] = (version, profile)
+        return profile
+    
+    @staticmethod
+    def get_content_hash(file_path: str) -> str:
+        """Get the SHA-256 of the file, from upload metadata when it is current."""
+        metadata = CSVHandler.read_metadata(file_path)
+        if metadata and metadata.get("size") == os.path.getsize(file_path):
+            metadata_path = CSVHandler.get_sidecar_path(file_path, CSVHandler.METADATA_SUFFIX)
+            if os.stat(metadata_path).st_mtime_ns >= os.stat(file_path).st_mtime_ns:
+                return metadata["sha256"]
+        
+        # Files that predate streaming uploads are hashed on demand
+        hasher = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            while chunk := f.read(settings.upload_chunk_size):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+    
+    @staticmethod
+    def get_sidecar_path(file_path: str, suffix: str) -> str:
+        """Get the path of a derived file stored next to the CSV."""
+        return os.path.splitext(file_path)[0] + suffix
     
     @staticmethod
-    def read_csv(file_path: str) -> pd.DataFrame:
-        """Read CSV file and return DataFrame."""
+    def get_columnar_part_paths(file_path: str) -> List[str]:
+        """List the columnar parts written for appends, in append order."""
+        directory, name = os.path.split(CSVHandler.get_sidecar_path(file_path, CSVHandler.COLUMNAR_PART_SUFFIX))
+        if not os.path.isdir(directory or "."):
+            return []
+        return sorted(
+            os.path.join(directory, entry) for entry in os.listdir(directory or ".")
+            if entry.startswith(name) and entry.endswith(CSVHandler.COLUMNAR_SUFFIX)
+        )
+    
+    @staticmethod
+    def remove_sidecars(file_path: str) -> None:
+        """Remove all derived files stored next to the CSV."""
+        for sidecar_path in CSVHandler.get_columnar_part_paths(file_path):
+            os.remove(sidecar_path)
+        for suffix in CSVHandler.SIDECAR_SUFFIXES:
+            sidecar_path = CSVHandler.get_sidecar_path(file_path, suffix)
+            if os.path.exists(sidecar_path):
+                os.remove(sidecar_path)
+    
+    @staticmethod
+    def get_columnar_paths(file_path: str) -> List[str]:
+        """Get the columnar sidecar and its appended parts if they are up to date with the CSV."""
+        columnar_paths = [CSVHandler.get_sidecar_path(file_path, CSVHandler.COLUMNAR_SUFFIX)]
+        columnar_paths += CSVHandler.get_columnar_part_paths(file_path)
+        
+        # A sidecar older than its CSV was written for a previous upload
+        csv_mtime = os.stat(file_path).st_mtime_ns
+        for columnar_path in columnar_paths:
+            if not os.path.exists(columnar_path) or os.stat(columnar_path).st_mtime_ns < csv_mtime:
+                return []
+        
+        return columnar_paths
+    
+    @staticmethod
+    def read_columnar(columnar_paths: List[str], columns: Optional[List[str]] = None, memory_map: bool = True) -> pd.DataFrame:
+        """Load a columnar sidecar and its parts as one DataFrame."""
+        tables = [
+            feather.read_table(columnar_path, columns=columns, memory_map=memory_map)
+            for columnar_path in columnar_paths
+        ]
+        # Keep strings Arrow-backed rather than converting them to Python objects
+        types_mapper = CSVHandler._arrow_string if settings.dtype_optimization_enabled else None
+        return pa.concat_tables(tables).to_pandas(types_mapper=types_mapper)
+    
+    @staticmethod
+    def _arrow_string(arrow_type: pa.DataType) -> Optional[pd.StringDtype]:
+        if arrow_type in (pa.string(), pa.large_string()):
+            return pd.StringDtype("pyarrow")
+        return None
+    
+    @staticmethod
+    def write_columnar(file_path: str, df: pd.DataFrame, columnar_path: Optional[str] = None) -> Optional[str]:
+        """Convert a parsed CSV (or appended rows) into an uncompressed Feather sidecar and return its path."""
+        if not settings.columnar_sidecar_enabled:
+            return None
+        
+        columnar_path = columnar_path or CSVHandler.get_sidecar_path(file_path, CSVHandler.COLUMNAR_SUFFIX)
+        temp_path = f"{columnar_path}.tmp"
         try:
-            df = pd.read_csv(file_path)
+            # Uncompressed so the file can be memory-mapped without decoding
+            feather.write_feather(df, temp_path, compression="uncompressed")
+            os.replace(temp_path, columnar_path)
+            return columnar_path
+        except (pa.ArrowException, ValueError, TypeError):
+            # Columns Arrow cannot type (e.g. mixed objects) keep using the CSV
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return None
+    
+    @staticmethod
+    def _append_columnar(file_path: str, df: pd.DataFrame, columnar_paths: List[str]) -> None:
+        """Store appended rows as a new sidecar part in the sidecar's schema, widening the parts if needed.
+        
+        Parts must share one schema to be read back as one table. Rows that fit
+        the stored types are cast to them; rows that overflow them (e.g. int8 to
+        int16) get the promoted types, and the stored parts are rewritten to match.
+        The sidecar is only dropped when the rows have no common type with it.
+        """
+        if not columnar_paths:
+            return
+        
+        part_path = CSVHandler.get_sidecar_path(
+            file_path, f"{CSVHandler.COLUMNAR_PART_SUFFIX}{len(columnar_paths):05d}{CSVHandler.COLUMNAR_SUFFIX}"
+        )
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            schema = feather.read_table(columnar_paths[0], memory_map=True).schema
+            try:
+                table = table.cast(schema)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                schema = pa.unify_schemas([schema, table.schema], promote_options="permissive")
+                table = table.cast(schema)
+                for columnar_path in columnar_paths:
+                    CSVHandler._write_table(columnar_path, feather.read_table(columnar_path).cast(schema))
+            CSVHandler._write_table(part_path, table)
+        except (pa.ArrowException, ValueError, TypeError):
+            # The CSV now has rows the sidecar lacks, so it is read from the CSV until the next upload
+            for columnar_path in columnar_paths + [part_path]:
+                if os.path.exists(columnar_path):
+                    os.remove(columnar_path)
+            return
+        
+        # Earlier parts still describe the CSV's leading rows, so keep them current
+        for columnar_path in columnar_paths:
+            os.utime(columnar_path)
+    
+    @staticmethod
+    def _write_table(columnar_path: str, table: pa.Table) -> None:
+        """Write an Arrow table as an uncompressed Feather file, replacing columnar_path atomically."""
+        temp_path = f"{columnar_path}.tmp"
+        try:
+            feather.write_feather(table, temp_path, compression="uncompressed")
+            os.replace(temp_path, columnar_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    
+    @staticmethod
+    def _load(file_path: str, columns: Optional[List[str]]) -> pd.DataFrame:
+        """Load from the columnar sidecar when available, otherwise parse the CSV with its stored schema."""
+        columnar_paths = CSVHandler.get_columnar_paths(file_path)
+        if columnar_paths:
+            return CSVHandler.read_columnar(columnar_paths, columns, settings.columnar_memory_map)
+        
+        schema = CSVHandler.read_schema(file_path)
+        if not schema:
+            return pd.read_csv(file_path, usecols=columns)
+        
+        if columns:
+            schema = {col: dtype for col, dtype in schema.items() if col in columns}
+        df = pd.read_csv(file_path, usecols=columns, **read_options(schema))
+        # Datetimes (and anything the parser engine ignored) are cast after parsing
+        return apply_schema(df, schema)
+    
+    @staticmethod
+    def shared_key(file_path: str) -> str:
+        """Identify a file's loaded data across processes: its content hash and stored compact schema."""
+        content_hash = CSVHandler.get_content_hash(file_path)
+        schema = CSVHandler.read_schema(file_path)
+        if not schema:
+            return content_hash
+        return hashlib.sha256(f"{content_hash}:{json.dumps(schema, sort_keys=True)}".encode()).hexdigest()
+    
+    @staticmethod
+    def read_shared(key: str, columns: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+        """Attach a dataset another process already loaded and published to shared memory."""
+        types_mapper = CSVHandler._arrow_string if settings.dtype_optimization_enabled else None
+        return shared_datasets.attach(key, columns, types_mapper)
+    
+    @staticmethod
+    def _share(key: str, df: pd.DataFrame) -> pd.DataFrame:
+        """Publish a loaded frame to shared memory and swap it for the shared copy, if it can be."""
+        if shared_datasets.publish(key, df):
+            shared = CSVHandler.read_shared(key)
+            if shared is not None:
+                return shared
+        return df
+    
+    @staticmethod
+    def _load_shared(file_path: str, columns: Optional[List[str]]) -> pd.DataFrame:
+        """Attach the file's data from shared memory, loading and publishing it first if no process has."""
+        if not shared_datasets.enabled:
+            return CSVHandler._load(file_path, columns)
+        
+        key = CSVHandler.shared_key(file_path)
+        df = CSVHandler.read_shared(key, columns)
+        if df is not None:
+            return df
+        
+        df = CSVHandler._load(file_path, columns)
+        # Column subsets, and a new upload's default parse that is about to be compacted, stay private
+        if columns or (settings.dtype_optimization_enabled and not CSVHandler.read_schema(file_path)):
             return df
+        return CSVHandler._share(key, df)
+    
+    @staticmethod
+    def read_csv(file_path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Read CSV file and return DataFrame, reusing a cached parse when possible."""
+        try:
+            with stage("read_csv"):
+                key = dataframe_cache.make_key(file_path, tuple(columns) if columns else None)
+                df = dataframe_cache.get(key)
+                if df is None:
+                    with stage("parse_csv"):
+                        df = CSVHandler._load_shared(file_path, columns)
+                    if not columns:
+                        CSVHandler.read_search_index(file_path, df)
+                    dataframe_cache.put(key, df)
+                
+                # Copy so column assignments in callers don't leak into the cache, and so shared (read-only)
+                # columns can be written; the dataset stays attached while the copy is alive
+                return shared_datasets.copy(df)
         except Exception as e:
             raise HTTPException(
                 status_code=400,
                 detail=f"Error reading CSV file: {str(e)}"
             )
     
+    @staticmethod
+    def copy_file(file_path: str, copy_path: str) -> str:
+        """Copy a stored CSV with its derived files, keeping their timestamps so the copies stay current."""
+        shutil.copy2(file_path, copy_path)
+        for suffix in CSVHandler.SIDECAR_SUFFIXES:
+            sidecar_path = CSVHandler.get_sidecar_path(file_path, suffix)
+            if os.path.exists(sidecar_path):
+                shutil.copy2(sidecar_path, CSVHandler.get_sidecar_path(copy_path, suffix))
+        copy_stem = os.path.splitext(copy_path)[0]
+        stem = os.path.splitext(file_path)[0]
+        for part_path in CSVHandler.get_columnar_part_paths(file_path):
+            shutil.copy2(part_path, copy_stem + part_path[len(stem):])
+        return copy_path
+    
+    @staticmethod
+    def delete_file(file_path: str) -> None:
+        """Delete an uploaded file, its derived files and any cached parse of it."""
+        dataframe_cache.invalidate(file_path)
+        CSVHandler._profiles.pop(file_path, None)
+        CSVHandler.remove_sidecars(file_path)
+        os.remove(file_path)
+    
     @staticmethod
     def get_csv_info(df: pd.DataFrame) -> Tuple[int, List[str]]:
         """Get basic information about CSV data."""
@@ -65,8 +686,11 @@ class CSVHandler:
         return rows, columns
     
     @staticmethod
-    def get_csv_summary(df: pd.DataFrame) -> str:
-        """Get a summary of the CSV data."""
+    def get_csv_summary(df: pd.DataFrame, profile: Optional[Dict[str, Any]] = None) -> str:
+        """Get a summary of the CSV data, using the stored profile for statistics."""
+        if profile is None:
+            profile = DatasetProfiler.profile(df)
+        
         summary = f"""
 CSV Data Summary:
 - Rows: {len(df)}
@@ -80,6 +704,6 @@ First 5 rows:
 {df.head().to_string()}
 
 Basic Statistics:
-{df.describe().to_string()}
+{DatasetProfiler.describe(profile)}
 """
         return summary 
\ No newline at end of file
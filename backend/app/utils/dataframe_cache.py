@@ -0,0 +1,88 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+import pandas as pd
+from app.core.config import settings
+
+
+class DataFrameCache:
+    """Bounded LRU cache of parsed DataFrames, evicted by total memory footprint."""
+
+    def __init__(self, max_bytes: int):
+        """Initialize an empty cache holding at most max_bytes of DataFrames."""
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple, Tuple[pd.DataFrame, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(file_path: str, *extra: Any) -> Tuple:
+        """Build a cache key from the file identity (path, mtime, size)."""
+        stat = os.stat(file_path)
+        return (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size) + extra
+
+    def get(self, key: Tuple) -> Optional[pd.DataFrame]:
+        """Return the cached DataFrame for key, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Tuple, df: pd.DataFrame) -> None:
+        """Store a DataFrame, evicting least recently used entries over budget."""
+        size = int(df.memory_usage(deep=True).sum())
+
+        # Frames larger than the whole budget are never cached
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+
+            self._entries[key] = (df, size)
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, file_path: str) -> None:
+        """Drop every cached version of a file."""
+        path = os.path.abspath(file_path)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == path]:
+                self.current_bytes -= self._entries.pop(key)[1]
+
+    def clear(self) -> None:
+        """Drop all cached DataFrames."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current memory usage."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "current_bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+dataframe_cache = DataFrameCache(settings.dataframe_cache_max_bytes)
@@ -0,0 +1,112 @@
+import re
+from typing import Any, Dict
+import numpy as np
+import pandas as pd
+from pandas.api import types as ptypes
+from app.core.config import settings
+
+ARROW_STRING = "string[pyarrow]"
+DATETIME = "datetime64[ns]"
+
+# ISO 8601 dates and timestamps without a UTC offset; other formats stay text
+ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?")
+
+# Values checked against ISO_DATE before parsing a whole column
+DATE_SAMPLE_SIZE = 1000
+
+
+def _is_date_column(values: pd.Series) -> bool:
+    """Whether every value is an ISO 8601 date or timestamp."""
+    sample = values.iloc[:DATE_SAMPLE_SIZE]
+    if not all(ISO_DATE.fullmatch(value) for value in sample):
+        return False
+    try:
+        pd.to_datetime(values, format="ISO8601")
+    except (ValueError, TypeError, OverflowError):
+        return False
+    return True
+
+
+def _float32_is_lossless(series: pd.Series) -> bool:
+    """Whether every value survives a round trip through float32."""
+    values = series.to_numpy(dtype="float64", na_value=np.nan)
+    with np.errstate(over="ignore"):
+        narrowed = values.astype("float32").astype("float64")
+    return bool(np.all((narrowed == values) | np.isnan(values)))
+
+
+def infer_schema(df: pd.DataFrame) -> Dict[str, str]:
+    """Pick a compact dtype for each text column; numeric columns keep pandas' 64-bit types.
+
+    The frame is what analysis code computes on, and NumPy arithmetic on narrow
+    integers wraps around silently (int8 120 * 12 is -96), so integers and floats
+    are left as parsed. ISO 8601 text is parsed as datetimes, low-cardinality
+    strings (at most category_max_unique distinct values, and at most
+    category_max_ratio of the non-null values) become categories and the
+    remaining strings are Arrow-backed.
+    """
+    schema = {}
+    for col in df.columns:
+        series = df[col]
+        dtype = str(series.dtype)
+
+        if ptypes.is_object_dtype(series):
+            values = series.dropna()
+            if len(values) and pd.api.types.infer_dtype(values, skipna=False) == "string":
+                if _is_date_column(values):
+                    dtype = DATETIME
+                elif values.nunique() <= min(settings.category_max_unique, settings.category_max_ratio * len(values)):
+                    dtype = "category"
+                else:
+                    dtype = ARROW_STRING
+
+        schema[str(col)] = dtype
+    return schema
+
+
+def apply_schema(df: pd.DataFrame, schema: Dict[str, str]) -> pd.DataFrame:
+    """Cast the columns of df to the schema's dtypes."""
+    for col, dtype in schema.items():
+        if col not in df.columns or str(df[col].dtype) == dtype:
+            continue
+        if dtype == DATETIME and not ptypes.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], format="ISO8601")
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def widen_schema(schema: Dict[str, str], df: pd.DataFrame) -> Dict[str, str]:
+    """Widen compact numeric dtypes (in schemas stored before numerics kept 64-bit types) so new rows still fit."""
+    widened = dict(schema)
+    for col, dtype in schema.items():
+        if col not in df.columns or not len(df):
+            continue
+        series = df[col]
+        if dtype.startswith("int") and ptypes.is_integer_dtype(series):
+            needed = pd.to_numeric(series, downcast="integer").dtype
+            widened[col] = str(np.promote_types(np.dtype(dtype), needed))
+        elif dtype == "float32" and not _float32_is_lossless(series):
+            widened[col] = "float64"
+    return widened
+
+
+def base_dtype(dtype: str) -> str:
+    """The dtype pandas' default parser gives values stored as dtype."""
+    if dtype.startswith(("int", "uint")):
+        return "int64"
+    if dtype.startswith("float"):
+        return "float64"
+    if dtype in ("category", ARROW_STRING) or dtype.startswith("string"):
+        return "object"
+    return dtype
+
+
+def read_options(schema: Dict[str, str]) -> Dict[str, Any]:
+    """Keyword arguments that make pd.read_csv parse straight into the schema's dtypes."""
+    options: Dict[str, Any] = {
+        "dtype": {col: dtype for col, dtype in schema.items() if dtype != DATETIME}
+    }
+    if settings.csv_engine != "c":
+        options["engine"] = settings.csv_engine
+    return options
@@ -0,0 +1,360 @@
+import asyncio
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import HTTPException
+from app.core.config import settings
+from app.utils.csv_handler import CSVHandler
+from app.utils.large_files import large_files
+from app.utils.llm_gateway import llm_gateway
+from app.utils.worker_pool import worker_pool
+
+# Job statuses; the last three are final
+QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED = "queued", "running", "completed", "failed", "cancelled"
+
+
+@dataclass
+class InsightJob:
+    """One insights generation for a file version."""
+    job_id: str
+    filename: str
+    file_path: str
+    dataset_hash: str
+    priority: int
+    status: str
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+# Stored job columns, in InsightJob field order; each row also records the process that owns it
+JOB_COLUMNS = ", ".join(field.name for field in fields(InsightJob))
+
+
+class InsightJobQueue:
+    """Background queue that generates insights off the request path.
+
+    Jobs run highest priority first on a fixed number of asyncio workers. A job
+    for a file version that is already queued or running is deduplicated onto
+    the existing job, and a completed result for the same version is served
+    from storage. Jobs and results are persisted in SQLite.
+
+    Several processes can share the database. Each holds a lease on its
+    unfinished jobs, renewed while it runs; a process only takes over queued or
+    running jobs whose lease has expired, so their owner is gone.
+    """
+
+    def __init__(self, path: str, workers: int, max_stored: int, lease_seconds: float):
+        """Open (or create) the job database; workers start on first use."""
+        self.workers = workers
+        self.max_stored = max_stored
+        self.lease_seconds = lease_seconds
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, filename TEXT NOT NULL, file_path TEXT NOT NULL, "
+            "dataset_hash TEXT NOT NULL, priority INTEGER NOT NULL, status TEXT NOT NULL, "
+            "created_at TEXT NOT NULL, started_at TEXT, finished_at TEXT, result TEXT, error TEXT, "
+            "owner TEXT, lease_until REAL)"
+        )
+        # Databases created before leases lack their columns
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, column_type in (("owner", "TEXT"), ("lease_until", "REAL")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_dataset ON jobs (filename, dataset_hash, status)")
+        self._db_lock = threading.Lock()
+
+        # Queued and running jobs, and the job id for each pending file version
+        self._jobs: Dict[str, InsightJob] = {}
+        self._pending: Dict[Tuple[str, str], str] = {}
+        self._finished: Dict[str, asyncio.Event] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._workers: List[asyncio.Task] = []
+        self._lease_task: Optional[asyncio.Task] = None
+        # Identifies this process's claim on jobs; set on start, after any fork
+        self._owner: Optional[str] = None
+        self._order = itertools.count()
+        self._service = None
+        self._stopping = False
+        self.submitted = 0
+        self.deduplicated = 0
+        self.served_from_storage = 0
+
+    def start(self) -> None:
+        """Start the workers and take over unfinished jobs whose owner is gone."""
+        if self._queue is not None:
+            return
+        self._owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+        self._queue = asyncio.PriorityQueue()
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._lease_task = asyncio.create_task(self._keep_leases())
+        self._recover()
+
+    async def stop(self) -> None:
+        """Stop the workers; unfinished jobs stay queued in storage, free for any process to take over."""
+        if self._queue is None:
+            return
+        self._stopping = True
+        for task in [self._lease_task] + self._workers + list(self._running.values()):
+            task.cancel()
+        await asyncio.gather(self._lease_task, *self._workers, *self._running.values(), return_exceptions=True)
+        with self._db_lock:
+            self._conn.execute(
+                "UPDATE jobs SET lease_until = NULL WHERE owner = ? AND status IN (?, ?)",
+                (self._owner, QUEUED, RUNNING)
+            )
+        self._jobs.clear()
+        self._pending.clear()
+        self._finished.clear()
+        self._queue, self._workers, self._lease_task, self._stopping = None, [], None, False
+
+    async def submit(self, filename: str, file_path: str, priority: int = 0) -> InsightJob:
+        """Queue insights for the file's current version, reusing a pending or completed job for it."""
+        self.start()
+        dataset_hash = await worker_pool.run("hash_file", CSVHandler.get_content_hash, file_path)
+        key = (filename, dataset_hash)
+        self.submitted += 1
+
+        job_id = self._pending.get(key)
+        if job_id:
+            self.deduplicated += 1
+            job = self._jobs[job_id]
+            if priority > job.priority and job.status == QUEUED:
+                # Queue it again at the higher priority; the stale entry is skipped
+                job.priority = priority
+                self._save(job)
+                self._queue.put_nowait((-priority, next(self._order), job_id))
+            return job
+
+        completed = self._find_completed(filename, dataset_hash)
+        if completed:
+            self.served_from_storage += 1
+            return completed
+
+        job = InsightJob(
+            job_id=uuid.uuid4().hex,
+            filename=filename,
+            file_path=file_path,
+            dataset_hash=dataset_hash,
+            priority=priority,
+            status=QUEUED,
+            created_at=datetime.now().isoformat()
+        )
+        self._enqueue(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[InsightJob]:
+        """Return a job, pending or finished."""
+        job = self._jobs.get(job_id)
+        if job:
+            return job
+        with self._db_lock:
+            row = self._conn.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._from_row(row) if row else None
+
+    def cancel(self, job_id: str) -> InsightJob:
+        """Cancel a queued or running job."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            job = self.get(job_id)
+            if job is None:
+                raise HTTPException(status_code=404, detail="Job not found")
+            raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+
+        task = self._running.get(job_id)
+        if task:
+            # The job records its own cancellation when the task unwinds
+            task.cancel()
+        else:
+            job.error = "Cancelled"
+            self._finish(job, CANCELLED)
+        return job
+
+    async def wait(self, job_id: str) -> InsightJob:
+        """Wait for a job to finish; the job keeps running if the waiter goes away."""
+        event = self._finished.get(job_id)
+        if event:
+            await event.wait()
+        return self.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return worker count, queue depth and submission counters."""
+        statuses = [job.status for job in self._jobs.values()]
+        return {
+            "workers": self.workers,
+            "queued": statuses.count(QUEUED),
+            "running": statuses.count(RUNNING),
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "served_from_storage": self.served_from_storage,
+        }
+
+    def _recover(self) -> None:
+        """Claim and requeue the queued or running jobs whose owner's lease has expired."""
+        now = time.time()
+        with self._db_lock:
+            rows = self._conn.execute(
+                f"SELECT {JOB_COLUMNS} FROM jobs WHERE status IN (?, ?) AND (lease_until IS NULL OR lease_until < ?) "
+                "ORDER BY created_at",
+                (QUEUED, RUNNING, now)
+            ).fetchall()
+
+        for row in rows:
+            job = self._from_row(row)
+            with self._db_lock:
+                # Claimed only if no other process claimed or renewed it since the lookup
+                claimed = self._conn.execute(
+                    "UPDATE jobs SET owner = ?, lease_until = ? WHERE job_id = ? AND status IN (?, ?) "
+                    "AND (lease_until IS NULL OR lease_until < ?)",
+                    (self._owner, now + self.lease_seconds, job.job_id, QUEUED, RUNNING, now)
+                ).rowcount
+            if claimed:
+                job.status, job.started_at = QUEUED, None
+                self._enqueue(job)
+
+    async def _keep_leases(self) -> None:
+        """Renew the lease on this process's unfinished jobs, and take over those of processes that are gone."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            with self._db_lock:
+                self._conn.execute(
+                    "UPDATE jobs SET lease_until = ? WHERE owner = ? AND status IN (?, ?)",
+                    (time.time() + self.lease_seconds, self._owner, QUEUED, RUNNING)
+                )
+            self._recover()
+
+    def _enqueue(self, job: InsightJob) -> None:
+        self._jobs[job.job_id] = job
+        self._pending[(job.filename, job.dataset_hash)] = job.job_id
+        self._finished[job.job_id] = asyncio.Event()
+        self._save(job)
+        self._queue.put_nowait((-job.priority, next(self._order), job.job_id))
+
+    async def _work(self) -> None:
+        """Run queued jobs one at a time."""
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            if job is None or job.status != QUEUED:
+                # Cancelled while queued, or a stale entry from a priority bump
+                continue
+
+            task = asyncio.create_task(self._run(job))
+            self._running[job_id] = task
+            try:
+                # Not awaited directly, so stopping the worker doesn't cancel the job
+                await asyncio.wait([task])
+            finally:
+                self._running.pop(job_id, None)
+
+    async def _run(self, job: InsightJob) -> None:
+        """Generate and store the insights for one job."""
+        job.status, job.started_at = RUNNING, datetime.now().isoformat()
+        self._save(job)
+        try:
+            if large_files.is_large(job.file_path):
+                # Insights on a large file come from its stratified sample
+                df = (await worker_pool.run("load_sample", large_files.get_sample, job.file_path)).df
+            else:
+                df = await worker_pool.run("read_csv", CSVHandler.read_csv, job.file_path)
+            # Built off the event loop: the first build imports LangChain, or waits for warm-up to
+            service = await asyncio.to_thread(self.get_service)
+            result = await service.generate_insights(df, job.filename, job.file_path)
+            job.result = result.model_dump()
+            self._finish(job, COMPLETED)
+        except asyncio.CancelledError:
+            if self._stopping:
+                # Shutting down, not cancelled by a user; run it again after restart
+                job.status, job.started_at = QUEUED, None
+                self._save(job)
+                return
+            job.error = "Cancelled"
+            self._finish(job, CANCELLED)
+        except HTTPException as e:
+            job.error = str(e.detail)
+            self._finish(job, FAILED)
+        except Exception as e:
+            job.error = str(e)
+            self._finish(job, FAILED)
+
+    def get_service(self):
+        """Create the insights service on first use, so a missing API key only fails insights jobs."""
+        if self._service is None:
+            with llm_gateway.import_lock:
+                if self._service is None:
+                    # Imported here to keep the LLM client out of module import
+                    from app.utils.insights_service import InsightsService
+                    self._service = InsightsService()
+        return self._service
+
+    def _finish(self, job: InsightJob, status: str) -> None:
+        job.status, job.finished_at = status, datetime.now().isoformat()
+        self._save(job)
+        self._jobs.pop(job.job_id, None)
+        if self._pending.get((job.filename, job.dataset_hash)) == job.job_id:
+            del self._pending[(job.filename, job.dataset_hash)]
+        event = self._finished.pop(job.job_id, None)
+        if event:
+            event.set()
+        self._trim()
+
+    def _find_completed(self, filename: str, dataset_hash: str) -> Optional[InsightJob]:
+        with self._db_lock:
+            row = self._conn.execute(
+                f"SELECT {JOB_COLUMNS} FROM jobs WHERE filename = ? AND dataset_hash = ? AND status = ? "
+                "ORDER BY finished_at DESC LIMIT 1",
+                (filename, dataset_hash, COMPLETED)
+            ).fetchone()
+        return self._from_row(row) if row else None
+
+    def _save(self, job: InsightJob) -> None:
+        """Store a job of this process, leased to it while unfinished."""
+        lease_until = time.time() + self.lease_seconds if job.status in (QUEUED, RUNNING) else None
+        with self._db_lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO jobs ({JOB_COLUMNS}, owner, lease_until) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job.job_id, job.filename, job.file_path, job.dataset_hash, job.priority, job.status,
+                    job.created_at, job.started_at, job.finished_at,
+                    json.dumps(job.result) if job.result is not None else None, job.error,
+                    self._owner, lease_until
+                )
+            )
+
+    def _trim(self) -> None:
+        """Drop the oldest finished jobs beyond max_stored."""
+        with self._db_lock:
+            self._conn.execute(
+                "DELETE FROM jobs WHERE job_id IN ("
+                "SELECT job_id FROM jobs WHERE status IN (?, ?, ?) ORDER BY finished_at DESC LIMIT -1 OFFSET ?)",
+                (COMPLETED, FAILED, CANCELLED, self.max_stored)
+            )
+
+    @staticmethod
+    def _from_row(row: tuple) -> InsightJob:
+        job = InsightJob(*row)
+        if job.result is not None:
+            job.result = json.loads(job.result)
+        return job
+
+
+insight_jobs = InsightJobQueue(
+    settings.insight_jobs_path,
+    settings.insight_jobs_workers,
+    settings.insight_jobs_max_stored,
+    settings.insight_jobs_lease_seconds
+)
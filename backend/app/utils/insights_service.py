@@ -1,107 +1,108 @@
 import pandas as pd
-from typing import Dict, Any
-from langchain_openai import ChatOpenAI
+from typing import Dict, Any, List, Optional, Tuple
+from fastapi import HTTPException
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_experimental.tools import PythonAstREPLTool
-from app.schemas.insights import Card, Chart, InsightsResponse
+from app.schemas.insights import Chart, ChartSpec, InsightsPlan, InsightsResponse
 from app.core.config import settings
+from app.utils.llm_gateway import llm_gateway
+from app.utils.worker_pool import worker_pool
+from app.utils.csv_handler import CSVHandler
+from app.utils.profiler import DatasetProfiler
+from app.utils.context_builder import context_builder, count_tokens
+from app.utils.chart_builder import chart_builder
+from app.utils.instrumentation import metrics, stage
 
 
 class InsightsService:
-    """Service for generating structured insights from CSV data using real Python execution."""
+    """Service for generating structured insights from CSV data using precomputed statistics."""
     
     def __init__(self):
         """Initialize insights service."""
-        if not settings.openai_api_key:
-            raise ValueError("OpenAI API key not found in environment variables")
-        
-        # Initialize OpenAI model
-        self.llm = ChatOpenAI(
-            model="gpt-4o",
-            temperature=0.1,
-            api_key=settings.openai_api_key
-        )
+        # Use the process-wide chat model shared through the LLM gateway
+        self.llm = llm_gateway.get_llm()
     
-    async def generate_insights(self, df: pd.DataFrame, filename: str) -> InsightsResponse:
+    async def generate_insights(self, df: pd.DataFrame, filename: str, file_path: Optional[str] = None) -> InsightsResponse:
         """Generate structured insights (card and chart) from CSV data using real calculations."""
         try:
-            # Step 1: Use Python execution to get real calculated values
-            calculated_metrics = await self._calculate_real_metrics(df)
+            # Step 1: Get real calculated values from the stored dataset profile
+            with stage("insights_metrics"):
+                if file_path:
+                    profile = await worker_pool.run("profile", CSVHandler.get_profile, file_path, df)
+                else:
+                    profile = await worker_pool.run("profile", DatasetProfiler.profile, df)
+                
+                # Schema and sample rows, trimmed to the context token budget
+                context = await worker_pool.run("build_prompt", context_builder.get_context, df, file_path, profile)
+                calculated_metrics = self._calculate_real_metrics(profile, context.columns)
             
-            # Step 2: Use structured output to format the insights
-            insights_result = await self._format_insights_with_real_data(df, calculated_metrics)
+            # Step 2: Use structured output to pick the card and what to chart
+            with stage("insights_llm"):
+                plan, prompt_tokens = await self._format_insights_with_real_data(context.text, calculated_metrics)
+            metrics.inc("llm_prompt_tokens_total", prompt_tokens, service="insights")
             
-            # Add filename and timestamp
-            insights_result.filename = filename
-            insights_result.timestamp = pd.Timestamp.now().isoformat()
+            # Step 3: Compute the chart series from the data, not from the LLM
+            with stage("insights_chart"):
+                chart = await worker_pool.run("chart", self._build_chart, df, plan.chart, profile)
             
-            return insights_result
+            return InsightsResponse(
+                card=plan.card,
+                chart=chart,
+                filename=filename,
+                timestamp=pd.Timestamp.now().isoformat(),
+                prompt_tokens=prompt_tokens
+            )
             
+        except HTTPException:
+            raise
         except Exception as e:
             raise Exception(f"Error generating insights: {str(e)}")
     
-    async def _calculate_real_metrics(self, df: pd.DataFrame) -> Dict[str, Any]:
-        """Use real Python execution to calculate actual metrics from the data."""
+    @staticmethod
+    def _calculate_real_metrics(profile: Dict[str, Any], selected: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Pick the key metrics for insights out of the dataset profile, for the selected columns."""
+        columns = profile["columns"]
+        if selected is not None:
+            columns = {col: columns[col] for col in selected}
+        return {
+            "total_records": profile["rows"],
+            "numeric_columns": {
+                col: {
+                    "mean": columns[col].get("mean"),
+                    "median": columns[col].get("quantiles", {}).get("0.5"),
+                    "min": columns[col].get("min"),
+                    "max": columns[col].get("max"),
+                    "sum": columns[col].get("sum"),
+                }
+                for col in columns if columns[col]["kind"] == "numeric"
+            },
+            "categorical_distributions": {
+                col: dict(columns[col]["top_values"])
+                for col in columns
+                if columns[col]["kind"] == "categorical" and columns[col].get("top_values")
+            },
+            "null_rates": {
+                col: stats["null_rate"] for col, stats in columns.items() if stats["null_count"]
+            },
+        }
+    
+    @staticmethod
+    def _build_chart(df: pd.DataFrame, spec: ChartSpec, profile: Dict[str, Any]) -> Chart:
+        """Compute the chart for the spec, or a default chart if the spec doesn't fit the data."""
         try:
-            # Create Python tool with access to the DataFrame
-            tool = PythonAstREPLTool(locals={"df": df})
-            
-            # Bind tools to LLM
-            llm_with_tools = self.llm.bind_tools([tool], tool_choice=tool.name)
-            
-            # Create prompt for calculating real metrics
-            df_sample = df.head(3).to_markdown()
-            df_info = f"Shape: {df.shape}, Columns: {list(df.columns)}"
-            
-            system_message = f"""You are a data analyst expert. You have access to a pandas DataFrame called 'df'.
-
-Here is a sample of the data:
-```
-{df_sample}
-```
-
-DataFrame Info:
-{df_info}
-
-Calculate the following key metrics from the REAL data and return them as Python code:
-1. Total count of records
-2. Average of numeric columns (if they exist)
-3. Distribution of categorical columns (if they exist)
-4. Any other meaningful metrics for this dataset
-
-Return ONLY the Python code that calculates these metrics. Use actual pandas operations.
-Examples:
-- Total count: len(df)
-- Average salary: df['Salary'].mean() if 'Salary' in df.columns else None
-- Department distribution: df['Department'].value_counts().to_dict() if 'Department' in df.columns else None
-"""
-            
-            # Get real calculations
-            response = await llm_with_tools.ainvoke(system_message)
-            
-            if hasattr(response, 'tool_calls') and response.tool_calls:
-                tool_call = response.tool_calls[0]
-                code_to_execute = tool_call['args']['query']
-                
-                try:
-                    result = tool.invoke(code_to_execute)
-                    return {"calculated_metrics": result, "raw_code": code_to_execute}
-                except Exception as e:
-                    return {"error": str(e), "raw_code": code_to_execute}
-            else:
-                return {"error": "No calculations generated"}
-                
-        except Exception as e:
-            return {"error": f"Calculation error: {str(e)}"}
+            return chart_builder.build(df, spec)
+        except (ValueError, TypeError):
+            default = chart_builder.default_spec(profile)
+            if default is None:
+                return Chart(title=spec.title, labels=[], data=[], spec=spec, total_points=0)
+            return chart_builder.build(df, default)
     
-    async def _format_insights_with_real_data(self, df: pd.DataFrame, calculated_metrics: Dict[str, Any]) -> InsightsResponse:
-        """Use structured output to format insights with real calculated data."""
+    async def _format_insights_with_real_data(
+        self, data_context: str, calculated_metrics: Dict[str, Any]
+    ) -> Tuple[InsightsPlan, int]:
+        """Use structured output to pick the card and chart spec from real calculated data."""
         try:
             # Create structured output model
-            model_with_structure = self.llm.with_structured_output(InsightsResponse)
-            
-            # Prepare context with real data
-            data_context = self._get_data_context(df, calculated_metrics)
+            model_with_structure = self.llm.with_structured_output(InsightsPlan)
             
             # Create prompt for insights generation with real data
             prompt = ChatPromptTemplate.from_template("""
@@ -115,45 +116,30 @@ Real Calculated Metrics:
 
 Based on this REAL data, generate:
 1. A CARD insight that shows a key metric using the actual calculated values
-2. A CHART insight that shows a trend or distribution using the real data
+2. A CHART spec for a trend or distribution; its values are computed from the full dataset
 
 Guidelines:
 - Use the ACTUAL calculated values provided, not estimates
 - For the CARD: Choose the most meaningful metric from the real calculations
-- For the CHART: Create a meaningful visualization with the real data points
+- For the CHART: Choose the X-axis dimension column (a category, date or numeric column), an optional numeric measure column and its aggregation (count, sum, mean, median, min, max), and a time bucket (day, week, month, quarter, year) if the dimension holds dates
+- Use exact column names from the data context
 - Ensure all numeric values match the calculated metrics exactly
 - Make the insights relevant and actionable based on the real data
 
-Generate exactly one card and one chart using the real calculated data.
+Generate exactly one card and one chart spec using the real calculated data.
 """)
             
             # Generate insights with real data
             chain = prompt | model_with_structure
-            result = await chain.ainvoke({
+            prompt_input = {
                 "data_context": data_context,
                 "calculated_metrics": str(calculated_metrics)
-            })
+            }
+            result = await llm_gateway.ainvoke(chain, prompt_input)
             
-            return result
+            return result, count_tokens(prompt.format(**prompt_input))
             
+        except HTTPException:
+            raise
         except Exception as e:
             raise Exception(f"Error formatting insights: {str(e)}")
-    
-    def _get_data_context(self, df: pd.DataFrame, calculated_metrics: Dict[str, Any]) -> str:
-        """Get context about the data for insights generation."""
-        context = f"""
-Dataset Overview:
-- Total rows: {len(df)}
-- Total columns: {len(df.columns)}
-- Column names: {', '.join(df.columns.tolist())}
-
-Data Types:
-{df.dtypes.to_string()}
-
-Sample Data (first 5 rows):
-{df.head(5).to_markdown()}
-
-Numeric Columns Available: {[col for col in df.columns if df[col].dtype in ['int64', 'float64']]}
-Categorical Columns Available: {[col for col in df.columns if df[col].dtype == 'object']}
-"""
-        return context 
\ No newline at end of file
@@ -0,0 +1,156 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from app.core.config import settings
+
+try:
+    # Optional: spans are only emitted when OpenTelemetry is installed
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+THROUGHPUT_BUCKETS = (1e5, 1e6, 1e7, 5e7, 1e8, 5e8, 1e9)
+
+# Name: (type, help, histogram buckets)
+METRICS = {
+    "stage_duration_seconds": ("histogram", "Time spent in each request pipeline stage", DURATION_BUCKETS),
+    "http_request_duration_seconds": ("histogram", "HTTP request latency by route", DURATION_BUCKETS),
+    "upload_bytes_total": ("counter", "Bytes received by uploads and appends", None),
+    "upload_bytes_per_second": ("histogram", "Receive throughput of uploads and appends", THROUGHPUT_BUCKETS),
+    "llm_prompt_tokens_total": ("counter", "Prompt tokens sent to the LLM, by service", None),
+    "llm_completion_tokens_total": ("counter", "Completion tokens reported by the LLM provider", None),
+}
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Stage timings of the current request, collected only when the debug header asks for them
+request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+_tracer = trace.get_tracer("ai_bi") if trace is not None and settings.otel_enabled else None
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metrics:
+    """Minimal in-process metrics registry rendered in the Prometheus text format.
+
+    Counters and histograms are recorded as the app runs. Collectors expose the
+    numeric fields of the existing stats() dicts (caches, pools, gateway) as
+    gauges, read at scrape time.
+    """
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, List[float]]] = {}
+        self._collectors: List[Tuple[str, Callable[[], Dict[str, Any]]]] = []
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        """Add to a counter."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Record a histogram observation."""
+        buckets = METRICS[name][2]
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            # Per-bucket counts, then sum and count
+            series = self._histograms.setdefault(name, {})
+            state = series.setdefault(key, [0] * len(buckets) + [0.0, 0])
+            index = bisect.bisect_left(buckets, value)
+            if index < len(buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def register_collector(self, prefix: str, stats: Callable[[], Dict[str, Any]]) -> None:
+        """Expose the numeric fields of a stats() dict as {prefix}_{field} gauges."""
+        self._collectors.append((prefix, stats))
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, (kind, help_text, buckets) in METRICS.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                if kind == "counter":
+                    for labels, value in self._counters.get(name, {}).items():
+                        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+
+                for labels, state in self._histograms.get(name, {}).items():
+                    cumulative = 0
+                    for bound, count in zip(buckets, state):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(labels, ('le', repr(bound)))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {state[-1]}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(state[-2])}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {state[-1]}")
+
+        for prefix, stats in self._collectors:
+            for field, value in stats().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    name = f"{prefix}_{field}"
+                    lines += [f"# TYPE {name} gauge", f"{name} {_format_value(value)}"]
+        return "\n".join(lines) + "\n"
+
+
+def read_rss(pid: int) -> int:
+    """Read the resident set size of a process from /proc, 0 if unavailable."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def record_stage(name: str, seconds: float) -> None:
+    """Record a stage's duration in metrics and in the current request's debug timings."""
+    metrics.observe("stage_duration_seconds", seconds, stage=name)
+    timings = request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a pipeline stage, as an OpenTelemetry span too when tracing is available."""
+    span = _tracer.start_as_current_span(name) if _tracer else nullcontext()
+    started = time.perf_counter()
+    with span:
+        try:
+            yield
+        finally:
+            record_stage(name, time.perf_counter() - started)
+
+
+def server_timing(timings: List[Tuple[str, float]]) -> str:
+    """Format stage timings as a Server-Timing header value, in milliseconds."""
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings)
+
+
+metrics = Metrics()
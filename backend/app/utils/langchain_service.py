@@ -1,9 +1,40 @@
-import os
+import time
+import asyncio
+import logging
+import numpy as np
 import pandas as pd
-from typing import Dict, Any
-from langchain_openai import ChatOpenAI
+from typing import Dict, Any, List, Optional, AsyncIterator, Awaitable, Callable, Tuple
+from fastapi import HTTPException
+from pydantic import BaseModel, Field
 from langchain_experimental.tools import PythonAstREPLTool
 from app.core.config import settings
+from app.utils.llm_gateway import llm_gateway
+from app.utils.worker_pool import worker_pool
+from app.utils.code_sandbox import code_sandbox
+from app.utils.answer_cache import answer_cache
+from app.utils.result_store import result_store
+from app.utils.code_store import code_store, schema_fingerprint
+from app.utils.csv_handler import CSVHandler
+from app.utils.context_builder import context_builder, count_tokens
+from app.utils.query_planner import query_planner, PlanNotApplicable
+from app.utils.instrumentation import metrics, record_stage, stage
+from app.utils.large_files import (
+    large_files, bootstrap_replicates, estimate, Estimate, StratifiedSample, TABLE
+)
+
+
+logger = logging.getLogger(__name__)
+
+# Added to answers on large files that were meant to be exact but came from the sample
+EXACT_UNAVAILABLE_NOTE = (
+    "Exact answers on large files need DuckDB, which is not installed on this server, "
+    "so this answer was estimated from a sample."
+)
+
+
+class SQLQuery(BaseModel):
+    """Run a DuckDB SQL query against the data table and return its result."""
+    query: str = Field(..., description="A single DuckDB SELECT statement")
 
 
 class LangChainService:
@@ -11,39 +42,352 @@ class LangChainService:
     
     def __init__(self):
         """Initialize LangChain service."""
-        if not settings.openai_api_key:
-            raise ValueError("OpenAI API key not found in environment variables")
-        
-        # Initialize OpenAI model
-        self.llm = ChatOpenAI(
-            model="gpt-4o",
-            temperature=0.1,
-            api_key=settings.openai_api_key
-        )
+        # Use the process-wide chat model shared through the LLM gateway
+        self.llm = llm_gateway.get_llm()
     
-    async def analyze_csv(self, df: pd.DataFrame, query: str) -> str:
+    async def analyze_csv(
+        self, df: pd.DataFrame, query: str, file_path: Optional[str] = None, system_message: Optional[str] = None
+    ) -> Dict[str, Any]:
         """Analyze CSV data with actual data operations using LangChain pandas approach."""
+        analysis_result = None
+        with stage("analyze"):
+            async for event, data in self.analyze_csv_events(df, query, file_path, system_message=system_message):
+                if event == "result":
+                    analysis_result = data
+        return analysis_result
+    
+    async def analyze_batch(
+        self, df: pd.DataFrame, queries: List[str], file_path: Optional[str] = None, concurrency: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Answer many questions about one DataFrame, sharing the prompt context and bounding concurrency."""
+        # Build the prompt context once for every query
+        system_message = await worker_pool.run("build_prompt", self._build_system_message, df, file_path)
+        return await self._run_batch(
+            queries, lambda query: self.analyze_csv(df, query, file_path, system_message), concurrency
+        )
+    
+    async def analyze_large_file_batch(
+        self, file_path: str, queries: List[str], approximate: bool = False, concurrency: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Answer many questions about one large file, bounding concurrency."""
+        return await self._run_batch(
+            queries, lambda query: self.analyze_large_file(file_path, query, approximate), concurrency
+        )
+    
+    async def _run_batch(
+        self, queries: List[str], analyze: Callable[[str], Awaitable[Dict[str, Any]]], concurrency: Optional[int]
+    ) -> List[Dict[str, Any]]:
+        """Run analyze for each query with bounded concurrency, timing each and capturing its errors."""
+        semaphore = asyncio.Semaphore(concurrency or settings.batch_concurrency)
+        
+        async def run_one(query: str) -> Dict[str, Any]:
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    analysis_result = dict(await analyze(query))
+                except HTTPException as e:
+                    analysis_result = {"error": e.detail}
+                except Exception as e:
+                    analysis_result = {"error": str(e)}
+                analysis_result["elapsed_seconds"] = time.perf_counter() - started
+                return analysis_result
+        
+        # Results come back in query order, one failure doesn't affect the others
+        return await asyncio.gather(*(run_one(query) for query in queries))
+    
+    async def analyze_csv_events(
+        self,
+        df: pd.DataFrame,
+        query: str,
+        file_path: Optional[str] = None,
+        stream_tokens: bool = False,
+        system_message: Optional[str] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Run the analysis, yielding (event, data) progress pairs and finally ("result", result)."""
         try:
-            # Create Python tool with access to the DataFrame
-            tool = PythonAstREPLTool(locals={"df": df})
+            # Serve repeated questions from the answer cache before calling the LLM
+            dataset_hash = None
+            if file_path:
+                with stage("cache_lookup"):
+                    dataset_hash = await worker_pool.run("hash_file", CSVHandler.get_content_hash, file_path)
+                    cached = await self._analyze_from_cache(df, query, file_path, dataset_hash)
+                if cached:
+                    yield "result", cached
+                    return
+            
+            # Common aggregations are answered from templates without calling the LLM
+            with stage("planner"):
+                planned = await self._analyze_with_planner(df, query)
+            if planned:
+                yield "code", {"code": planned["code"]}
+                yield "result", planned
+                return
+            
+            # The tool only describes the call; code runs in the sandbox
+            tool = PythonAstREPLTool()
             
             # Bind tools to LLM
             llm_with_tools = self.llm.bind_tools([tool], tool_choice=tool.name)
             
-            # Create a simple prompt with DataFrame context
-            df_sample = df.head(3).to_markdown()
-            df_info = f"Shape: {df.shape}, Columns: {list(df.columns)}"
+            # Build the prompt off the event loop; the dataset context is cached per file version
+            if system_message is None:
+                with stage("build_prompt"):
+                    system_message = await worker_pool.run("build_prompt", self._build_system_message, df, file_path)
+            prompt = f"{system_message}\n\nUser question: {query}"
+            prompt_tokens = count_tokens(prompt)
+            metrics.inc("llm_prompt_tokens_total", prompt_tokens, service="analysis")
+            yield "prompt_built", {"prompt_chars": len(prompt), "prompt_tokens": prompt_tokens}
+            
+            # Use the simple tool calling approach
+            if stream_tokens:
+                response = None
+                started = time.perf_counter()
+                async for chunk in llm_gateway.astream(llm_with_tools, prompt):
+                    response = chunk if response is None else response + chunk
+                    for tool_call_chunk in getattr(chunk, "tool_call_chunks", None) or []:
+                        if tool_call_chunk.get("args"):
+                            yield "token", {"text": tool_call_chunk["args"]}
+                # Timed by hand: a span can't stay open across the generator's yields
+                record_stage("llm", time.perf_counter() - started)
+            else:
+                with stage("llm"):
+                    response = await llm_gateway.ainvoke(llm_with_tools, prompt)
+            logger.debug("LLM response: %s", response)
             
-            system_message = f"""You are a data analyst expert. You have access to a pandas DataFrame called 'df'.
+            # Extract and execute the tool call
+            if hasattr(response, 'tool_calls') and response.tool_calls:
+                tool_call = response.tool_calls[0]
+                # Access the correct field - it's 'query' not 'code'
+                code_to_execute = tool_call['args']['query']
+                yield "code", {"code": code_to_execute}
+                
+                try:
+                    yield "execution_started", {}
+                    # Validated and compiled once here, then stored as bytecode if it runs
+                    compiled = code_store.compile(code_to_execute)
+                    analysis_result = await self._execute(code_to_execute, df, file_path, compiled)
+                    analysis_result["prompt_tokens"] = prompt_tokens
+                    yield "execution_finished", {"execution": analysis_result["execution"]}
+                    
+                    if compiled:
+                        await worker_pool.run(
+                            "store_code", code_store.put, schema_fingerprint(df), query, code_to_execute, compiled
+                        )
+                    if dataset_hash:
+                        answer_cache.put(
+                            dataset_hash, query, analysis_result["analysis"], code_to_execute,
+                            analysis_result.get("result_id")
+                        )
+                    yield "result", analysis_result
+                    
+                except HTTPException:
+                    raise
+                except IndexError as e:
+                    yield "result", {"analysis": f"Error: No matching data found. The search returned no results. Please check if the name or criteria you're looking for exists in the dataset."}
+                except KeyError as e:
+                    yield "result", {"analysis": f"Error: Column '{str(e)}' not found in the dataset. Available columns: {list(df.columns)}"}
+                except Exception as e:
+                    yield "result", {"analysis": f"Error executing the analysis: {str(e)}. Please try rephrasing your question."}
+            else:
+                yield "result", {"analysis": "No tool call generated. Please try rephrasing your question."}
+            
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise Exception(f"Error during analysis: {str(e)}")
+    
+    async def analyze_large_file(self, file_path: str, query: str, approximate: bool = False) -> Dict[str, Any]:
+        """Answer a question about a file too large to load: exactly with SQL, or from its stratified sample.
+        
+        Without DuckDB every answer on a large file is approximate, and says so:
+        approximate_reason is "exact_unavailable" rather than "requested".
+        """
+        with stage("analyze"):
+            exact_unavailable = not approximate and not large_files.exact_available
+            approximate = approximate or exact_unavailable
+            reason = ("exact_unavailable" if exact_unavailable else "requested") if approximate else None
+            with stage("cache_lookup"):
+                dataset_hash = await worker_pool.run("hash_file", CSVHandler.get_content_hash, file_path)
+                # Approximate and exact answers to the same question are cached apart
+                cache_key = f"{dataset_hash}:sample" if approximate else dataset_hash
+                answer = answer_cache.get_answer(cache_key, query)
+            if answer:
+                analysis_result = {**self._cached_answer(answer), "source": "answer_cache"}
+            else:
+                if approximate:
+                    analysis_result = await self._analyze_sample(file_path, query)
+                else:
+                    analysis_result = await self._analyze_sql(file_path, query)
+                
+                if analysis_result.get("code"):
+                    answer_cache.put(
+                        cache_key, query, analysis_result["analysis"], analysis_result["code"],
+                        analysis_result.get("result_id")
+                    )
+            
+            analysis_result.update(approximate=approximate, approximate_reason=reason)
+            if exact_unavailable:
+                analysis_result["analysis"] += f"\n\n{EXACT_UNAVAILABLE_NOTE}"
+            return analysis_result
+    
+    async def _analyze_sql(self, file_path: str, query: str) -> Dict[str, Any]:
+        """Have the LLM write SQL for the question and run it out of core."""
+        sample = await worker_pool.run("load_sample", large_files.get_sample, file_path)
+        with stage("build_prompt"):
+            system_message = await worker_pool.run(
+                "build_prompt", self._build_sql_message, sample.df, file_path
+            )
+        sql, prompt_tokens = await self._generate(SQLQuery, f"{system_message}\n\nUser question: {query}")
+        if sql is None:
+            return {"analysis": "No tool call generated. Please try rephrasing your question.", "prompt_tokens": prompt_tokens}
+        
+        try:
+            with stage("execute_sql"):
+                result, execution = await worker_pool.run("execute_sql", large_files.query, file_path, sql)
+        except HTTPException:
+            raise
+        except Exception as e:
+            return {"analysis": f"Error executing the analysis: {str(e)}. Please try rephrasing your question.", "prompt_tokens": prompt_tokens}
+        
+        with stage("format_result"):
+            # One-value results read like pandas scalars
+            if result.shape == (1, 1):
+                result = result.iat[0, 0]
+            analysis, stored = await worker_pool.run("format_result", self._store_and_format, result)
+        return {
+            "analysis": analysis, "code": sql, "execution": execution, "source": "llm",
+            "prompt_tokens": prompt_tokens, "approximate": False, **stored
+        }
+    
+    async def _analyze_sample(self, file_path: str, query: str) -> Dict[str, Any]:
+        """Answer on the file's stratified sample, scaled to the whole file with bootstrap bounds."""
+        sample = await worker_pool.run("load_sample", large_files.get_sample, file_path)
+        df = sample.df
+        
+        plan = query_planner.plan(query, df) if settings.query_planner_enabled else None
+        if plan:
+            code, source, prompt_tokens, compiled = plan.code, "planner", None, None
+        else:
+            with stage("build_prompt"):
+                system_message = await worker_pool.run("build_prompt", self._build_system_message, df, file_path)
+            code, prompt_tokens = await self._generate(
+                PythonAstREPLTool(), f"{system_message}\n\nUser question: {query}"
+            )
+            if code is None:
+                return {"analysis": "No tool call generated. Please try rephrasing your question.", "prompt_tokens": prompt_tokens}
+            source, compiled = "llm", code_store.compile(code)
+        
+        # The sample doubled tells counts and sums (which double) from means and extremes (which don't)
+        replicates = [np.tile(np.arange(len(df), dtype=np.int32), 2)] + bootstrap_replicates(
+            sample, settings.approx_bootstrap_rounds, settings.approx_seed
+        )
+        try:
+            with stage("execute_code"):
+                results, execution = await worker_pool.run(
+                    "execute_code", code_sandbox.execute, code, df, None, compiled, replicates
+                )
+        except HTTPException:
+            raise
+        except Exception as e:
+            return {"analysis": f"Error executing the analysis: {str(e)}. Please try rephrasing your question.", "prompt_tokens": prompt_tokens}
+        
+        with stage("format_result"):
+            result = estimate(results, sample.scale, settings.approx_confidence)
+            analysis = await worker_pool.run("format_result", self._format_estimate, result, sample)
+        return {
+            "analysis": analysis,
+            "code": code,
+            "execution": execution,
+            "source": source,
+            "prompt_tokens": prompt_tokens,
+            "approximate": True,
+            "sample_rows": len(df),
+            "total_rows": sample.total_rows,
+            "error_bounds": self._error_bounds(result),
+        }
+    
+    async def _generate(self, tool: Any, prompt: str) -> Tuple[Optional[str], int]:
+        """Ask the LLM to call tool for the prompt; return the generated query and the prompt's token count."""
+        llm_with_tools = self.llm.bind_tools([tool], tool_choice=getattr(tool, "name", None) or tool.__name__)
+        prompt_tokens = count_tokens(prompt)
+        metrics.inc("llm_prompt_tokens_total", prompt_tokens, service="analysis")
+        with stage("llm"):
+            response = await llm_gateway.ainvoke(llm_with_tools, prompt)
+        
+        if not getattr(response, "tool_calls", None):
+            return None, prompt_tokens
+        return response.tool_calls[0]["args"]["query"], prompt_tokens
+    
+    async def _analyze_from_cache(
+        self, df: pd.DataFrame, query: str, file_path: str, dataset_hash: str
+    ) -> Optional[Dict[str, Any]]:
+        """Answer from the cache: a stored answer, or stored code run on this file or one with the same schema."""
+        answer = answer_cache.get_answer(dataset_hash, query)
+        if answer:
+            return {**self._cached_answer(answer), "source": "answer_cache"}
+        
+        fingerprint = schema_fingerprint(df)
+        stored = await worker_pool.run("load_code", code_store.get, fingerprint, query)
+        if not stored:
+            return None
+        
+        try:
+            analysis_result = await self._execute(stored.code, df, file_path, stored.compiled)
+        except HTTPException:
+            raise
+        except Exception:
+            # The stored code can't handle this data, ask the LLM again
+            await worker_pool.run("invalidate_code", code_store.invalidate, fingerprint, query)
+            return None
+        
+        answer_cache.put(dataset_hash, query, analysis_result["analysis"], stored.code, analysis_result.get("result_id"))
+        analysis_result["source"] = "code_cache"
+        return analysis_result
+    
+    async def _analyze_with_planner(self, df: pd.DataFrame, query: str) -> Optional[Dict[str, Any]]:
+        """Answer with the query planner, or return None to fall back to the LLM."""
+        if not settings.query_planner_enabled:
+            return None
+        
+        plan = query_planner.plan(query, df)
+        if plan is None:
+            return None
+        
+        try:
+            result, execution = await worker_pool.run("planner", query_planner.execute, plan, df)
+        except HTTPException:
+            raise
+        except (PlanNotApplicable, KeyError, TypeError, ValueError, IndexError):
+            # The template matched the wording but not the data
+            return None
+        
+        analysis, stored = await worker_pool.run("format_result", self._store_and_format, result)
+        return {"analysis": analysis, "code": plan.code, "execution": execution, "source": "planner", **stored}
+    
+    async def _execute(
+        self, code: str, df: pd.DataFrame, file_path: Optional[str], compiled: Optional[bytes] = None
+    ) -> Dict[str, Any]:
+        """Execute code in a sandboxed worker process; store and format the result in the worker pool."""
+        with stage("execute_code"):
+            result, execution = await worker_pool.run(
+                "execute_code", code_sandbox.execute, code, df, file_path, compiled
+            )
+        with stage("format_result"):
+            analysis, stored = await worker_pool.run("format_result", self._store_and_format, result)
+        return {"analysis": analysis, "code": code, "execution": execution, "source": "llm", **stored}
+    
+    def _build_system_message(self, df: pd.DataFrame, file_path: Optional[str] = None) -> str:
+        """Build the system prompt describing the DataFrame."""
+        # Schema and sample rows, trimmed to the context token budget
+        context = context_builder.get_context(df, file_path)
+        
+        return f"""You are a data analyst expert. You have access to a pandas DataFrame called 'df'.
 
-            Here is a sample of the data:
+            Here is a description of the data:
             ```
-            {df_sample}
+            {context.text}
             ```
 
-            DataFrame Info:
-            {df_info}
-
             Given a user question about this data, write Python code to answer it.
             - Use only pandas and built-in Python libraries
             - Return ONLY the valid Python code that will give the answer
@@ -52,52 +396,103 @@ class LangChainService:
             - For correlations, use: df[['column1', 'column2']].corr().iloc[0,1]
             - For averages by group, use: df.groupby('column')['value'].mean()
             - For counts, use: df['column'].value_counts()
-            - For searching specific values, first check if they exist: df[df['column'].str.contains('value', case=False, na=False)]
-            - When searching for names or specific values, use .str.contains() instead of exact matching to be more flexible
-            - If searching for a specific person, use: df[df['Name'].str.contains('person_name', case=False, na=False)]['Age'].iloc[0] if len(df[df['Name'].str.contains('person_name', case=False, na=False)]) > 0 else "Person not found"
+            - For searching specific values, use find_rows(df, 'column', 'value'): the rows whose column contains the value, case-insensitive, looked up in an index instead of scanning
+            - For rows where a column equals a value exactly, use match_rows(df, 'column', value)
+            - When searching for names or specific values, use find_rows() instead of exact matching to be more flexible
+            - If searching for a specific person, use: find_rows(df, 'Name', 'person_name')['Age'].iloc[0] if len(find_rows(df, 'Name', 'person_name')) > 0 else "Person not found"
 
             Examples:
             - "What is the average salary by department?" → df.groupby('Department')['Salary'].mean()
             - "How many people are in each age group?" → df['Age'].value_counts().sort_index()
             - "What's the correlation between age and salary?" → df[['Age', 'Salary']].corr().iloc[0,1]
-            - "What is the age of John Doe?" → df[df['Name'].str.contains('John Doe', case=False, na=False)]['Age'].iloc[0] if len(df[df['Name'].str.contains('John Doe', case=False, na=False)]) > 0 else "Person not found"
+            - "What is the age of John Doe?" → find_rows(df, 'Name', 'John Doe')['Age'].iloc[0] if len(find_rows(df, 'Name', 'John Doe')) > 0 else "Person not found"
             """
-            
-            # Use the simple tool calling approach
-            response = await llm_with_tools.ainvoke(
-                f"{system_message}\n\nUser question: {query}"
-            )
+    
+    def _build_sql_message(self, df: pd.DataFrame, file_path: str) -> str:
+        """Build the system prompt asking for DuckDB SQL over a large file, described from its sample."""
+        context = context_builder.get_context(df, file_path)
+        
+        return f"""You are a data analyst expert. The data is in a DuckDB table called '{TABLE}', too large to load into memory.
 
-            print(response)
-            
-            # Extract and execute the tool call
-            if hasattr(response, 'tool_calls') and response.tool_calls:
-                tool_call = response.tool_calls[0]
-                # Access the correct field - it's 'query' not 'code'
-                code_to_execute = tool_call['args']['query']
-                
-                try:
-                    result = tool.invoke(code_to_execute)
-                    
-                    # Format the result for better readability
-                    if isinstance(result, (int, float)):
-                        return f"The result is: {result}"
-                    elif isinstance(result, pd.Series):
-                        return f"Results:\n{result.to_string()}"
-                    elif isinstance(result, pd.DataFrame):
-                        return f"Results:\n{result.to_string()}"
-                    else:
-                        return str(result)
-                        
-                except IndexError as e:
-                    return f"Error: No matching data found. The search returned no results. Please check if the name or criteria you're looking for exists in the dataset."
-                except KeyError as e:
-                    return f"Error: Column '{str(e)}' not found in the dataset. Available columns: {list(df.columns)}"
-                except Exception as e:
-                    return f"Error executing the analysis: {str(e)}. Please try rephrasing your question."
-            else:
-                return "No tool call generated. Please try rephrasing your question."
-            
-        except Exception as e:
-            raise Exception(f"Error during analysis: {str(e)}")
+            Here is a description of the data:
+            ```
+            {context.text}
+            ```
+
+            Given a user question about this data, write one DuckDB SQL query to answer it.
+            - Write a single SELECT statement that reads only from the '{TABLE}' table
+            - Quote column names with double quotes
+            - Aggregate in SQL and return only the rows needed for the answer, never the whole table
+            - For searching names or specific values, use ILIKE '%value%' instead of exact matching
+
+            Examples:
+            - "What is the average salary by department?" → SELECT "Department", AVG("Salary") FROM {TABLE} GROUP BY "Department"
+            - "How many people are in each age group?" → SELECT "Age", COUNT(*) FROM {TABLE} GROUP BY "Age" ORDER BY "Age"
+            - "What's the correlation between age and salary?" → SELECT CORR("Age", "Salary") FROM {TABLE}
+            - "What is the age of John Doe?" → SELECT "Age" FROM {TABLE} WHERE "Name" ILIKE '%John Doe%' LIMIT 1
+            """
     
+    @staticmethod
+    def _format_estimate(result: Estimate, sample: StratifiedSample) -> str:
+        """Format an approximate result with its bounds and how it was estimated."""
+        confidence = f"{settings.approx_confidence:.0%}"
+        if result.lower is None:
+            formatted = LangChainService._format_result(result.value)
+        elif isinstance(result.value, pd.Series):
+            table = pd.DataFrame({"estimate": result.value, "lower": result.lower, "upper": result.upper})
+            formatted = LangChainService._format_result(table)
+        else:
+            formatted = f"{LangChainService._format_result(result.value)} ({confidence} interval {result.lower:g} to {result.upper:g})"
+        
+        note = f"Approximate answer from a stratified sample of {len(sample.df)} of {sample.total_rows} rows"
+        if result.lower is not None:
+            note += f"; bounds are {confidence} bootstrap intervals"
+        return f"{formatted}\n\n{note}."
+    
+    @staticmethod
+    def _error_bounds(result: Estimate) -> Optional[Dict[str, List[Optional[float]]]]:
+        """Bounds as JSON: [lower, upper] per Series label, or under "value" for a scalar."""
+        if result.lower is None:
+            return None
+        if isinstance(result.lower, pd.Series):
+            pairs = zip(result.lower.index, result.lower.tolist(), result.upper.tolist())
+        else:
+            pairs = [("value", result.lower, result.upper)]
+        return {
+            str(label): [None if np.isnan(lower) else lower, None if np.isnan(upper) else upper]
+            for label, lower, upper in pairs
+        }
+    
+    @staticmethod
+    def _store_and_format(result: Any) -> Tuple[str, Dict[str, Any]]:
+        """Keep a tabular result server-side to be paged through, and format its preview."""
+        analysis = LangChainService._format_result(result)
+        stored = result_store.put(result)
+        if stored is None:
+            return analysis, {}
+        return analysis, {"result_id": stored.result_id, "result_rows": stored.rows, "result_columns": stored.columns}
+    
+    @staticmethod
+    def _cached_answer(answer: Dict[str, Any]) -> Dict[str, Any]:
+        """A cached answer, with its stored result if that has not expired."""
+        answer = dict(answer)
+        stored = result_store.get(answer.pop("result_id", None) or "")
+        if stored is not None:
+            answer.update(result_id=stored.result_id, result_rows=stored.rows, result_columns=stored.columns)
+        return answer
+    
+    @staticmethod
+    def _format_result(result: Any) -> str:
+        """Format an execution result for better readability; tables show only their first rows."""
+        if isinstance(result, (int, float)):
+            return f"The result is: {result}"
+        elif isinstance(result, pd.Series):
+            text = result.head(settings.result_preview_rows).to_string()
+        elif isinstance(result, pd.DataFrame):
+            text = result.head(settings.result_preview_rows).to_string(max_cols=settings.result_preview_columns)
+        else:
+            return str(result)
+        
+        if len(result) > settings.result_preview_rows:
+            text += f"\n... {len(result) - settings.result_preview_rows} more rows ({len(result)} in total)"
+        return f"Results:\n{text}"
@@ -0,0 +1,332 @@
+import json
+import logging
+import os
+import threading
+import time
+import warnings
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+from pandas.api import types as ptypes
+from fastapi import HTTPException
+from app.core.config import settings
+from app.utils.csv_handler import CSVHandler
+from app.utils.dataframe_cache import dataframe_cache
+from app.utils.dtype_optimizer import infer_schema, apply_schema
+from app.utils.instrumentation import read_rss
+
+try:
+    # Optional: exact answers on large files need DuckDB; without it they are answered from samples
+    import duckdb
+except ImportError:
+    duckdb = None
+
+logger = logging.getLogger(__name__)
+
+# Table name generated SQL queries a large file by
+TABLE = "data"
+
+# Leading rows read to choose the strata column
+PREVIEW_ROWS = 10_000
+
+
+@dataclass
+class StratifiedSample:
+    """Rows sampled from a large file, in proportion to the size of each stratum."""
+    df: pd.DataFrame
+    total_rows: int
+    strata_column: Optional[str]
+
+    @property
+    def scale(self) -> float:
+        """Rows in the file per sampled row."""
+        return self.total_rows / len(self.df) if len(self.df) else 1.0
+
+
+@dataclass
+class Estimate:
+    """A result computed on a sample, scaled to the file, with bootstrap interval bounds."""
+    value: Any
+    lower: Any = None
+    upper: Any = None
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, (bool, np.bool_))
+
+
+def choose_strata_column(df: pd.DataFrame) -> Optional[str]:
+    """The text column with the fewest distinct values (at least two, at most approx_max_strata), if any."""
+    candidates = []
+    for col in df.columns:
+        series = df[col]
+        if not (ptypes.is_object_dtype(series) or ptypes.is_string_dtype(series)):
+            continue
+        distinct = series.nunique(dropna=False)
+        if 2 <= distinct <= settings.approx_max_strata:
+            candidates.append((distinct, str(col)))
+    return min(candidates)[1] if candidates else None
+
+
+def _strata_keys(series: pd.Series) -> pd.Series:
+    """Stratum of each row, with missing values as their own stratum."""
+    return series.astype(object).where(series.notna(), "")
+
+
+def _reads_only(node: Any, tables: FrozenSet[str]) -> bool:
+    """Whether a serialized DuckDB query reads no table but those named, calls no table function.
+
+    Common table expressions are in scope only where SQL resolves them: in the
+    query that declares them and in the bodies of those declared after them,
+    never in their own body, so a CTE named after a file can't read that file.
+    """
+    if isinstance(node, list):
+        return all(_reads_only(item, tables) for item in node)
+    if not isinstance(node, dict):
+        return True
+
+    if node.get("type") == "TABLE_FUNCTION":
+        return False
+    if node.get("type") == "BASE_TABLE":
+        if node.get("schema_name") or node.get("catalog_name"):
+            return False
+        return node.get("table_name", "") in tables
+
+    for entry in node.get("cte_map", {}).get("map", []):
+        if not _reads_only(entry.get("value"), tables):
+            return False
+        tables = tables | {entry.get("key", "")}
+    return all(_reads_only(value, tables) for key, value in node.items() if key != "cte_map")
+
+
+def bootstrap_replicates(sample: StratifiedSample, rounds: int, seed: int) -> List[np.ndarray]:
+    """Row positions of stratified bootstrap resamples: rows redrawn with replacement within each stratum."""
+    rng = np.random.default_rng(seed)
+    if sample.strata_column:
+        codes, _ = pd.factorize(sample.df[sample.strata_column], use_na_sentinel=False)
+        groups = [np.flatnonzero(codes == code) for code in np.unique(codes)]
+    else:
+        groups = [np.arange(len(sample.df))]
+
+    return [
+        np.sort(np.concatenate([rng.choice(group, size=len(group)) for group in groups])).astype(np.int32)
+        for _ in range(rounds)
+    ]
+
+
+def estimate(results: List[Any], scale: float, confidence: float) -> Estimate:
+    """Estimate the file's answer from results on the sample, the sample doubled and bootstrap resamples.
+
+    Values that double when every row is counted twice (counts, sums) grow with
+    the number of rows and are scaled up to the file; the rest (means, ratios,
+    extremes) are reported as computed. Numeric scalars and Series get percentile
+    bounds from the resamples; other results come back as computed on the sample.
+    """
+    value, doubled, replicates = results[0], results[1], results[2:]
+    tail = (1 - confidence) / 2 * 100
+
+    if _is_number(value):
+        factor = scale if value != 0 and _is_number(doubled) and np.isclose(doubled, 2 * value) else 1.0
+        draws = np.array([float(r) for r in replicates if _is_number(r)]) * factor
+        scaled = value * factor
+        if isinstance(value, (int, np.integer)):
+            scaled = int(round(scaled))
+        if not len(draws):
+            return Estimate(scaled)
+        lower, upper = np.nanpercentile(draws, [tail, 100 - tail])
+        return Estimate(scaled, float(lower), float(upper))
+
+    if isinstance(value, pd.Series) and ptypes.is_numeric_dtype(value) and value.index.is_unique:
+        factor = np.ones(len(value))
+        if isinstance(doubled, pd.Series) and doubled.index.is_unique:
+            doubled = doubled.reindex(value.index).to_numpy(dtype=float)
+            values = value.to_numpy(dtype=float)
+            factor = np.where((values != 0) & np.isclose(doubled, 2 * values), scale, 1.0)
+
+        scaled = value * factor
+        if ptypes.is_integer_dtype(value):
+            scaled = scaled.round().astype("int64")
+        draws = [
+            r.reindex(value.index).to_numpy(dtype=float) * factor
+            for r in replicates if isinstance(r, pd.Series) and r.index.is_unique
+        ]
+        if not draws:
+            return Estimate(scaled)
+        with warnings.catch_warnings():
+            # Labels missing from every resample have no bounds
+            warnings.simplefilter("ignore", RuntimeWarning)
+            lower, upper = np.nanpercentile(np.array(draws), [tail, 100 - tail], axis=0)
+        return Estimate(scaled, pd.Series(lower, index=value.index), pd.Series(upper, index=value.index))
+
+    return Estimate(value)
+
+
+class LargeFileEngine:
+    """Answers questions about files too large to load into one pandas frame.
+
+    Exact answers run generated SQL in DuckDB, which streams the CSV from disk
+    and spills past its memory limit. Approximate answers run pandas code on a
+    stratified sample, built in two chunked passes and stored next to the CSV
+    once per file version, with bootstrap bounds on the result.
+    """
+
+    def __init__(self, threshold_bytes: int, sample_rows: int, chunk_rows: int):
+        """Initialize the engine; samples are built on first use."""
+        self.threshold_bytes = threshold_bytes
+        self.sample_rows = sample_rows
+        self.chunk_rows = chunk_rows
+        self._lock = threading.Lock()
+        self.sql_queries = 0
+        self.samples_built = 0
+        if duckdb is None:
+            logger.warning("DuckDB is not installed; questions about large files will be answered from samples")
+
+    @property
+    def exact_available(self) -> bool:
+        """Whether exact out-of-core queries can run (DuckDB is installed)."""
+        return duckdb is not None
+
+    def is_large(self, file_path: str) -> bool:
+        """Whether the file is over the size at which it is no longer loaded whole."""
+        return os.path.getsize(file_path) >= self.threshold_bytes
+
+    def query(self, file_path: str, sql: str) -> Tuple[pd.DataFrame, Dict[str, float]]:
+        """Run a read-only SQL query against the file as TABLE; return the result and its resource usage."""
+        if duckdb is None:
+            raise HTTPException(
+                status_code=501,
+                detail="Exact answers on large files need DuckDB installed; ask for an approximate answer instead"
+            )
+
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        rss_started = read_rss(os.getpid())
+        conn = duckdb.connect(config={"memory_limit": settings.duckdb_memory_limit, "threads": settings.duckdb_threads})
+        try:
+            path = os.path.abspath(file_path).replace("'", "''")
+            conn.execute(f"CREATE VIEW {TABLE} AS SELECT * FROM read_csv_auto('{path}')")
+            # From here on DuckDB itself refuses to touch any other file, whatever the SQL says
+            conn.execute(f"SET allowed_paths = ['{path}']")
+            conn.execute("SET enable_external_access = false")
+            conn.execute("SET lock_configuration = true")
+            if not self._reads_only_table(conn, sql):
+                raise HTTPException(status_code=400, detail=f"Generated SQL must be a single SELECT over the {TABLE} table")
+            result = conn.execute(sql).df()
+            # Read before DuckDB frees its buffers with the connection
+            rss_increase = max(read_rss(os.getpid()) - rss_started, 0)
+        finally:
+            conn.close()
+
+        self.sql_queries += 1
+        return result, {
+            "wall_seconds": time.perf_counter() - started,
+            "cpu_seconds": time.process_time() - cpu_started,
+            "peak_rss_increase_bytes": rss_increase,
+        }
+
+    @staticmethod
+    def _reads_only_table(conn, sql: str) -> bool:
+        """Check with DuckDB's own parser that sql is one SELECT reading nothing but TABLE."""
+        try:
+            tree = json.loads(conn.execute("SELECT json_serialize_sql(?)", [sql]).fetchone()[0])
+        except Exception:
+            return False
+        # Anything but exactly one SELECT fails to serialize
+        if tree.get("error") or len(tree.get("statements", [])) != 1:
+            return False
+
+        return _reads_only(tree["statements"], frozenset({TABLE}))
+
+    def get_sample(self, file_path: str) -> StratifiedSample:
+        """Get the stratified sample of the file's current version, building and storing it once."""
+        version = CSVHandler.get_content_hash(file_path)
+        sample_path = CSVHandler.get_sidecar_path(file_path, CSVHandler.SAMPLE_SUFFIX)
+        key = dataframe_cache.make_key(file_path, "sample")
+
+        with self._lock:
+            info = (CSVHandler.read_metadata(file_path) or {}).get("sample")
+            if info and info["version"] == version and os.path.exists(sample_path):
+                df = dataframe_cache.get(key)
+                if df is None:
+                    df = CSVHandler.read_columnar([sample_path])
+                    dataframe_cache.put(key, df)
+                return StratifiedSample(df.copy(deep=False), info["total_rows"], info["strata_column"])
+
+            sample = self._build_sample(file_path)
+            temp_path = f"{sample_path}.tmp"
+            feather.write_feather(sample.df, temp_path, compression="uncompressed")
+            os.replace(temp_path, sample_path)
+
+            # Read back after writing, so sample info never points at a sidecar that isn't there
+            metadata = CSVHandler.read_metadata(file_path) or {}
+            metadata["sample"] = {
+                "version": version,
+                "rows": len(sample.df),
+                "total_rows": sample.total_rows,
+                "strata_column": sample.strata_column,
+            }
+            CSVHandler.write_metadata(file_path, metadata)
+            dataframe_cache.put(key, sample.df)
+            self.samples_built += 1
+
+        # The file is only ever profiled from its sample
+        CSVHandler.get_profile(file_path, sample.df, sample.total_rows)
+        return StratifiedSample(sample.df.copy(deep=False), sample.total_rows, sample.strata_column)
+
+    def _build_sample(self, file_path: str) -> StratifiedSample:
+        """Sample a fixed number of rows per stratum, proportional to its size, reading the file in chunks."""
+        strata_column = choose_strata_column(pd.read_csv(file_path, nrows=PREVIEW_ROWS))
+        dtype = {strata_column: str} if strata_column else None
+        usecols = [strata_column] if strata_column else [0]
+        rng = np.random.default_rng(settings.approx_seed)
+
+        def strata_of(chunk: pd.DataFrame) -> pd.Series:
+            return _strata_keys(chunk[strata_column]) if strata_column else pd.Series("", index=chunk.index)
+
+        # First pass: stratum sizes, reading only the strata column
+        sizes: Dict[Any, int] = {}
+        for chunk in pd.read_csv(file_path, usecols=usecols, dtype=dtype, chunksize=self.chunk_rows):
+            for stratum, count in strata_of(chunk).value_counts().items():
+                sizes[stratum] = sizes.get(stratum, 0) + int(count)
+        total_rows = sum(sizes.values())
+
+        # Which rows of each stratum to keep, by position within the stratum; every stratum keeps at least one
+        target = min(self.sample_rows, total_rows)
+        chosen = {
+            stratum: np.sort(rng.choice(size, size=min(size, max(1, round(target * size / total_rows))), replace=False))
+            for stratum, size in sizes.items()
+        }
+
+        # Second pass: keep the chosen rows
+        parts = []
+        seen = dict.fromkeys(sizes, 0)
+        for chunk in pd.read_csv(file_path, dtype=dtype, chunksize=self.chunk_rows):
+            keys = strata_of(chunk)
+            keep = np.zeros(len(chunk), dtype=bool)
+            for stratum, rows in keys.groupby(keys, sort=False).indices.items():
+                keep[rows] = np.isin(np.arange(seen[stratum], seen[stratum] + len(rows)), chosen[stratum])
+                seen[stratum] += len(rows)
+            parts.append(chunk[keep])
+
+        df = pd.concat(parts, ignore_index=True) if parts else pd.read_csv(file_path, nrows=0)
+        if settings.dtype_optimization_enabled:
+            df = apply_schema(df, infer_schema(df))
+        return StratifiedSample(df, total_rows, strata_column)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return engine availability and usage counters."""
+        return {
+            "exact_available": self.exact_available,
+            "threshold_bytes": self.threshold_bytes,
+            "sql_queries": self.sql_queries,
+            "samples_built": self.samples_built,
+        }
+
+
+large_files = LargeFileEngine(
+    settings.large_file_threshold_bytes,
+    settings.approx_sample_rows,
+    settings.large_file_chunk_rows
+)
@@ -0,0 +1,211 @@
+import asyncio
+import copy
+import hashlib
+import json
+import random
+import threading
+import time
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+import httpx
+from app.core.config import settings
+from app.utils.instrumentation import metrics
+
+if TYPE_CHECKING:
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.runnables import Runnable
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds the provider asked us to wait, if the error carries a Retry-After header."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _record_usage(message: Any) -> None:
+    """Count completion tokens when the provider reports usage on the message."""
+    usage = getattr(message, "usage_metadata", None)
+    if usage and usage.get("output_tokens"):
+        metrics.inc("llm_completion_tokens_total", usage["output_tokens"])
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    """Whether the provider rejected the call for rate limiting."""
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+
+class LLMGateway:
+    """Process-wide entry point for LLM calls: one pooled client, bounded concurrency,
+    single-flight coalescing of identical prompts and jittered retry on rate limits."""
+
+    def __init__(self, max_concurrency: int, max_retries: int, base_delay: float, max_delay: float):
+        """Initialize the gateway; the model itself is created on first use."""
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._llm: Optional["BaseChatModel"] = None
+        self._llm_lock = threading.Lock()
+        # Held while LangChain-based services are first imported and built; concurrent
+        # first imports of LangChain from two threads can deadlock on its module locks
+        self.import_lock = threading.RLock()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Set after a rate limit so new calls back off together instead of piling on
+        self._cooldown_until = 0.0
+        self.in_flight = 0
+        self.waiting = 0
+        self.calls = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+
+    def get_llm(self) -> "BaseChatModel":
+        """Return the shared chat model, built once with a tuned connection pool."""
+        with self._llm_lock:
+            if self._llm is None:
+                # Imported here so LangChain loads with the first LLM call or warm-up, not at startup
+                from app.utils.llm_provider import create_llm
+                http_async_client = httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=settings.llm_max_connections,
+                        max_keepalive_connections=settings.llm_max_keepalive_connections,
+                    ),
+                    timeout=settings.llm_timeout_seconds,
+                )
+                self._llm = create_llm(http_async_client=http_async_client)
+            return self._llm
+
+    @staticmethod
+    def _key(runnable: "Runnable", input: Any) -> str:
+        """Identify a call by the bound runnable (model, tools, schema) and its input."""
+        payload = repr(runnable) + json.dumps(input, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    async def _acquire(self) -> None:
+        """Wait for a concurrency slot and any rate-limit cooldown, recording queue wait."""
+        started = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+            try:
+                cooldown = self._cooldown_until - time.monotonic()
+                if cooldown > 0:
+                    await asyncio.sleep(cooldown)
+            except BaseException:
+                # Cancelled or timed out during the cooldown: the caller never gets the slot to release
+                self._semaphore.release()
+                raise
+        finally:
+            self.waiting -= 1
+
+        wait = time.perf_counter() - started
+        self.queue_wait_total += wait
+        self.queue_wait_max = max(self.queue_wait_max, wait)
+        self.in_flight += 1
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Delay before the next attempt: Retry-After if given, else exponential with full jitter."""
+        self.rate_limited += 1
+        delay = _retry_after(error)
+        if delay is None:
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        self._cooldown_until = max(self._cooldown_until, time.monotonic() + delay)
+        return delay
+
+    async def _call_with_retry(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Run one upstream call inside a concurrency slot, retrying rate limits."""
+        for attempt in range(self.max_retries + 1):
+            await self._acquire()
+            try:
+                self.calls += 1
+                result = await call()
+                _record_usage(result)
+                return result
+            except Exception as e:
+                if not _is_rate_limited(e) or attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt, e)
+            finally:
+                self._release()
+
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    async def ainvoke(self, runnable: "Runnable", input: Any) -> Any:
+        """Invoke a runnable, sharing the result with identical calls already in flight."""
+        key = self._key(runnable, input)
+        task = self._inflight.get(key)
+        leader = task is None
+
+        if leader:
+            # The call runs as its own task so a disconnecting caller doesn't cancel it for the others
+            task = asyncio.ensure_future(self._call_with_retry(lambda: runnable.ainvoke(input)))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+
+        result = await asyncio.shield(task)
+        # Callers may mutate what they get back, so followers receive a copy
+        return result if leader else copy.deepcopy(result)
+
+    def _finish(self, key: str, task: asyncio.Future) -> None:
+        """Forget a completed call and mark its exception retrieved."""
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()
+
+    async def astream(self, runnable: "Runnable", input: Any) -> AsyncIterator[Any]:
+        """Stream a runnable inside a concurrency slot; rate limits are retried before the first chunk."""
+        for attempt in range(self.max_retries + 1):
+            await self._acquire()
+            started_streaming = False
+            try:
+                self.calls += 1
+                async for chunk in runnable.astream(input):
+                    started_streaming = True
+                    _record_usage(chunk)
+                    yield chunk
+                return
+            except Exception as e:
+                if started_streaming or not _is_rate_limited(e) or attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt, e)
+            finally:
+                self._release()
+
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return concurrency, coalescing, retry and queue-wait metrics."""
+        admitted = self.calls or 1
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "queue_wait_avg_seconds": self.queue_wait_total / admitted,
+            "queue_wait_max_seconds": self.queue_wait_max,
+        }
+
+
+llm_gateway = LLMGateway(
+    settings.llm_max_concurrency,
+    settings.llm_max_retries,
+    settings.llm_retry_base_delay_seconds,
+    settings.llm_retry_max_delay_seconds
+)
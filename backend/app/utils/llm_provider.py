@@ -0,0 +1,168 @@
+import asyncio
+import json
+import re
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from app.core.config import settings
+
+# Size of the argument fragments a fake model streams per chunk
+STREAM_CHUNK_CHARS = 16
+
+# Precedes the user's question at the end of analysis prompts
+QUESTION_MARKER = "User question:"
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic stand-in for the LLM that replays recorded tool calls.
+
+    A recording is a JSON object with a "responses" list. Each response names the
+    tool (or structured-output schema) it answers, an optional "match" regex
+    tested against the user's question, and the "args" to return:
+
+        {"responses": [
+            {"tool": "python_repl_ast", "match": "average salary", "args": {"query": "df['Salary'].mean()"}},
+            {"tool": "python_repl_ast", "args": {"query": "len(df)"}}
+        ]}
+
+    The first response for the bound tool whose pattern matches wins. The
+    question is the text after "User question:" in the last human message (the
+    whole message when it has none), so example phrases in the system prompt
+    never select a response.
+    """
+
+    responses: List[Dict[str, Any]] = []
+    latency_seconds: float = 0.0
+
+    @classmethod
+    def from_recording(cls, path: Optional[str], latency_seconds: float = 0.0) -> "FakeChatModel":
+        """Load a recording file; without one, every call returns no tool call."""
+        responses = []
+        if path:
+            with open(path) as f:
+                responses = json.load(f)["responses"]
+        return cls(responses=responses, latency_seconds=latency_seconds)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def bind_tools(self, tools: Sequence[Any], *, tool_choice: Optional[Any] = None, **kwargs: Any):
+        """Bind tools the same way chat models with native tool calling do."""
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], tool_choice=tool_choice)
+
+    def _respond(self, messages: List[BaseMessage], tools: Optional[List[Dict[str, Any]]]) -> AIMessage:
+        """Find the recorded response for the user's question and bound tools."""
+        question = self._question(messages)
+        tool_names = [tool["function"]["name"] for tool in tools or []]
+
+        for response in self.responses:
+            if response["tool"] not in tool_names:
+                continue
+            if response.get("match") and not re.search(response["match"], question, re.IGNORECASE):
+                continue
+            return AIMessage(content="", tool_calls=[{
+                "name": response["tool"],
+                "args": response["args"],
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+            }])
+
+        return AIMessage(content="")
+
+    @staticmethod
+    def _question(messages: List[BaseMessage]) -> str:
+        """The user's question: the end of the last human message after the question marker."""
+        human = [message for message in messages if message.type == "human"]
+        text = str(human[-1].content) if human else ""
+        _, marker, question = text.rpartition(QUESTION_MARKER)
+        return question.strip() if marker else text
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self.latency_seconds)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages, kwargs.get("tools")))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self.latency_seconds)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages, kwargs.get("tools")))])
+
+    def _chunks(self, message: AIMessage) -> List[AIMessageChunk]:
+        """Split a response into tool-call chunks the way a streaming API would."""
+        if not message.tool_calls:
+            return [AIMessageChunk(content="")]
+
+        tool_call = message.tool_calls[0]
+        args = json.dumps(tool_call["args"])
+        chunks = []
+        for i in range(0, len(args), STREAM_CHUNK_CHARS):
+            first = i == 0
+            chunks.append(AIMessageChunk(content="", tool_call_chunks=[{
+                "name": tool_call["name"] if first else None,
+                "args": args[i:i + STREAM_CHUNK_CHARS],
+                "id": tool_call["id"] if first else None,
+                "index": 0,
+            }]))
+        return chunks
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        chunks = self._chunks(self._respond(messages, kwargs.get("tools")))
+        for chunk in chunks:
+            time.sleep(self.latency_seconds / len(chunks))
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        chunks = self._chunks(self._respond(messages, kwargs.get("tools")))
+        for chunk in chunks:
+            await asyncio.sleep(self.latency_seconds / len(chunks))
+            yield ChatGenerationChunk(message=chunk)
+
+
+def create_llm(http_async_client: Optional[Any] = None) -> BaseChatModel:
+    """Create the configured chat model: "openai" for the real API, "fake" for recorded replies."""
+    if settings.llm_provider == "fake":
+        return FakeChatModel.from_recording(settings.llm_recording_path, settings.fake_llm_latency_seconds)
+
+    if settings.llm_provider != "openai":
+        raise ValueError(f"Unknown LLM provider: {settings.llm_provider}")
+
+    if not settings.openai_api_key:
+        raise ValueError("OpenAI API key not found in environment variables")
+
+    # Imported lazily so the fake provider works without the OpenAI client
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(
+        model=settings.llm_model,
+        temperature=settings.llm_temperature,
+        api_key=settings.openai_api_key,
+        http_async_client=http_async_client,
+        # Retries are handled by the LLM gateway
+        max_retries=0
+    )
@@ -0,0 +1,293 @@
+import math
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from pandas.api import types as ptypes
+
+# Quantiles reported for numeric columns
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+# Most frequent values kept for categorical columns
+TOP_K = 10
+
+# Size of the k-minimum-values sketch used to estimate distinct counts
+SKETCH_SIZE = 256
+
+HASH_SPACE = float(2 ** 64)
+
+# Compression of the t-digest kept for numeric columns; higher keeps more centroids and tighter quantiles
+DIGEST_COMPRESSION = 100
+
+
+def _to_json(value: Any) -> Any:
+    """Convert numpy/pandas scalars into JSON-serializable Python values."""
+    if value is None or value is pd.NaT:
+        return None
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).isoformat()
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
+        return None
+    return value
+
+
+def column_kind(series: pd.Series) -> str:
+    """Classify a column as numeric, datetime or categorical."""
+    if ptypes.is_bool_dtype(series):
+        return "categorical"
+    if ptypes.is_numeric_dtype(series):
+        return "numeric"
+    if ptypes.is_datetime64_any_dtype(series):
+        return "datetime"
+    return "categorical"
+
+
+def distinct_sketch(series: pd.Series) -> List[int]:
+    """Build a k-minimum-values sketch of the column's hashed non-null values."""
+    hashes = pd.unique(pd.util.hash_pandas_object(series.dropna(), index=False).to_numpy())
+    if len(hashes) > SKETCH_SIZE:
+        hashes = np.partition(hashes, SKETCH_SIZE - 1)[:SKETCH_SIZE]
+    return sorted(int(h) for h in hashes)
+
+
+def estimate_distinct(sketch: List[int]) -> int:
+    """Estimate the distinct count from a k-minimum-values sketch."""
+    if len(sketch) < SKETCH_SIZE:
+        return len(sketch)
+    return int(round((SKETCH_SIZE - 1) * HASH_SPACE / (sketch[-1] + 1)))
+
+
+def merge_sketches(a: List[int], b: List[int]) -> List[int]:
+    """Merge two k-minimum-values sketches into the sketch of the union."""
+    return sorted(set(a) | set(b))[:SKETCH_SIZE]
+
+
+def _digest_limit(q: float) -> float:
+    """Largest cumulative quantile a centroid starting at q may reach (k1 scale function)."""
+    k = DIGEST_COMPRESSION / (2 * math.pi) * math.asin(2 * q - 1) + 1
+    if k >= DIGEST_COMPRESSION / 4:
+        return 1.0
+    return (math.sin(k * 2 * math.pi / DIGEST_COMPRESSION) + 1) / 2
+
+
+def quantile_digest(values: np.ndarray) -> List[List[float]]:
+    """Build a t-digest of the values as [mean, weight] centroids, small at the tails."""
+    values = np.sort(values[~np.isnan(values)])
+    n = len(values)
+    if not n:
+        return []
+
+    starts = [0]
+    q = 0.0
+    while q < 1.0:
+        q = _digest_limit(q)
+        end = min(max(int(q * n), starts[-1] + 1), n)
+        if end >= n:
+            break
+        starts.append(end)
+        q = end / n
+
+    starts = np.array(starts)
+    weights = np.diff(np.append(starts, n))
+    means = np.add.reduceat(values, starts) / weights
+    return [[float(mean), int(weight)] for mean, weight in zip(means, weights)]
+
+
+def merge_digests(a: List[List[float]], b: List[List[float]]) -> List[List[float]]:
+    """Merge two t-digests, recompressing adjacent centroids under the size limit."""
+    centroids = sorted(a + b)
+    total = sum(weight for _, weight in centroids)
+    if not centroids:
+        return []
+
+    merged = [list(centroids[0])]
+    weight_before = 0.0
+    limit = _digest_limit(0.0)
+    for mean, weight in centroids[1:]:
+        current = merged[-1]
+        if (weight_before + current[1] + weight) / total <= limit:
+            current[0] += (mean - current[0]) * weight / (current[1] + weight)
+            current[1] += weight
+        else:
+            weight_before += current[1]
+            limit = _digest_limit(weight_before / total)
+            merged.append([mean, weight])
+    return merged
+
+
+def digest_quantile(digest: List[List[float]], q: float, low: float, high: float) -> Optional[float]:
+    """Estimate a quantile by interpolating between centroid centers, clamped to [low, high]."""
+    if not digest:
+        return None
+
+    total = sum(weight for _, weight in digest)
+    target = q * total
+    points = [(0.0, low)]
+    cumulative = 0.0
+    for mean, weight in digest:
+        points.append((cumulative + weight / 2, mean))
+        cumulative += weight
+    points.append((total, high))
+
+    for (x0, y0), (x1, y1) in zip(points, points[1:]):
+        if target <= x1:
+            if x1 == x0:
+                return y1
+            return y0 + (y1 - y0) * (target - x0) / (x1 - x0)
+    return high
+
+
+def _merge_numeric(stats: Dict[str, Any], base: Dict[str, Any], delta: Dict[str, Any]) -> None:
+    """Combine min/max/sum/mean/std (Chan's parallel variance) and quantile digests."""
+    n_a, n_b = base["count"], delta["count"]
+    if not n_b:
+        return
+    if not n_a:
+        stats.update({key: delta[key] for key in ["min", "max", "mean", "std", "sum", "quantiles", "quantile_digest"]})
+        return
+
+    n = n_a + n_b
+    mean_a, mean_b = base["mean"], delta["mean"]
+    m2_a = (base["std"] or 0.0) ** 2 * (n_a - 1)
+    m2_b = (delta["std"] or 0.0) ** 2 * (n_b - 1)
+    difference = mean_b - mean_a
+    m2 = m2_a + m2_b + difference ** 2 * n_a * n_b / n
+
+    # Profiles stored before digests existed only have their quantiles to go on
+    base_digest = base.get("quantile_digest") or [
+        [value, n_a / len(base["quantiles"])] for value in base["quantiles"].values() if value is not None
+    ]
+    digest = merge_digests(base_digest, delta["quantile_digest"])
+
+    stats["min"] = min(base["min"], delta["min"])
+    stats["max"] = max(base["max"], delta["max"])
+    stats["sum"] = base["sum"] + delta["sum"]
+    stats["mean"] = mean_a + difference * n_b / n
+    stats["std"] = math.sqrt(m2 / (n - 1))
+    stats["quantile_digest"] = digest
+    stats["quantiles"] = {str(q): digest_quantile(digest, q, stats["min"], stats["max"]) for q in QUANTILES}
+
+
+class DatasetProfiler:
+    """Deterministic, vectorized statistics for a dataset."""
+
+    @staticmethod
+    def profile(df: pd.DataFrame) -> Dict[str, Any]:
+        """Compute counts, null rates, numeric summaries, top values and cardinality per column."""
+        rows = len(df)
+        counts = df.count()
+
+        numeric_columns = [col for col in df.columns if column_kind(df[col]) == "numeric"]
+        numeric_stats = pd.DataFrame()
+        numeric_quantiles = pd.DataFrame()
+        if numeric_columns and rows:
+            numeric_frame = df[numeric_columns]
+            numeric_stats = numeric_frame.agg(["min", "max", "mean", "std", "sum"])
+            numeric_quantiles = numeric_frame.quantile(QUANTILES)
+
+        columns = {}
+        for col in df.columns:
+            series = df[col]
+            kind = column_kind(series)
+            count = int(counts[col])
+            sketch = distinct_sketch(series)
+            stats: Dict[str, Any] = {
+                "dtype": str(series.dtype),
+                "kind": kind,
+                "count": count,
+                "null_count": rows - count,
+                "null_rate": (rows - count) / rows if rows else 0.0,
+                "distinct": estimate_distinct(sketch),
+                "distinct_sketch": sketch,
+            }
+
+            if kind == "numeric" and col in numeric_stats:
+                stats.update({
+                    stat: _to_json(numeric_stats.at[stat, col])
+                    for stat in ["min", "max", "mean", "std", "sum"]
+                })
+                stats["quantiles"] = {
+                    str(q): _to_json(numeric_quantiles.at[q, col]) for q in QUANTILES
+                }
+                stats["quantile_digest"] = quantile_digest(series.to_numpy(dtype="float64", na_value=np.nan))
+            elif kind == "datetime":
+                stats["min"] = _to_json(series.min())
+                stats["max"] = _to_json(series.max())
+            else:
+                top_values = series.value_counts().head(TOP_K)
+                stats["top_values"] = [[str(value), int(n)] for value, n in top_values.items()]
+
+            columns[str(col)] = stats
+
+        return {"rows": rows, "columns": columns}
+
+    @staticmethod
+    def merge(base: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+        """Combine the profile of stored rows with the profile of appended rows.
+        
+        Counts, sums and extremes add up exactly; mean and std use the parallel
+        variance formula; quantiles and distinct counts come from merged sketches,
+        and top values from summed per-part counts.
+        """
+        rows = base["rows"] + delta["rows"]
+        columns = {}
+        for col, base_stats in base["columns"].items():
+            delta_stats = delta["columns"][col]
+            count = base_stats["count"] + delta_stats["count"]
+            sketch = merge_sketches(base_stats["distinct_sketch"], delta_stats["distinct_sketch"])
+            stats = dict(base_stats)
+            stats.update({
+                # Appended rows carry the current, possibly widened, dtype
+                "dtype": delta_stats["dtype"],
+                "count": count,
+                "null_count": rows - count,
+                "null_rate": (rows - count) / rows if rows else 0.0,
+                "distinct": estimate_distinct(sketch),
+                "distinct_sketch": sketch,
+            })
+
+            if base_stats["kind"] == "numeric" and "mean" in delta_stats:
+                _merge_numeric(stats, base_stats, delta_stats)
+            elif base_stats["kind"] == "datetime":
+                for stat, pick in [("min", min), ("max", max)]:
+                    values = [v for v in (base_stats.get(stat), delta_stats.get(stat)) if v is not None]
+                    stats[stat] = pick(values) if values else None
+            elif "top_values" in base_stats or "top_values" in delta_stats:
+                counts: Dict[str, int] = {}
+                for value, n in base_stats.get("top_values", []) + delta_stats.get("top_values", []):
+                    counts[value] = counts.get(value, 0) + n
+                top_values = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:TOP_K]
+                stats["top_values"] = [[value, n] for value, n in top_values]
+
+            columns[col] = stats
+
+        return {"rows": rows, "columns": columns}
+
+    @staticmethod
+    def columns_of_kind(profile: Dict[str, Any], kind: str) -> List[str]:
+        """List profiled columns of one kind."""
+        return [col for col, stats in profile["columns"].items() if stats["kind"] == kind]
+
+    @staticmethod
+    def describe(profile: Dict[str, Any]) -> str:
+        """Render a compact text summary of a profile, like df.describe()."""
+        lines = []
+        for col, stats in profile["columns"].items():
+            line = (
+                f"{col} ({stats['dtype']}): non-null={stats['count']}, "
+                f"null_rate={stats['null_rate']:.2%}, distinct~{stats['distinct']}"
+            )
+            if stats["kind"] == "numeric" and "mean" in stats:
+                quantiles = stats["quantiles"]
+                line += (
+                    f", min={stats['min']}, p25={quantiles['0.25']}, median={quantiles['0.5']}, "
+                    f"p75={quantiles['0.75']}, max={stats['max']}, mean={stats['mean']}, std={stats['std']}"
+                )
+            elif stats["kind"] == "datetime":
+                line += f", min={stats['min']}, max={stats['max']}"
+            elif stats.get("top_values"):
+                top = ", ".join(f"{value}={n}" for value, n in stats["top_values"][:5])
+                line += f", top: {top}"
+            lines.append(line)
+        return "\n".join(lines)
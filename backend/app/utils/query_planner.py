@@ -0,0 +1,199 @@
+import os
+import re
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import pandas as pd
+from app.utils.answer_cache import normalize_query
+from app.utils.profiler import column_kind
+from app.utils.search_index import search_indexes
+from app.utils.instrumentation import read_rss
+
+# Aggregation words and the pandas method they mean
+AGGREGATIONS = {
+    "average": "mean", "mean": "mean", "avg": "mean",
+    "total": "sum", "sum": "sum",
+    "maximum": "max", "max": "max", "highest": "max", "largest": "max",
+    "minimum": "min", "min": "min", "lowest": "min", "smallest": "min",
+    "median": "median",
+}
+
+# Lead-ins that don't change what is asked
+PREFIX = r"(?:(?:what is|what's|what are|show me|show|give me|tell me|calculate|compute|find|list) )?"
+
+# Trailing references to the dataset itself
+SUFFIX = r"(?: in (?:data|dataset|file|table))?"
+
+AGG = "(?P<agg>" + "|".join(sorted(AGGREGATIONS, key=len, reverse=True)) + ")"
+
+
+class PlanNotApplicable(Exception):
+    """A matched template turned out not to answer the question (e.g. no row matched a lookup)."""
+
+
+@dataclass
+class QueryPlan:
+    """A question recognized by a template, as pandas code and the function that runs it."""
+    template: str
+    code: str
+    run: Callable[[pd.DataFrame], Any]
+
+
+def _phrases(column: str) -> List[str]:
+    """Ways a column may be written in a question: as is, with spaces, and plural."""
+    base = re.sub(r"[_\s]+", " ", column.lower()).strip()
+    phrases = {base, column.lower(), base + "s", base + "es"}
+    if base.endswith("y"):
+        phrases.add(base[:-1] + "ies")
+    return [phrase for phrase in phrases if phrase]
+
+
+@lru_cache(maxsize=256)
+def _column_lookup(columns: Tuple[str, ...]) -> Tuple[str, Dict[str, str]]:
+    """Build a regex alternation of column phrases, longest first, and a phrase-to-column map."""
+    lookup: Dict[str, str] = {}
+    for column in columns:
+        for phrase in _phrases(column):
+            lookup.setdefault(phrase, column)
+    pattern = "|".join(re.escape(phrase) for phrase in sorted(lookup, key=len, reverse=True))
+    return pattern, lookup
+
+
+@lru_cache(maxsize=256)
+def _templates(columns: Tuple[str, ...]) -> List[Tuple[str, "re.Pattern"]]:
+    """Compile the question templates for one set of column names."""
+    cols, _ = _column_lookup(columns)
+    if not cols:
+        return []
+
+    def col(name: str) -> str:
+        return f"(?P<{name}>{cols})"
+
+    # Tried in order; several wordings may share a template name
+    templates = [
+        ("group_aggregate", (
+            f"{AGG}(?: of)? {col('value')} "
+            f"(?:by|per|for each|in each|across|across each|for every|grouped by|broken down by) {col('group')}"
+        )),
+        ("value_counts", rf"how many(?: \w+){{0,3}} (?:in|per|by|for|from|of) (?:each|every) {col('column')}"),
+        ("value_counts", rf"(?:count|number|distribution|breakdown)(?: of \w+)? (?:by|per|of|for each|in each) {col('column')}"),
+        ("value_counts", f"value counts (?:of|for) {col('column')}"),
+        ("correlation", f"(?:correlation|relationship) (?:between|of) {col('first')} (?:and|with) {col('second')}"),
+        ("unique_count", f"(?:how many|number of) (?:unique|distinct|different) {col('column')}"),
+        ("aggregate", f"{AGG}(?: of)? {col('value')}"),
+        ("row_count", r"how many (?:rows|records|entries)(?: are there| (?:are|is) in (?:data|dataset|file)| (?:does|do) (?:data|dataset|file) have)?"),
+        ("lookup", f"{col('value')} of (?P<entity>.+)"),
+    ]
+    return [
+        (name, re.compile(f"{PREFIX}{template}{SUFFIX}", re.IGNORECASE))
+        for name, template in templates
+    ]
+
+
+def _lookup(df: pd.DataFrame, key: str, entity: str, value: str) -> Any:
+    """Value of a column for the first row whose key column contains the entity, found by its search index."""
+    matches = search_indexes.find_rows(df, key, entity)
+    if matches.empty:
+        # Probably not a name after all; leave the question to the LLM
+        raise PlanNotApplicable(entity)
+    return matches[value].iloc[0]
+
+
+class QueryPlanner:
+    """Answers common analytical questions from templates, without calling the LLM."""
+
+    def plan(self, query: str, df: pd.DataFrame) -> Optional[QueryPlan]:
+        """Match the question against the templates for df's columns."""
+        columns = tuple(str(column) for column in df.columns)
+        _, lookup = _column_lookup(columns)
+        question = re.sub(r"\bthe ", "", normalize_query(query))
+
+        for name, pattern in _templates(columns):
+            match = pattern.fullmatch(question)
+            if match:
+                groups = {key: lookup.get(value, value) for key, value in match.groupdict().items() if value}
+                plan = getattr(self, f"_plan_{name}")(df, groups)
+                if plan:
+                    return plan
+        return None
+
+    @staticmethod
+    def _is_numeric(df: pd.DataFrame, column: str) -> bool:
+        return column_kind(df[column]) == "numeric"
+
+    def _plan_group_aggregate(self, df: pd.DataFrame, groups: Dict[str, str]) -> Optional[QueryPlan]:
+        value, group, agg = groups["value"], groups["group"], AGGREGATIONS[groups["agg"]]
+        if value == group or not self._is_numeric(df, value):
+            return None
+        return QueryPlan(
+            "group_aggregate",
+            f"df.groupby({group!r}, observed=True)[{value!r}].{agg}()",
+            lambda df: getattr(df.groupby(group, observed=True)[value], agg)()
+        )
+
+    def _plan_value_counts(self, df: pd.DataFrame, groups: Dict[str, str]) -> Optional[QueryPlan]:
+        column = groups["column"]
+        return QueryPlan("value_counts", f"df[{column!r}].value_counts()", lambda df: df[column].value_counts())
+
+    def _plan_correlation(self, df: pd.DataFrame, groups: Dict[str, str]) -> Optional[QueryPlan]:
+        first, second = groups["first"], groups["second"]
+        if first == second or not (self._is_numeric(df, first) and self._is_numeric(df, second)):
+            return None
+        return QueryPlan(
+            "correlation",
+            f"df[[{first!r}, {second!r}]].corr().iloc[0,1]",
+            lambda df: df[[first, second]].corr().iloc[0, 1]
+        )
+
+    def _plan_unique_count(self, df: pd.DataFrame, groups: Dict[str, str]) -> Optional[QueryPlan]:
+        column = groups["column"]
+        return QueryPlan("unique_count", f"df[{column!r}].nunique()", lambda df: df[column].nunique())
+
+    def _plan_aggregate(self, df: pd.DataFrame, groups: Dict[str, str]) -> Optional[QueryPlan]:
+        value, agg = groups["value"], AGGREGATIONS[groups["agg"]]
+        if not self._is_numeric(df, value):
+            return None
+        return QueryPlan("aggregate", f"df[{value!r}].{agg}()", lambda df: getattr(df[value], agg)())
+
+    def _plan_row_count(self, df: pd.DataFrame, groups: Dict[str, str]) -> Optional[QueryPlan]:
+        return QueryPlan("row_count", "len(df)", len)
+
+    def _plan_lookup(self, df: pd.DataFrame, groups: Dict[str, str]) -> Optional[QueryPlan]:
+        # Entities are looked up in a name-like text column, as in the prompt's examples
+        key = next(
+            (
+                str(column) for column in df.columns
+                if "name" in str(column).lower() and column_kind(df[column]) == "categorical"
+                and pd.api.types.is_string_dtype(df[column])
+            ),
+            None
+        )
+        value, entity = groups["value"], groups["entity"].strip()
+        if key is None or value == key or not entity:
+            return None
+        return QueryPlan(
+            "lookup",
+            f"find_rows(df, {key!r}, {entity!r})[{value!r}].iloc[0]",
+            lambda df: _lookup(df, key, entity, value)
+        )
+
+    @staticmethod
+    def execute(plan: QueryPlan, df: pd.DataFrame) -> Tuple[Any, Dict[str, float]]:
+        """Run a plan in-process and report its resource usage like a sandboxed execution.
+
+        Memory is the growth of the API process's resident set from before the
+        plan to after it, since a thread can't be measured apart from its process.
+        """
+        started = time.perf_counter()
+        cpu_started = time.thread_time()
+        rss_started = read_rss(os.getpid())
+        result = plan.run(df)
+        return result, {
+            "wall_seconds": time.perf_counter() - started,
+            "cpu_seconds": time.thread_time() - cpu_started,
+            "peak_rss_increase_bytes": max(read_rss(os.getpid()) - rss_started, 0),
+        }
+
+
+query_planner = QueryPlanner()
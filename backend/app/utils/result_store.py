@@ -0,0 +1,341 @@
+import gzip
+import json
+import math
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import pandas as pd
+import pyarrow as pa
+from fastapi import HTTPException
+from app.core.config import settings
+
+try:
+    # Optional: a faster JSON encoder that writes numpy arrays directly
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    # Optional: zstd compression of result pages
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Result ids are uuid4 hex strings; anything else never names a stored file
+RESULT_ID = re.compile(r"[0-9a-f]{32}")
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# How often a worker re-reads the directory to account for results other workers stored or deleted
+RESCAN_SECONDS = 60.0
+
+
+@dataclass
+class StoredResult:
+    """A tabular analysis result kept server-side, and its shape."""
+    result_id: str
+    rows: int
+    columns: List[str]
+
+
+class ResultStore:
+    """DataFrame and Series results of analyses, kept as Arrow IPC files to be read a page at a time.
+
+    Each result is written once, with a non-default index turned into leading
+    columns, and memory-mapped to serve pages, so a result of any size costs a
+    slice per request rather than a full conversion. The files live in a
+    directory every API worker shares; results expire ttl_seconds after last
+    being read, and the least recently read are deleted when the directory
+    grows past max_bytes. Sizes and read times are tracked in memory, so
+    storing a result doesn't list the directory; each worker re-reads it every
+    RESCAN_SECONDS to account for the other workers' results.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, ttl_seconds: float):
+        """Initialize the store over a directory, created on first write."""
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # Known results by id, as (size, last read), least recently read first
+        self._entries: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self.current_bytes = 0
+        self._scanned_at: Optional[float] = None
+        self.stores = 0
+        self.rejected = 0
+        self.evictions = 0
+        self.pages = 0
+        self.bytes_served = 0
+
+    def put(self, result: Any) -> Optional[StoredResult]:
+        """Store a DataFrame or Series result; return None for other results or ones Arrow can't type."""
+        if not isinstance(result, (pd.DataFrame, pd.Series)):
+            return None
+        try:
+            table = self.to_table(result)
+        except (pa.ArrowException, ValueError, TypeError):
+            self.rejected += 1
+            return None
+        if table.nbytes > self.max_bytes:
+            self.rejected += 1
+            return None
+
+        os.makedirs(self.directory, exist_ok=True)
+        result_id = uuid.uuid4().hex
+        path = self._path(result_id)
+        temp_path = f"{path}.tmp"
+        try:
+            with pa.OSFile(temp_path, "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(temp_path, path)
+        except BaseException:
+            self._remove(temp_path)
+            raise
+
+        with self._lock:
+            self.stores += 1
+            self._rescan_if_due()
+            self._track(result_id, os.path.getsize(path))
+            self._make_room()
+        return StoredResult(result_id, table.num_rows, table.column_names)
+
+    def get(self, result_id: str) -> Optional[StoredResult]:
+        """Return a stored result's shape, or None if it is unknown or expired."""
+        table = self._open(result_id)
+        if table is None:
+            return None
+        return StoredResult(result_id, table.num_rows, table.column_names)
+
+    def page(self, result_id: str, cursor: int, limit: int) -> Tuple[pa.Table, int, Optional[int]]:
+        """Return up to limit rows from cursor, the total row count and the next cursor (None after the last page)."""
+        table = self._open(result_id)
+        if table is None:
+            raise HTTPException(status_code=404, detail="Result not found or expired")
+        if cursor > table.num_rows:
+            raise HTTPException(status_code=400, detail=f"Cursor {cursor} is past the last row ({table.num_rows})")
+        next_cursor = cursor + limit if cursor + limit < table.num_rows else None
+        return table.slice(cursor, limit), table.num_rows, next_cursor
+
+    def record_served(self, size: int) -> None:
+        """Count a page sent to a client."""
+        with self._lock:
+            self.pages += 1
+            self.bytes_served += size
+
+    def _open(self, result_id: str) -> Optional[pa.Table]:
+        """Map a stored result, refreshing its expiry; None if unknown or expired."""
+        if not RESULT_ID.fullmatch(result_id):
+            return None
+        path = self._path(result_id)
+        try:
+            stat = os.stat(path)
+            if time.time() - stat.st_mtime > self.ttl_seconds:
+                self._delete(result_id)
+                return None
+            table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+            os.utime(path)
+        except (OSError, pa.ArrowException):
+            # Never stored, or evicted by another worker
+            with self._lock:
+                self._forget(result_id)
+            return None
+        with self._lock:
+            self._track(result_id, stat.st_size)
+        return table
+
+    def _track(self, result_id: str, size: int) -> None:
+        """Record a result as just stored or read. Call with the lock held."""
+        self._forget(result_id)
+        self._entries[result_id] = (size, time.time())
+        self.current_bytes += size
+
+    def _forget(self, result_id: str) -> None:
+        """Stop accounting for a result. Call with the lock held."""
+        entry = self._entries.pop(result_id, None)
+        if entry is not None:
+            self.current_bytes -= entry[0]
+
+    def _delete(self, result_id: str) -> None:
+        with self._lock:
+            self._forget(result_id)
+        self._remove(self._path(result_id))
+
+    def _rescan_if_due(self) -> None:
+        """Rebuild the accounting from the directory when it is older than RESCAN_SECONDS. Call with the lock held."""
+        now = time.monotonic()
+        if self._scanned_at is not None and now - self._scanned_at < RESCAN_SECONDS:
+            return
+        self._scanned_at = now
+        entries = []
+        if os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                if not entry.name.endswith(".arrow"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.name[:-len(".arrow")]))
+        self._entries = OrderedDict((result_id, (size, mtime)) for mtime, size, result_id in sorted(entries))
+        self.current_bytes = sum(size for _, size, _ in entries)
+
+    def _make_room(self) -> None:
+        """Delete expired results, then the least recently read ones until the store fits max_bytes.
+
+        Call with the lock held.
+        """
+        expired_before = time.time() - self.ttl_seconds
+        while self._entries:
+            result_id, (size, last_read) = next(iter(self._entries.items()))
+            if last_read >= expired_before and self.current_bytes <= self.max_bytes:
+                break
+            self._forget(result_id)
+            self._remove(self._path(result_id))
+            if last_read >= expired_before:
+                self.evictions += 1
+
+    def _path(self, result_id: str) -> str:
+        return os.path.join(self.directory, f"{result_id}.arrow")
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def to_table(result: Any) -> pa.Table:
+        """Convert a DataFrame or Series to an Arrow table with unique string column names.
+
+        A meaningful index (group labels, filtered row numbers) becomes leading
+        columns, as it is shown in the text preview; a default 0..n-1 index is dropped.
+        """
+        if isinstance(result, pd.Series):
+            frame = result.to_frame(name=result.name if result.name is not None else "value")
+        else:
+            frame = result
+        index = frame.index
+        if not (isinstance(index, pd.RangeIndex) and index.start == 0 and index.step == 1):
+            frame = frame.reset_index(allow_duplicates=True)
+
+        names, seen = [], set()
+        for column in frame.columns:
+            name = " ".join(map(str, column)) if isinstance(column, tuple) else str(column)
+            unique, suffix = name, 1
+            while unique in seen:
+                unique, suffix = f"{name}_{suffix}", suffix + 1
+            seen.add(unique)
+            names.append(unique)
+        frame = frame.set_axis(names, axis=1)
+
+        try:
+            return pa.Table.from_pandas(frame, preserve_index=False)
+        except (pa.ArrowException, TypeError):
+            # Mixed-type object columns: keep them as text
+            mixed = {name: frame[name] for name in names if frame[name].dtype == object}
+            frame = frame.assign(**{
+                name: column.where(column.isna(), column.astype(str)) for name, column in mixed.items()
+            })
+            return pa.Table.from_pandas(frame, preserve_index=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return stored result counts and sizes, and serving counters."""
+        with self._lock:
+            self._rescan_if_due()
+            return {
+                "results": len(self._entries),
+                "stored_bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "stores": self.stores,
+                "rejected": self.rejected,
+                "evictions": self.evictions,
+                "pages": self.pages,
+                "bytes_served": self.bytes_served,
+                "json_encoder": "orjson" if orjson is not None else "json",
+                "zstd_available": zstandard is not None,
+            }
+
+
+def encode_json(page: pa.Table, result_id: str, total_rows: int, cursor: int, next_cursor: Optional[int]) -> bytes:
+    """Encode a page as typed columnar JSON: one entry per column with its Arrow type and values."""
+    columns = []
+    for field, column in zip(page.schema, page.columns):
+        data_type = field.type.value_type if pa.types.is_dictionary(field.type) else field.type
+        array = column.combine_chunks() if column.num_chunks != 1 else column.chunk(0)
+        if orjson is not None and column.null_count == 0 and (
+            pa.types.is_integer(data_type) or pa.types.is_floating(data_type) or pa.types.is_boolean(data_type)
+        ):
+            # orjson writes numpy arrays natively, without a Python object per value
+            values = array.to_numpy(zero_copy_only=False)
+        else:
+            values = array.to_pylist()
+            if orjson is None and (pa.types.is_floating(data_type) or pa.types.is_decimal(data_type)):
+                # NaN and infinities are not JSON; orjson writes them as null, so match it
+                values = [None if value is None or not math.isfinite(value) else value for value in values]
+        columns.append({"name": field.name, "type": str(data_type), "values": values})
+
+    payload = {
+        "result_id": result_id,
+        "total_rows": total_rows,
+        "cursor": cursor,
+        "next_cursor": next_cursor,
+        "rows": page.num_rows,
+        "columns": columns,
+    }
+    if orjson is not None:
+        return orjson.dumps(payload, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, default=_json_default, separators=(",", ":"), allow_nan=False).encode()
+
+
+def encode_arrow(page: pa.Table) -> bytes:
+    """Encode a page as an Arrow IPC stream."""
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, page.schema) as writer:
+        writer.write_table(page)
+    return sink.getvalue().to_pybytes()
+
+
+def _json_default(value: Any) -> Any:
+    """Serialize values the JSON encoders don't know: dates as ISO strings, anything else as text."""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+def choose_encoding(requested: Optional[str], accept_encoding: str) -> Optional[str]:
+    """Pick the page compression: the one requested, else the best the client accepts."""
+    if requested is not None:
+        if requested == "zstd" and zstandard is None:
+            raise HTTPException(status_code=400, detail="zstd compression is not available on this server")
+        return None if requested == "none" else requested
+    accepted = {token.split(";")[0].strip().lower() for token in accept_encoding.split(",")}
+    if "zstd" in accepted and zstandard is not None:
+        return "zstd"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """Compress a page body; small bodies are sent as they are."""
+    if encoding is None or len(body) < settings.result_compression_min_bytes:
+        return body, None
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(body), "zstd"
+    return gzip.compress(body, compresslevel=5), "gzip"
+
+
+result_store = ResultStore(
+    settings.result_store_dir,
+    settings.result_store_max_bytes,
+    settings.result_store_ttl_seconds
+)
@@ -0,0 +1,409 @@
+import json
+import os
+import pickle
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+import numpy as np
+import pandas as pd
+from pandas.api import types as ptypes
+from app.core.config import settings
+
+# Separates distinct values in the trigram buffer; values containing it are always checked directly
+SEPARATOR = b"\0"
+
+NO_ROWS = np.empty(0, dtype=np.intp)
+
+# Arrays an index is stored as; everything else is derived from the distinct values
+INDEX_ARRAYS = ("values", "order", "bounds", "postings", "grams", "starts", "unindexed")
+
+
+def is_text(series: pd.Series) -> bool:
+    """Whether a column holds text: object or string dtype, or categories of text."""
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return ptypes.is_string_dtype(dtype.categories.dtype)
+    return ptypes.is_string_dtype(dtype)
+
+
+class ColumnSearchIndex:
+    """Exact and substring lookups over one text column, without scanning its rows.
+
+    The column is factorized into distinct values and, for each, the positions
+    of its rows. Exact matches are a hash lookup of the value. Substring
+    matches intersect the posting lists of the needle's byte trigrams (of the
+    upper-cased UTF-8 distinct values) and check only the values left, the
+    way Series.str.contains(case=False, regex=False) compares them on object
+    columns (Arrow-backed strings differ from it only for characters whose
+    upper case is several characters, such as ß). Needles
+    shorter than three bytes check every distinct value, which is still far
+    fewer than rows on the name-like columns lookups are made on.
+    """
+
+    def __init__(self, series: pd.Series):
+        """Build the index over a column's current values."""
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        values = np.asarray(uniques, dtype=object)
+
+        # Row positions of each distinct value, in row order
+        self._order = np.argsort(codes, kind="stable")
+        self._bounds = np.searchsorted(codes[self._order], np.arange(len(values) + 1))
+        self._set_values(values)
+
+        encoded = [text.encode("utf-8", "surrogatepass") if text is not None else b"" for text in self._upper]
+        buffer = np.frombuffer(SEPARATOR.join(encoded) + SEPARATOR, dtype=np.uint8)
+        self._unindexed = NO_ROWS
+        if np.count_nonzero(buffer == 0) > len(encoded):
+            # Rare: values containing the separator are left out of the trigrams and always checked
+            self._unindexed = np.flatnonzero([SEPARATOR in raw for raw in encoded])
+            for i in self._unindexed:
+                encoded[i] = b""
+            buffer = np.frombuffer(SEPARATOR.join(encoded) + SEPARATOR, dtype=np.uint8)
+
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        first, second, third = buffer[:-2], buffer[1:-1], buffer[2:]
+        grams = (first.astype(np.uint32) << 16) | (second.astype(np.uint32) << 8) | third.astype(np.uint32)
+        valid = (first != 0) & (second != 0) & (third != 0)
+        owners = np.repeat(np.arange(len(encoded), dtype=np.uint64), lengths + 1)[:-2]
+
+        # Sorted unique (trigram, value) pairs: posting lists in value order, one after another
+        pairs = (grams[valid].astype(np.uint64) << np.uint64(32)) | owners[valid]
+        pairs.sort()
+        if len(pairs):
+            pairs = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))]
+        self._postings = (pairs & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+        keys = (pairs >> np.uint64(32)).astype(np.uint32)
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1]))) if len(keys) else NO_ROWS
+        self._grams = keys[starts]
+        self._starts = np.append(starts, len(pairs))
+        self._set_size()
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "ColumnSearchIndex":
+        """Rebuild an index stored with to_arrays(), without factorizing the column again."""
+        index = cls.__new__(cls)
+        index._order, index._bounds = arrays["order"], arrays["bounds"]
+        index._postings, index._grams, index._starts = arrays["postings"], arrays["grams"], arrays["starts"]
+        index._unindexed = arrays["unindexed"]
+        index._set_values(arrays["values"])
+        index._set_size()
+        return index
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """The arrays from_arrays() rebuilds the index from."""
+        return {
+            "values": self._values, "order": self._order, "bounds": self._bounds, "postings": self._postings,
+            "grams": self._grams, "starts": self._starts, "unindexed": self._unindexed,
+        }
+
+    def _set_values(self, values: np.ndarray) -> None:
+        """Keep the distinct values, hashed for exact lookups and upper-cased for substring checks."""
+        self.rows = len(self._order)
+        self._values = values
+        self._hashed = pd.Index(values, dtype=object)
+        # Non-text values (in object columns) are never matched by a substring, like str.contains
+        self._upper = [value.upper() if isinstance(value, str) else None for value in values]
+        self._text_ids = np.flatnonzero(
+            np.fromiter((text is not None for text in self._upper), dtype=bool, count=len(values))
+        )
+
+    def _set_size(self) -> None:
+        self.nbytes = int(
+            self._order.nbytes + self._bounds.nbytes + self._postings.nbytes + self._grams.nbytes
+            + self._starts.nbytes + self._hashed.memory_usage(deep=False)
+            # The upper-cased copies of the distinct values
+            + sum(len(text) for text in self._upper if text is not None) + 56 * len(self._values)
+        )
+
+    def equal(self, value: Any) -> np.ndarray:
+        """Positions of the rows equal to value, in row order."""
+        try:
+            position = self._hashed.get_indexer([value])[0]
+        except TypeError:
+            return NO_ROWS
+        if position < 0:
+            return NO_ROWS
+        return self._order[self._bounds[position]:self._bounds[position + 1]]
+
+    def contains(self, text: str, case: bool = False) -> np.ndarray:
+        """Positions of the rows containing text, in row order."""
+        needle = text.upper()
+        raw = needle.encode("utf-8", "surrogatepass")
+        if len(raw) < 3 or SEPARATOR in raw:
+            candidates = self._text_ids
+        else:
+            candidates = self._candidates(raw)
+
+        if case:
+            matched = [i for i in candidates if text in self._values[i]]
+        else:
+            matched = [i for i in candidates if needle in self._upper[i]]
+        if not matched:
+            return NO_ROWS
+        if len(matched) == 1:
+            return self._order[self._bounds[matched[0]]:self._bounds[matched[0] + 1]]
+        return np.sort(np.concatenate([self._order[self._bounds[i]:self._bounds[i + 1]] for i in matched]))
+
+    def _candidates(self, raw: bytes) -> np.ndarray:
+        """Distinct values containing every trigram of the needle, plus those not in the trigram index."""
+        postings = []
+        for gram in {(raw[i] << 16) | (raw[i + 1] << 8) | raw[i + 2] for i in range(len(raw) - 2)}:
+            i = np.searchsorted(self._grams, gram)
+            if i == len(self._grams) or self._grams[i] != gram:
+                return self._unindexed
+            postings.append(self._postings[self._starts[i]:self._starts[i + 1]])
+
+        postings.sort(key=len)
+        candidates = postings[0]
+        for posting in postings[1:]:
+            if not len(candidates):
+                break
+            candidates = np.intersect1d(candidates, posting, assume_unique=True)
+        return np.union1d(candidates, self._unindexed) if len(self._unindexed) else candidates
+
+
+def _data_key(series: pd.Series) -> Tuple[Tuple, Any]:
+    """Identify a column's data, shared by every shallow copy of its frame, and the object that owns it."""
+    if isinstance(series.dtype, np.dtype):
+        # A fresh view of the frame's block on every access: identify the memory it points at
+        array = series.to_numpy()
+        owner = array
+        while isinstance(owner.base, np.ndarray):
+            owner = owner.base
+        return (id(owner), array.__array_interface__["data"][0], array.strides, len(array)), owner
+    values = series.array
+    return (id(values), len(values)), values
+
+
+class SearchIndexes:
+    """Per-process cache of column search indexes, kept while the column data they index is alive.
+
+    Indexes are found by the identity of a column's data, so every shallow copy
+    of a cached or shared frame (each read, each sandboxed execution) uses the
+    index built for it, and replacing a column in a copy falls back to a scan.
+    Indexes are built for every text column at upload, or when a column is
+    searched again, and the least recently used are dropped past max_bytes.
+    Indexes built at upload are also saved next to the file, so other
+    processes (sandbox workers, other API workers, the next start) load them
+    with the frame instead of building them again.
+    """
+
+    def __init__(self, max_bytes: int, min_rows: int, enabled: bool = True):
+        """Initialize an empty cache."""
+        self.max_bytes = max_bytes
+        self.min_rows = min_rows
+        self.enabled = enabled
+        self._entries: "OrderedDict[Tuple, ColumnSearchIndex]" = OrderedDict()
+        self._oversized: Set[Tuple] = set()
+        # Data searched once without an index, by key
+        self._searched: Set[Tuple] = set()
+        # Reentrant: data garbage-collected while the lock is held drops its index
+        self._lock = threading.RLock()
+        self.current_bytes = 0
+        self.builds = 0
+        self.build_seconds = 0.0
+        self.indexed_lookups = 0
+        self.scans = 0
+        self.evictions = 0
+
+    def get(self, series: pd.Series, build: bool = True) -> Optional[ColumnSearchIndex]:
+        """Return the column's index, or None to scan it.
+
+        With build, a column is indexed the second time it is searched: data
+        made for one query (a transformed column, a resample) is scanned once
+        rather than indexed for nothing.
+        """
+        if not self._indexable(series):
+            return None
+
+        key, owner = _data_key(series)
+        with self._lock:
+            index = self._entries.get(key)
+            if index is not None:
+                self._entries.move_to_end(key)
+                return index
+            if not build or key in self._oversized:
+                return None
+            if key not in self._searched:
+                self._searched.add(key)
+                weakref.finalize(owner, self._drop, key)
+                return None
+        return self._build(series, key, owner)
+
+    def build(self, df: pd.DataFrame, columns: Optional[List[str]] = None) -> int:
+        """Index a frame's text columns ahead of use; return how many are indexed."""
+        built = 0
+        for column in columns or df.columns:
+            series = df[column]
+            if not self._indexable(series):
+                continue
+            key, owner = _data_key(series)
+            with self._lock:
+                indexed = key in self._entries
+            if indexed or self._build(series, key, owner) is not None:
+                built += 1
+        return built
+
+    def save(self, df: pd.DataFrame, path: str, version: str) -> int:
+        """Store the indexes built for a frame's columns at path, for the given version of its file.
+
+        Returns how many columns were stored; nothing is written if none are indexed.
+        """
+        arrays: Dict[str, np.ndarray] = {}
+        columns = []
+        for column in df.columns:
+            series = df[column]
+            if not self._indexable(series):
+                continue
+            with self._lock:
+                index = self._entries.get(_data_key(series)[0])
+            if index is None:
+                continue
+            for name, array in index.to_arrays().items():
+                arrays[f"{len(columns)}.{name}"] = array
+            columns.append(str(column))
+        if not columns:
+            return 0
+
+        temp_path = f"{path}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                np.savez(f, version=np.array(version), columns=np.array(json.dumps(columns)), **arrays)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return len(columns)
+
+    def load(self, df: pd.DataFrame, path: str, version: str) -> int:
+        """Adopt the indexes save() stored for this version of a frame's file as its columns' indexes.
+
+        Returns how many were loaded; a missing, unreadable or outdated file loads none.
+        """
+        if not self.enabled or not os.path.exists(path):
+            return 0
+
+        loaded = 0
+        try:
+            with np.load(path, allow_pickle=True) as stored:
+                if str(stored["version"]) != version:
+                    return 0
+                for position, column in enumerate(json.loads(str(stored["columns"]))):
+                    if column not in df.columns or not self._indexable(df[column]):
+                        continue
+                    key, owner = _data_key(df[column])
+                    with self._lock:
+                        indexed = key in self._entries
+                    if indexed:
+                        continue
+                    index = ColumnSearchIndex.from_arrays(
+                        {name: stored[f"{position}.{name}"] for name in INDEX_ARRAYS}
+                    )
+                    if index.rows == len(df) and self._add(key, owner, index) is not None:
+                        loaded += 1
+        except (OSError, ValueError, KeyError, pickle.UnpicklingError):
+            # A damaged file: columns not loaded by now are indexed on demand
+            pass
+        return loaded
+
+    def _indexable(self, series: pd.Series) -> bool:
+        return self.enabled and len(series) >= self.min_rows and is_text(series)
+
+    def _build(self, series: pd.Series, key: Tuple, owner: Any) -> Optional[ColumnSearchIndex]:
+        """Build and cache a column's index."""
+        started = time.perf_counter()
+        index = ColumnSearchIndex(series)
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self.builds += 1
+            self.build_seconds += elapsed
+        return self._add(key, owner, index)
+
+    def _add(self, key: Tuple, owner: Any, index: ColumnSearchIndex) -> Optional[ColumnSearchIndex]:
+        """Cache an index for the data under key, evicting the least recently used over budget."""
+        with self._lock:
+            # Dropped with the data, so a reused id never finds a stale index
+            weakref.finalize(owner, self._drop, key)
+            if index.nbytes > self.max_bytes:
+                # Scanned from now on rather than rebuilt on every lookup
+                self._oversized.add(key)
+                return None
+            if key not in self._entries:
+                self._entries[key] = index
+                self.current_bytes += index.nbytes
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+                self.evictions += 1
+        return index
+
+    def find_rows(
+        self, df: pd.DataFrame, column: str, text: str, case: bool = False, build: bool = True
+    ) -> pd.DataFrame:
+        """Rows whose column contains text, as df[df[column].str.contains(text, case=case, na=False, regex=False)]."""
+        index = self.get(df[column], build) if isinstance(text, str) else None
+        if index is None:
+            self._count_scan()
+            return df[df[column].str.contains(text, case=case, na=False, regex=False)]
+        self._count_lookup()
+        return df.iloc[index.contains(text, case)]
+
+    def match_rows(self, df: pd.DataFrame, column: str, value: Any, build: bool = True) -> pd.DataFrame:
+        """Rows whose column equals value, as df[df[column] == value]."""
+        index = self.get(df[column], build)
+        if index is None:
+            self._count_scan()
+            return df[df[column] == value]
+        self._count_lookup()
+        return df.iloc[index.equal(value)]
+
+    def _count_lookup(self) -> None:
+        with self._lock:
+            self.indexed_lookups += 1
+
+    def _count_scan(self) -> None:
+        with self._lock:
+            self.scans += 1
+
+    def _drop(self, key: Tuple) -> None:
+        with self._lock:
+            self._oversized.discard(key)
+            self._searched.discard(key)
+            index = self._entries.pop(key, None)
+            if index is not None:
+                self.current_bytes -= index.nbytes
+
+    def stats(self) -> Dict[str, Any]:
+        """Return this process's index count, memory use and lookup counters."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "indexes": len(self._entries),
+                "current_bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "builds": self.builds,
+                "build_seconds": self.build_seconds,
+                "indexed_lookups": self.indexed_lookups,
+                "scans": self.scans,
+                "evictions": self.evictions,
+            }
+
+
+search_indexes = SearchIndexes(
+    settings.search_index_max_bytes,
+    settings.search_index_min_rows,
+    settings.search_index_enabled
+)
+
+
+def find_rows(df: pd.DataFrame, column: str, text: str, case: bool = False) -> pd.DataFrame:
+    """Rows of df whose column contains text, case-insensitive by default, using the column's index."""
+    return search_indexes.find_rows(df, column, text, case)
+
+
+def match_rows(df: pd.DataFrame, column: str, value: Any) -> pd.DataFrame:
+    """Rows of df whose column equals value, using the column's index."""
+    return search_indexes.match_rows(df, column, value)
@@ -0,0 +1,360 @@
+import errno
+import logging
+import mmap
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_NAME = "registry.sqlite3"
+
+# Upper bound on the default budget, which is otherwise half the directory's free space at startup
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024 * 1024
+
+
+class SharedDatasetStore:
+    """Loaded datasets published once as Arrow IPC files and memory-mapped by every process.
+
+    The first process to load a dataset writes it, uncompressed, to a directory
+    that should live in shared memory (tmpfs such as /dev/shm). Every API worker
+    and sandbox worker then maps that file and gets a DataFrame over the mapped
+    pages, so the operating system keeps one copy in RAM however many processes
+    use it. A SQLite registry in the same directory records which processes
+    have frames attached to each dataset; when publishing would go over
+    max_bytes, the least recently used datasets no live process has attached
+    are deleted first. A dataset stays attached while any frame mapping it, or
+    any copy of one made with copy(), is alive. Datasets that can't be written
+    (a full tmpfs, for one) are kept private instead.
+
+    Attached frames are read-only: their numeric columns are the shared pages.
+    Callers that may write to a frame take a copy() first, whose columns map
+    the same file copy-on-write.
+    """
+
+    def __init__(self, directory: str, max_bytes: Optional[int], enabled: bool = True):
+        """Open (or create) the shared directory and its registry; disable sharing if that fails.
+
+        Without max_bytes the budget is half the directory's free space, at most DEFAULT_MAX_BYTES.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes or 0
+        self.enabled = enabled
+        self._conn = None
+        # Reentrant: a frame garbage-collected while the lock is held releases its attachment
+        self._lock = threading.RLock()
+
+        # Frames alive in this process per attached dataset key, and by frame id the key and the
+        # open file and address of the mapping its columns point into
+        self._attached: Dict[str, int] = {}
+        self._frames: Dict[int, Tuple[str, Any, int]] = {}
+        self.attaches = 0
+        self.publishes = 0
+        self.evictions = 0
+        self.rejected = 0
+
+        if not enabled:
+            return
+        try:
+            os.makedirs(directory, exist_ok=True)
+            if max_bytes is None:
+                self.max_bytes = min(DEFAULT_MAX_BYTES, self._free_bytes() // 2)
+            # Workers wait on each other's writes rather than fail
+            self._conn = sqlite3.connect(
+                os.path.join(directory, REGISTRY_NAME), timeout=30, check_same_thread=False, isolation_level=None
+            )
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS datasets ("
+                "key TEXT PRIMARY KEY, path TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS attachments ("
+                "key TEXT NOT NULL, pid INTEGER NOT NULL, count INTEGER NOT NULL, PRIMARY KEY (key, pid))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS datasets_last_used ON datasets (last_used)")
+        except (OSError, sqlite3.Error) as e:
+            logger.warning("Shared dataset memory disabled, %s is unusable: %s", directory, e)
+            self.enabled = False
+
+    def attach(
+        self,
+        key: str,
+        columns: Optional[List[str]] = None,
+        types_mapper: Optional[Callable[[pa.DataType], Any]] = None
+    ) -> Optional[pd.DataFrame]:
+        """Map a published dataset and return it as a DataFrame, or None if it is not published.
+
+        Numeric columns without nulls and Arrow-backed strings point straight at
+        the mapped pages; only other columns are converted into process memory.
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            row = self._conn.execute("SELECT path FROM datasets WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            try:
+                file = open(row[0], "rb")
+                buffer = pa.py_buffer(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+                table = pa.ipc.open_file(pa.BufferReader(buffer)).read_all()
+                self._conn.execute("UPDATE datasets SET last_used = ? WHERE key = ?", (time.time(), key))
+                # Registered before converting, so the file can't be evicted in between
+                self._acquire(key)
+            except (OSError, ValueError, pa.ArrowException, sqlite3.Error):
+                # Reserved by a publisher still writing it, evicted since the lookup, or the registry is unwritable
+                return None
+            self.attaches += 1
+
+        try:
+            if columns:
+                table = table.select(columns)
+            df = table.to_pandas(split_blocks=True, self_destruct=False, types_mapper=types_mapper)
+        except BaseException:
+            self._release(key)
+            raise
+        self._track(df, (key, file, buffer.address))
+        return df
+
+    def copy(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Shallow-copy a frame into one its caller may write to.
+
+        The read-only columns of an attached frame are mapped again from the
+        same file, copy-on-write: the copy shares their pages until it writes,
+        and a write copies only the pages it touches, so it never reaches the
+        frame the copy came from or other processes. A copy of an attached
+        frame keeps its dataset attached for as long as it lives.
+        """
+        with self._lock:
+            source = self._frames.get(id(df))
+        if source is None:
+            return df.copy(deep=False)
+
+        key, file, address = source
+        private = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+        columns = {}
+        for position in range(df.shape[1]):
+            column = df.iloc[:, position]
+            if isinstance(column.dtype, np.dtype) and column.dtype.kind in "iufcmM":
+                values = column.to_numpy()
+                columns[position] = values if values.flags.writeable else self._remap(values, private, address)
+            else:
+                columns[position] = column.array
+        copied = pd.DataFrame(columns, index=df.index, copy=False)
+        copied.columns = df.columns
+
+        with self._lock:
+            try:
+                self._acquire(key)
+            except sqlite3.Error:
+                # The registry is unwritable; the copy still works while the frame it came from is attached
+                return copied
+        self._track(copied, source)
+        return copied
+
+    @staticmethod
+    def _remap(values: np.ndarray, private: mmap.mmap, address: int) -> np.ndarray:
+        """View values at the same offset in a copy-on-write mapping of their file, or copy them if they aren't in it."""
+        offset = values.__array_interface__["data"][0] - address
+        if values.flags.c_contiguous and 0 <= offset and offset + values.nbytes <= len(private):
+            return np.frombuffer(private, dtype=values.dtype, count=values.size, offset=offset).reshape(values.shape)
+        return values.copy()
+
+    def _acquire(self, key: str) -> None:
+        """Count one more frame of this process on a dataset, registering the attachment for the first."""
+        with self._lock:
+            if not self._attached.get(key):
+                self._conn.execute(
+                    "INSERT INTO attachments VALUES (?, ?, 1) ON CONFLICT (key, pid) DO UPDATE SET count = 1",
+                    (key, os.getpid())
+                )
+            self._attached[key] = self._attached.get(key, 0) + 1
+
+    def _track(self, df: pd.DataFrame, source: Tuple[str, Any, int]) -> None:
+        """Release a counted frame's attachment when the frame is garbage-collected."""
+        with self._lock:
+            self._frames[id(df)] = source
+        weakref.finalize(df, self._release, source[0], id(df))
+
+    def publish(self, key: str, df: pd.DataFrame) -> bool:
+        """Write a loaded dataset to shared memory, making room by evicting unattached ones.
+
+        Returns False when the dataset is already being published, cannot be
+        typed by Arrow, does not fit next to the datasets still attached or in
+        the directory's free space, or cannot be written; the caller then keeps
+        its private frame.
+        """
+        if not self.enabled:
+            return False
+
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowException, ValueError, TypeError):
+            return False
+
+        path = os.path.join(self.directory, f"{key}.arrow")
+        with self._lock:
+            try:
+                # Reserve the space in one transaction so concurrent publishers see it
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    if self._conn.execute("SELECT 1 FROM datasets WHERE key = ?", (key,)).fetchone():
+                        self._conn.execute("COMMIT")
+                        return False
+                    evicted = self._make_room(table.nbytes)
+                    if evicted is None:
+                        self._conn.execute("COMMIT")
+                        self.rejected += 1
+                        return False
+                    now = time.time()
+                    self._conn.execute(
+                        "INSERT INTO datasets VALUES (?, ?, ?, ?, ?)", (key, path, table.nbytes, now, now)
+                    )
+                    self._conn.execute("COMMIT")
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+            except sqlite3.Error as e:
+                logger.warning("Dataset %s kept private, the shared registry is unwritable: %s", key, e)
+                self.rejected += 1
+                return False
+
+        # Processes still mapping an evicted file keep their pages until they unmap them
+        for evicted_path in evicted:
+            self._remove(evicted_path)
+
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            if table.nbytes > self._free_bytes():
+                raise OSError(errno.ENOSPC, "Not enough free space", self.directory)
+            with pa.OSFile(temp_path, "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(temp_path, path)
+        except BaseException as e:
+            self._remove(temp_path)
+            with self._lock:
+                try:
+                    self._conn.execute("DELETE FROM datasets WHERE key = ?", (key,))
+                except sqlite3.Error:
+                    pass
+                if not isinstance(e, (OSError, pa.ArrowException)):
+                    raise
+                # A full or missing tmpfs: the publisher keeps its private frame
+                logger.warning("Dataset %s kept private, writing it to %s failed: %s", key, self.directory, e)
+                self.rejected += 1
+            return False
+
+        self.publishes += 1
+        return True
+
+    def _make_room(self, size: int) -> Optional[List[str]]:
+        """Within a write transaction, delete registry rows until size fits; return their paths.
+
+        Returns None, deleting nothing, if the datasets attached by live processes
+        leave too little room.
+        """
+        if size > self.max_bytes:
+            return None
+
+        # Processes that died without releasing hold nothing
+        for (pid,) in self._conn.execute("SELECT DISTINCT pid FROM attachments").fetchall():
+            if not self._is_alive(pid):
+                self._conn.execute("DELETE FROM attachments WHERE pid = ?", (pid,))
+
+        used = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM datasets").fetchone()[0]
+        candidates = self._conn.execute(
+            "SELECT key, path, size FROM datasets WHERE key NOT IN (SELECT key FROM attachments) "
+            "ORDER BY last_used"
+        ).fetchall()
+
+        evicted = []
+        for key, path, dataset_size in candidates:
+            if used + size <= self.max_bytes:
+                break
+            evicted.append((key, path))
+            used -= dataset_size
+        if used + size > self.max_bytes:
+            return None
+
+        for key, _ in evicted:
+            self._conn.execute("DELETE FROM datasets WHERE key = ?", (key,))
+        self.evictions += len(evicted)
+        return [path for _, path in evicted]
+
+    def _release(self, key: str, frame_id: Optional[int] = None) -> None:
+        """Drop one frame of this process on a dataset, unregistering the attachment with the last."""
+        with self._lock:
+            if frame_id is not None:
+                self._frames.pop(frame_id, None)
+            self._attached[key] -= 1
+            if self._attached[key]:
+                return
+            del self._attached[key]
+            try:
+                self._conn.execute("DELETE FROM attachments WHERE key = ? AND pid = ?", (key, os.getpid()))
+            except sqlite3.Error:
+                # Releasing at interpreter exit can race the connection closing; dead pids are purged anyway
+                pass
+
+    def _free_bytes(self) -> int:
+        """Space left on the filesystem holding the directory."""
+        stat = os.statvfs(self.directory)
+        return stat.f_bavail * stat.f_frsize
+
+    @staticmethod
+    def _is_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Return shared memory use across processes and this process's attach counters."""
+        datasets = shared_bytes = attached_processes = 0
+        if self.enabled:
+            with self._lock:
+                datasets, shared_bytes = self._conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM datasets"
+                ).fetchone()
+                attached_processes = self._conn.execute(
+                    "SELECT COUNT(DISTINCT pid) FROM attachments"
+                ).fetchone()[0]
+        return {
+            "enabled": self.enabled,
+            "datasets": datasets,
+            "shared_bytes": shared_bytes,
+            "max_bytes": self.max_bytes,
+            "attached_processes": attached_processes,
+            "attached_here": sum(self._attached.values()),
+            "attaches": self.attaches,
+            "publishes": self.publishes,
+            "evictions": self.evictions,
+            "rejected": self.rejected,
+        }
+
+
+shared_datasets = SharedDatasetStore(
+    settings.shared_datasets_dir,
+    settings.shared_datasets_max_bytes,
+    settings.shared_datasets_enabled
+)
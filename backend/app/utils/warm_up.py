@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Component states
+PENDING = "pending"
+RUNNING = "running"
+READY = "ready"
+FAILED = "failed"
+DEFERRED = "deferred"
+
+
+class WarmUp:
+    """Startup work that makes the first requests fast: importing and building heavy services.
+
+    Components run concurrently in threads, either before the server accepts
+    requests or in the background after it does. Until every component has
+    finished the service is alive but not warm; a component that fails leaves
+    it degraded, with that work redone on first use.
+    """
+
+    def __init__(self):
+        """Initialize with no components."""
+        self._components: List[Tuple[str, Callable[[], Any]]] = []
+        self._task: Optional[asyncio.Task] = None
+        self.status: Dict[str, str] = {}
+        self.seconds: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    def add(self, name: str, fn: Callable[[], Any]) -> None:
+        """Register a blocking function to run during warm-up."""
+        self._components.append((name, fn))
+        self.status[name] = PENDING
+
+    async def run(self) -> None:
+        """Run every component and wait for all of them."""
+        self.started = time.perf_counter()
+        await asyncio.gather(*(self._run_component(name, fn) for name, fn in self._components))
+        self.finished = time.perf_counter()
+        logger.info("Warm-up finished in %.2fs: %s", self.finished - self.started, self.status)
+
+    async def _run_component(self, name: str, fn: Callable[[], Any]) -> None:
+        self.status[name] = RUNNING
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(fn)
+            self.status[name] = READY
+        except Exception as e:
+            logger.warning("Warm-up of %s failed: %s", name, e)
+            self.status[name] = FAILED
+            self.errors[name] = getattr(e, "detail", None) or str(e)
+        self.seconds[name] = time.perf_counter() - started
+
+    def start(self) -> None:
+        """Run warm-up in the background."""
+        self._task = asyncio.create_task(self.run())
+
+    def defer(self) -> None:
+        """Skip warm-up; each component is built by the first request that needs it."""
+        for name in self.status:
+            self.status[name] = DEFERRED
+
+    async def stop(self) -> None:
+        """Cancel a background warm-up still in progress."""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    @property
+    def ready(self) -> bool:
+        """Whether every component has finished, successfully or not, or was deferred."""
+        return all(status in (READY, FAILED, DEFERRED) for status in self.status.values())
+
+    def stats(self) -> Dict[str, Any]:
+        """Return overall and per-component warm-up state and timings."""
+        if not self.ready:
+            status = "warming"
+        else:
+            status = "degraded" if self.errors else "ready"
+        return {
+            "status": status,
+            "ready": self.ready,
+            "warm_up_seconds": (
+                self.finished - self.started if self.finished is not None and self.started is not None else None
+            ),
+            "components": {
+                name: {
+                    "status": self.status[name],
+                    "seconds": self.seconds.get(name),
+                    "error": self.errors.get(name),
+                }
+                for name, _ in self._components
+            },
+        }
+
+
+warm_up = WarmUp()
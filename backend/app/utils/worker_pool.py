@@ -0,0 +1,88 @@
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+from fastapi import HTTPException
+from app.core.config import settings
+
+
+class WorkerPool:
+    """Bounded thread pool that keeps blocking pandas work off the event loop."""
+
+    def __init__(self, max_workers: int, max_queue: int):
+        """Initialize the pool with a fixed number of threads and queue slots."""
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="worker")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.rejected = 0
+        self._task_stats: Dict[str, Dict[str, float]] = {}
+
+    async def run(self, name: str, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+        """Run fn in the pool, rejecting with 429 when every slot is taken."""
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=429,
+                    detail="Server is busy, please retry shortly",
+                    headers={"Retry-After": "1"}
+                )
+            self._in_flight += 1
+
+        submitted = time.perf_counter()
+
+        def task() -> Any:
+            started = time.perf_counter()
+            failed = False
+            try:
+                return fn(*args, **kwargs)
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                self._record(name, started - submitted, time.perf_counter() - started, failed)
+
+        try:
+            loop = asyncio.get_running_loop()
+            # Run in a copy of the caller's context so stage timings and trace spans follow the task
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(self._executor, functools.partial(context.run, task))
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _record(self, name: str, wait_time: float, run_time: float, failed: bool) -> None:
+        """Accumulate per-task timing metrics."""
+        with self._lock:
+            stats = self._task_stats.setdefault(name, {
+                "count": 0,
+                "errors": 0,
+                "total_wait_seconds": 0.0,
+                "total_run_seconds": 0.0,
+                "max_run_seconds": 0.0,
+            })
+            stats["count"] += 1
+            stats["errors"] += int(failed)
+            stats["total_wait_seconds"] += wait_time
+            stats["total_run_seconds"] += run_time
+            stats["max_run_seconds"] = max(stats["max_run_seconds"], run_time)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth, rejections and per-task timings."""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "queued": max(self._in_flight - self.max_workers, 0),
+                "rejected": self.rejected,
+                "tasks": {name: dict(stats) for name, stats in self._task_stats.items()},
+            }
+
+
+worker_pool = WorkerPool(settings.worker_pool_max_workers, settings.worker_pool_max_queue)
@@ -0,0 +1,260 @@
+"""End-to-end benchmark for /csv/upload, /csv/analyze and /insights/generate.
+
+Runs the app in-process with the fake LLM provider, so it needs no API key or
+network and measures only server-side overhead. Run from the backend directory:
+
+    python -m benchmarks.bench_e2e
+    python -m benchmarks.bench_e2e --rows 1000 1000000 10000000 --requests 100 --concurrency 16
+    python -m benchmarks.bench_e2e --output baseline.json
+    python -m benchmarks.bench_e2e --baseline baseline.json --max-regression 0.2
+
+With --baseline the exit status is 1 when any endpoint's p99 latency grows, or
+its throughput drops, by more than --max-regression.
+"""
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+RECORDING_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings", "default.json")
+
+QUERIES = [
+    "What is the average salary by department?",
+    "How many people live in each city?",
+    "What's the correlation between age and salary?",
+    "How many rows are there?",
+]
+
+
+def configure_environment(workdir: str, latency: float) -> None:
+    """Point the app at the fake LLM and a scratch upload directory; must run before importing app."""
+    os.environ.update({
+        "LLM_PROVIDER": "fake",
+        "LLM_RECORDING_PATH": RECORDING_PATH,
+        "FAKE_LLM_LATENCY_SECONDS": str(latency),
+        "MAX_FILE_SIZE": str(64 * 1024 ** 3),
+        "ANSWER_CACHE_BACKEND": "memory",
+    })
+    os.chdir(workdir)
+
+
+def write_synthetic_csv(path: str, rows: int, chunk_rows: int = 1_000_000) -> None:
+    """Write an employee-style CSV with the given number of rows, chunk by chunk."""
+    rng = np.random.default_rng(42)
+    cities = np.array(["New York", "San Francisco", "Chicago", "Boston", "Austin", "Seattle"])
+    departments = np.array(["Engineering", "Marketing", "Design", "Sales", "Finance"])
+
+    for start in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - start)
+        chunk = pd.DataFrame({
+            "Name": [f"Person {i}" for i in range(start, start + n)],
+            "Age": rng.integers(21, 65, n),
+            "City": cities[rng.integers(0, len(cities), n)],
+            "Salary": rng.integers(40_000, 160_000, n),
+            "Department": departments[rng.integers(0, len(departments), n)],
+            "Experience": rng.integers(0, 40, n),
+        })
+        chunk.to_csv(path, mode="w" if start == 0 else "a", header=start == 0, index=False)
+
+
+def read_rss(pid: int) -> int:
+    """Resident set size of a process in bytes, 0 if it is gone."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class RSSSampler(threading.Thread):
+    """Samples the RSS of this process plus sandbox workers and keeps the peak."""
+
+    def __init__(self, interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = 0
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            pids = [os.getpid()] + [child.pid for child in multiprocessing.active_children()]
+            self.peak = max(self.peak, sum(read_rss(pid) for pid in pids))
+            time.sleep(self.interval)
+
+    def stop(self) -> int:
+        self._stop_event.set()
+        self.join()
+        return self.peak
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+async def run_load(
+    make_request: Callable[[int], Awaitable[Any]], requests: int, concurrency: int
+) -> Dict[str, float]:
+    """Issue requests with bounded concurrency and summarize latency, throughput and RSS."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await make_request(i)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+
+    sampler = RSSSampler()
+    sampler.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    wall = time.perf_counter() - started
+    peak_rss = sampler.stop()
+
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": requests / wall,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "peak_rss_mb": peak_rss / 1024 ** 2,
+    }
+
+
+async def bench_size(client, rows: int, args: argparse.Namespace, workdir: str) -> Dict[str, Dict[str, float]]:
+    """Benchmark all endpoints against one synthetic file size."""
+    source_path = os.path.join(workdir, f"source_{rows}.csv")
+    write_synthetic_csv(source_path, rows)
+    results = {}
+
+    async def upload(i: int):
+        with open(source_path, "rb") as f:
+            return await client.post(
+                "/api/v1/csv/upload",
+                files={"file": (f"bench_{rows}_{i}.csv", f, "text/csv")}
+            )
+
+    results["upload"] = await run_load(upload, args.upload_requests, 1)
+    filename = f"bench_{rows}_0.csv"
+
+    async def analyze(i: int):
+        # A unique suffix keeps the answer cache from serving repeats
+        query = f"{QUERIES[i % len(QUERIES)]} (run {i})"
+        return await client.post("/api/v1/csv/analyze", json={"query": query, "filename": filename})
+
+    results["analyze"] = await run_load(analyze, args.requests, args.concurrency)
+
+    async def insights(i: int):
+        return await client.post("/api/v1/insights/generate", json={"filename": filename})
+
+    results["insights"] = await run_load(insights, args.requests, args.concurrency)
+
+    os.remove(source_path)
+    return results
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """List endpoints whose p99 latency or throughput regressed beyond the threshold."""
+    regressions = []
+    for rows, endpoints in results.items():
+        for endpoint, current in endpoints.items():
+            previous = baseline.get(rows, {}).get(endpoint)
+            if not previous:
+                continue
+            if current["p99_ms"] > previous["p99_ms"] * (1 + max_regression):
+                regressions.append(
+                    f"{rows} rows {endpoint}: p99 {previous['p99_ms']:.1f}ms -> {current['p99_ms']:.1f}ms"
+                )
+            if current["throughput_rps"] < previous["throughput_rps"] * (1 - max_regression):
+                regressions.append(
+                    f"{rows} rows {endpoint}: throughput {previous['throughput_rps']:.1f} -> "
+                    f"{current['throughput_rps']:.1f} req/s"
+                )
+    return regressions
+
+
+def print_table(results: Dict[str, Any]) -> None:
+    """Print results as an aligned table."""
+    print(f"{'rows':>10} {'endpoint':<10} {'req':>5} {'err':>4} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'peak RSS MB':>12}")
+    for rows, endpoints in results.items():
+        for endpoint, r in endpoints.items():
+            print(
+                f"{rows:>10} {endpoint:<10} {r['requests']:>5} {r['errors']:>4} {r['throughput_rps']:>9.1f} "
+                f"{r['p50_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['peak_rss_mb']:>12.1f}"
+            )
+
+
+async def main(args: argparse.Namespace) -> int:
+    workdir = tempfile.mkdtemp(prefix="csv-bench-")
+    configure_environment(workdir, args.latency)
+
+    # Imported after the environment is configured so settings pick it up
+    import httpx
+    from app.main import app
+    from app.utils.code_sandbox import code_sandbox
+
+    code_sandbox.warm_up()
+    transport = httpx.ASGITransport(app=app)
+    results: Dict[str, Any] = {}
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for rows in args.rows:
+                results[str(rows)] = await bench_size(client, rows, args, workdir)
+    finally:
+        code_sandbox.shutdown()
+
+    print_table(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+
+    return 0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 100_000, 1_000_000],
+                        help="synthetic file sizes in rows (up to 10000000)")
+    parser.add_argument("--requests", type=int, default=50, help="requests per analyze/insights run")
+    parser.add_argument("--upload-requests", type=int, default=3, help="uploads per file size")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight at once")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated LLM latency in seconds")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--baseline", help="compare against a previous --output file")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="allowed relative p99/throughput regression against the baseline")
+    # Paths on the command line are relative to where the benchmark was started
+    args = parser.parse_args()
+    for attr in ("output", "baseline"):
+        if getattr(args, attr):
+            setattr(args, attr, os.path.abspath(getattr(args, attr)))
+    return args
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    sys.exit(asyncio.run(main(parse_args())))
@@ -0,0 +1,206 @@
+"""Cold-start benchmark: import time and memory of app.main, and time until a server is alive and warm.
+
+Each measurement runs in a fresh interpreter, with the fake LLM provider and a
+scratch working directory. Run from the backend directory:
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 10 --modes background eager lazy
+    python -m benchmarks.bench_startup --output startup.json
+    python -m benchmarks.bench_startup --baseline startup.json --max-regression 0.2
+
+"alive" is the first 200 from /api/v1/health and "ready" the first 200 from
+/api/v1/health/ready. With --baseline the exit status is 1 when any median
+time or RSS grows by more than --max-regression.
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from benchmarks.bench_e2e import RECORDING_PATH, read_rss
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in a fresh interpreter: time `import app.main` and report what it loaded
+IMPORT_PROBE = """
+import json, os, sys, time
+started = time.perf_counter()
+import app.main
+seconds = time.perf_counter() - started
+with open("/proc/self/statm") as f:
+    rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+print(json.dumps({
+    "import_seconds": seconds,
+    "rss_mb": rss / 1024 ** 2,
+    "modules": len(sys.modules),
+    "langchain_loaded": any(name.startswith("langchain") for name in sys.modules),
+}))
+"""
+
+
+def environment(workdir: str, mode: str) -> Dict[str, str]:
+    """Environment for a measured process: fake LLM, scratch shared memory, the given startup mode."""
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": BACKEND_DIR,
+        "LLM_PROVIDER": "fake",
+        "LLM_RECORDING_PATH": RECORDING_PATH,
+        "STARTUP_MODE": mode,
+        "INSIGHTS_PRECOMPUTE_ON_UPLOAD": "false",
+        "SHARED_DATASETS_DIR": os.path.join(workdir, "shared"),
+    })
+    return env
+
+
+def measure_import(workdir: str) -> Dict[str, Any]:
+    """Time `import app.main` in a fresh interpreter."""
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE], cwd=workdir, env=environment(workdir, "lazy"),
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def process_tree_rss(pid: int) -> int:
+    """RSS of a process plus its children (the sandbox workers), in bytes."""
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            pids += [int(child) for child in f.read().split()]
+    except OSError:
+        pass
+    return sum(read_rss(p) for p in pids)
+
+
+def wait_for(client: httpx.Client, url: str, started: float, timeout: float) -> float:
+    """Poll url until it returns 200; return seconds since started."""
+    while time.perf_counter() - started < timeout:
+        try:
+            if client.get(url).status_code == 200:
+                return time.perf_counter() - started
+        except httpx.TransportError:
+            pass
+        time.sleep(0.01)
+    raise TimeoutError(f"{url} not ready after {timeout}s")
+
+
+def measure_server(workdir: str, mode: str, timeout: float) -> Dict[str, float]:
+    """Start uvicorn and time how long it takes to answer /health and then /health/ready."""
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}/api/v1"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=environment(workdir, mode)
+    )
+    try:
+        with httpx.Client(timeout=1.0) as client:
+            alive = wait_for(client, f"{base_url}/health", started, timeout)
+            ready = wait_for(client, f"{base_url}/health/ready", started, timeout)
+        return {
+            "alive_seconds": alive,
+            "ready_seconds": ready,
+            "rss_mb_at_ready": process_tree_rss(server.pid) / 1024 ** 2,
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def median_of(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Median of each numeric field across runs; other fields from the first run."""
+    summary = dict(runs[0])
+    for key, value in runs[0].items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            summary[key] = statistics.median(run[key] for run in runs)
+    return summary
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """List measurements whose median time or memory regressed beyond the threshold."""
+    regressions = []
+    for name, current in results.items():
+        for key, value in current.items():
+            previous = baseline.get(name, {}).get(key)
+            if not key.endswith(("_seconds", "_mb")) or not previous:
+                continue
+            if value > previous * (1 + max_regression):
+                regressions.append(f"{name} {key}: {previous:.3f} -> {value:.3f}")
+    return regressions
+
+
+def print_table(results: Dict[str, Any]) -> None:
+    """Print results as an aligned table."""
+    imported = results["import"]
+    print(
+        f"import app.main: {imported['import_seconds']:.3f}s, {imported['rss_mb']:.1f} MB RSS, "
+        f"{imported['modules']} modules, LangChain loaded: {imported['langchain_loaded']}"
+    )
+    print(f"{'mode':<12} {'alive s':>9} {'ready s':>9} {'RSS MB at ready':>16}")
+    for mode, r in results.items():
+        if mode != "import":
+            print(f"{mode:<12} {r['alive_seconds']:>9.3f} {r['ready_seconds']:>9.3f} {r['rss_mb_at_ready']:>16.1f}")
+
+
+def main(args: argparse.Namespace) -> int:
+    workdir = tempfile.mkdtemp(prefix="csv-bench-startup-")
+    results: Dict[str, Any] = {}
+    try:
+        results["import"] = median_of([measure_import(workdir) for _ in range(args.runs)])
+        for mode in args.modes:
+            results[mode] = median_of([measure_server(workdir, mode, args.timeout) for _ in range(args.runs)])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_table(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+
+    return 0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="cold starts per measurement; medians are reported")
+    parser.add_argument("--modes", nargs="+", default=["background", "eager", "lazy"],
+                        choices=["background", "eager", "lazy"], help="STARTUP_MODE values to start the server with")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds to wait for a server to be ready")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--baseline", help="compare against a previous --output file")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="allowed relative regression of any median against the baseline")
+    # Paths on the command line are relative to where the benchmark was started
+    args = parser.parse_args()
+    for attr in ("output", "baseline"):
+        if getattr(args, attr):
+            setattr(args, attr, os.path.abspath(getattr(args, attr)))
+    return args
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, BACKEND_DIR)
+    sys.exit(main(parse_args()))
@@ -0,0 +1,36 @@
+import os
+import tempfile
+
+# Stores the app opens at import time go to a scratch directory, not the working tree
+SCRATCH_DIR = tempfile.mkdtemp(prefix="csv-analysis-tests-")
+for name in ("CATALOG_PATH", "CODE_STORE_PATH", "INSIGHT_JOBS_PATH", "ANSWER_CACHE_PATH"):
+    os.environ.setdefault(name, os.path.join(SCRATCH_DIR, f"{name.lower()}.sqlite3"))
+os.environ.setdefault("RESULT_STORE_DIR", os.path.join(SCRATCH_DIR, "results"))
+os.environ.setdefault("UPLOAD_DIR", os.path.join(SCRATCH_DIR, "uploads"))
+os.environ.setdefault("SHARED_DATASETS_DIR", os.path.join(SCRATCH_DIR, "shared"))
+
+import pytest
+from fastapi.testclient import TestClient
+from app.api.v1.endpoints import csv as csv_endpoints
+from app.main import app
+from app.utils.catalog import DatasetCatalog
+from app.utils.dataframe_cache import dataframe_cache
+from app.utils.shared_datasets import shared_datasets
+
+
+@pytest.fixture(autouse=True)
+def private_frames(monkeypatch):
+    """Keep loaded frames in this process rather than the host's shared memory."""
+    monkeypatch.setattr(shared_datasets, "enabled", False)
+    dataframe_cache.clear()
+    yield
+    dataframe_cache.clear()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """The API, without its startup work, over a catalog and uploads of its own."""
+    monkeypatch.setattr(
+        csv_endpoints, "catalog", DatasetCatalog(str(tmp_path / "catalog.sqlite3"), str(tmp_path / "uploads"))
+    )
+    return TestClient(app)
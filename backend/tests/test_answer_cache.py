@@ -0,0 +1,56 @@
+import time
+import pytest
+from app.utils.answer_cache import (
+    AnswerCache, AnswerCacheBackend, MemoryAnswerCache, SQLiteAnswerCache, normalize_query
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteAnswerCache(str(tmp_path / "answers.sqlite3"), ttl_seconds=60, max_entries=2)
+    return MemoryAnswerCache(ttl_seconds=60, max_entries=2)
+
+
+def test_backend_is_an_abstract_interface():
+    with pytest.raises(TypeError):
+        AnswerCacheBackend(60, 2)
+
+
+def test_backends_evict_the_least_recently_used_over_capacity(backend):
+    backend.set("a", {"analysis": "1"})
+    backend.set("b", {"analysis": "2"})
+    assert backend.get("a") == {"analysis": "1"}
+
+    backend.set("c", {"analysis": "3"})
+
+    assert backend.get("b") is None
+    assert backend.get("a") == {"analysis": "1"}
+    assert len(backend) == 2
+
+
+def test_backends_expire_entries_after_the_ttl(backend):
+    backend.ttl_seconds = 0.01
+    backend.set("a", {"analysis": "1"})
+    time.sleep(0.02)
+
+    assert backend.get("a") is None
+    assert len(backend) == 0
+
+
+def test_answers_are_keyed_by_dataset_and_normalized_query(backend):
+    cache = AnswerCache(backend)
+    cache.put("hash-1", "What is the  average Age?", "42", "df['Age'].mean()", result_id="r1")
+
+    assert cache.get_answer("hash-1", "what is the average age") == {
+        "analysis": "42", "code": "df['Age'].mean()", "result_id": "r1"
+    }
+    assert cache.get_answer("hash-2", "What is the average age?") is None
+    assert cache.stats()["answer_hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_normalize_query_ignores_case_punctuation_and_spacing():
+    assert normalize_query("  How MANY rows?? ") == normalize_query("how many rows") == "how many rows"
+    assert normalize_query("mean of 3.5") == "mean of 3.5"
@@ -0,0 +1,77 @@
+import hashlib
+import os
+from app.api.v1.endpoints import csv as csv_endpoints
+
+STORED = b"Name,Age,City\nAda,36,London\nBob,41,Paris\n"
+ROWS = b"Name,Age,City\nCy,29,Rome\nDee,52,Oslo\n"
+
+
+def upload(client, filename: str, content: bytes = STORED) -> dict:
+    response = client.post("/api/v1/csv/upload", files={"file": (filename, content, "text/csv")})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def append(client, filename: str, content: bytes = ROWS):
+    return client.post(f"/api/v1/csv/{filename}/append", files={"file": ("rows.csv", content, "text/csv")})
+
+
+def read(filename: str):
+    return csv_endpoints.csv_handler.read_csv(csv_endpoints.catalog.get_path(filename))
+
+
+def test_appended_rows_are_stored_as_the_next_version(client):
+    upload(client, "people.csv")
+
+    response = append(client, "people.csv")
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert (body["appended_rows"], body["rows"], body["version"]) == (2, 4, 2)
+    assert body["columns"] == ["Name", "Age", "City"]
+    assert body["size"] == len(STORED) + len(ROWS) - len(b"Name,Age,City\n")
+    assert read("people.csv")["Name"].tolist() == ["Ada", "Bob", "Cy", "Dee"]
+    assert client.get("/api/v1/csv/files/people.csv").json()["rows"] == 4
+
+
+def test_appended_content_hash_chains_the_previous_one(client):
+    upload(client, "people.csv")
+    previous = csv_endpoints.catalog.get("people.csv").blob.sha256
+
+    append(client, "people.csv")
+
+    delta = hashlib.sha256(ROWS).hexdigest()
+    expected = hashlib.sha256(f"{previous}:{delta}".encode()).hexdigest()
+    assert csv_endpoints.catalog.get("people.csv").blob.sha256 == expected
+    assert csv_endpoints.catalog.get_blob(previous) is None
+
+
+def test_appending_to_shared_content_copies_it_first(client):
+    upload(client, "people.csv")
+    upload(client, "copy.csv")
+    shared_path = csv_endpoints.catalog.get_path("copy.csv")
+
+    assert append(client, "people.csv").status_code == 200
+
+    assert csv_endpoints.catalog.get_path("people.csv") != shared_path
+    assert len(read("copy.csv")) == 2
+    assert len(read("people.csv")) == 4
+    assert client.get("/api/v1/csv/files/copy.csv").json()["version"] == 1
+
+
+def test_rows_that_do_not_match_the_stored_file_are_rejected(client):
+    upload(client, "people.csv")
+    path = csv_endpoints.catalog.get_path("people.csv")
+
+    assert append(client, "people.csv", b"Name,City,Age\nCy,Rome,29\n").status_code == 400
+    assert append(client, "people.csv", b"Name,Age,City\n").status_code == 400
+    assert append(client, "people.csv", b"Name,Age,City\nCy,29.5,Rome\n").status_code == 400
+
+    with open(path, "rb") as f:
+        assert f.read() == STORED
+    assert not os.path.exists(f"{path}.append.part")
+    assert client.get("/api/v1/csv/files/people.csv").json()["version"] == 1
+
+
+def test_appending_to_an_unknown_file_is_not_found(client):
+    assert append(client, "missing.csv").status_code == 404
@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import os
+from app.api.v1.endpoints import csv as csv_endpoints
+from app.utils.catalog import Blob, DatasetCatalog
+
+CONTENT = b'Name,Note\nAda,"line one\nline two"\nBob,plain\n'
+
+
+def make_catalog(tmp_path) -> DatasetCatalog:
+    return DatasetCatalog(str(tmp_path / "catalog.sqlite3"), str(tmp_path / "uploads"))
+
+
+def store(catalog: DatasetCatalog, content: bytes = CONTENT) -> Blob:
+    file_path = catalog.new_object_path()
+    with open(file_path, "wb") as f:
+        f.write(content)
+    return catalog.add_blob(Blob(
+        sha256=hashlib.sha256(content).hexdigest(), file_path=file_path, size=len(content), rows=2,
+        columns=["Name", "Note"]
+    ))
+
+
+def test_adopted_uploads_count_rows_without_quoted_newlines(tmp_path):
+    catalog = make_catalog(tmp_path)
+    (tmp_path / "uploads").mkdir()
+    (tmp_path / "uploads" / "notes.csv").write_bytes(CONTENT)
+
+    assert catalog.adopt_uploads() == 1
+    assert catalog.get("notes.csv").blob.rows == 2
+
+
+def test_locks_are_dropped_once_nobody_holds_or_waits_for_them(tmp_path):
+    catalog = make_catalog(tmp_path)
+    order = []
+
+    async def work(name: str):
+        async with catalog.lock("file:a.csv"):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(work("first"), work("second"))
+        return dict(catalog._locks)
+
+    assert asyncio.run(run()) == {}
+    assert order == ["first", "second"]
+
+
+def test_collect_waits_for_an_upload_assigning_the_content(tmp_path):
+    catalog = make_catalog(tmp_path)
+    blob = store(catalog)
+    catalog.assign("a.csv", blob.sha256)
+    sha256 = catalog.remove("a.csv")
+
+    async def upload_same_bytes(started: asyncio.Event):
+        async with catalog.lock(blob.sha256):
+            started.set()
+            found = catalog.get_blob(blob.sha256)
+            await asyncio.sleep(0.01)
+            catalog.assign("b.csv", found.sha256)
+
+    async def run():
+        started = asyncio.Event()
+        upload = asyncio.create_task(upload_same_bytes(started))
+        await started.wait()
+        await catalog.collect(sha256)
+        await upload
+
+    asyncio.run(run())
+
+    assert catalog.get_path("b.csv") == blob.file_path
+
+
+def test_collect_deletes_content_nothing_points_at(tmp_path):
+    catalog = make_catalog(tmp_path)
+    blob = store(catalog)
+    catalog.assign("a.csv", blob.sha256)
+    catalog.assign("b.csv", blob.sha256)
+
+    asyncio.run(catalog.collect(catalog.remove("a.csv")))
+    assert catalog.get_blob(blob.sha256) is not None
+
+    asyncio.run(catalog.collect(catalog.remove("b.csv")))
+    assert catalog.get_blob(blob.sha256) is None
+    assert catalog.stats()["blobs"] == 0
+
+
+def upload(client, filename: str, content: bytes) -> dict:
+    response = client.post("/api/v1/csv/upload", files={"file": (filename, content, "text/csv")})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_identical_uploads_share_one_stored_content(client):
+    first = upload(client, "a.csv", CONTENT)
+    second = upload(client, "b.csv", CONTENT)
+    catalog = csv_endpoints.catalog
+
+    assert (first["deduplicated"], second["deduplicated"]) == (False, True)
+    assert second["rows"] == first["rows"] == 2
+    assert catalog.get_path("a.csv") == catalog.get_path("b.csv")
+    assert catalog.stats() == {"files": 2, "blobs": 1, "stored_bytes": len(CONTENT), "deduplicated_uploads": 1}
+
+
+def test_versions_count_content_changes(client):
+    assert upload(client, "a.csv", CONTENT)["version"] == 1
+    assert upload(client, "a.csv", CONTENT)["version"] == 1
+
+    replaced = upload(client, "a.csv", b"Name,Note\nCy,new\n")
+    info = client.get("/api/v1/csv/files/a.csv").json()
+
+    assert (replaced["version"], replaced["rows"]) == (2, 1)
+    assert info["version"] == 2
+
+
+def test_replaced_content_is_deleted_unless_another_file_shares_it(client):
+    catalog = csv_endpoints.catalog
+    upload(client, "a.csv", CONTENT)
+    upload(client, "b.csv", CONTENT)
+    shared_path = catalog.get_path("a.csv")
+
+    upload(client, "a.csv", b"Name,Note\nCy,new\n")
+    assert os.path.exists(shared_path)
+
+    upload(client, "b.csv", b"Name,Note\nDee,other\n")
+    assert not os.path.exists(shared_path)
+    assert catalog.stats()["blobs"] == 2
+
+
+def test_deleting_a_file_keeps_content_other_files_share(client):
+    catalog = csv_endpoints.catalog
+    upload(client, "a.csv", CONTENT)
+    upload(client, "b.csv", CONTENT)
+    path = catalog.get_path("a.csv")
+
+    assert client.delete("/api/v1/csv/files/a.csv").status_code == 200
+    assert os.path.exists(path)
+    assert client.get("/api/v1/csv/files/a.csv").status_code == 404
+
+    assert client.delete("/api/v1/csv/files/b.csv").status_code == 200
+    assert not os.path.exists(path)
+    assert client.delete("/api/v1/csv/files/b.csv").status_code == 404
+
+
+def test_files_are_listed_from_the_catalog_a_page_at_a_time(client):
+    for name in ("c.csv", "a.csv", "b.csv"):
+        upload(client, name, CONTENT)
+
+    page = client.get("/api/v1/csv/files", params={"limit": 2, "offset": 1}).json()
+
+    assert [info["filename"] for info in page["files"]] == ["b.csv", "c.csv"]
+    assert page["total"] == 3
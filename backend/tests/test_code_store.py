@@ -0,0 +1,86 @@
+import importlib.util
+import marshal
+import pandas as pd
+import pytest
+from app.utils.code_sandbox import run_compiled
+from app.utils.code_store import CodeStore, schema_fingerprint, validate_code
+
+CODE = "df['amount'].sum()"
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CodeStore(str(tmp_path / "code.sqlite3"), max_entries=2)
+
+
+def test_fingerprint_depends_on_column_names_dtypes_and_order():
+    df = pd.DataFrame({"name": ["a"], "amount": [1]})
+
+    assert schema_fingerprint(df) == schema_fingerprint(pd.DataFrame({"name": ["b", "c"], "amount": [2, 3]}))
+    assert schema_fingerprint(df) != schema_fingerprint(df[["amount", "name"]])
+    assert schema_fingerprint(df) != schema_fingerprint(df.astype({"amount": float}))
+
+
+@pytest.mark.parametrize("code", [
+    "import os",
+    "from os import path",
+    "x = df.__class__",
+    "open('/etc/passwd')",
+    "eval('1')",
+    "",
+    "result = (",
+])
+def test_validate_code_rejects_non_analysis_code(code):
+    assert not validate_code(code)
+
+
+def test_validate_code_accepts_analysis_code():
+    assert validate_code(CODE)
+
+
+def test_stored_code_is_found_for_the_same_schema_and_normalized_question(store):
+    assert store.put("schema", "What is the total amount?", CODE)
+
+    stored = store.get("schema", "  what is the TOTAL amount ")
+    assert stored.code == CODE
+    assert run_compiled(marshal.loads(stored.compiled), {"df": pd.DataFrame({"amount": [1, 2]})}) == 3
+
+    assert store.get("other schema", "What is the total amount?") is None
+    assert store.stats()["hits"] == 1
+    assert store.stats()["misses"] == 1
+
+
+def test_invalid_code_is_not_stored(store):
+    assert not store.put("schema", "question", "import os")
+
+    assert store.get("schema", "question") is None
+    assert store.stats()["rejected"] == 1
+
+
+def test_least_recently_used_code_is_evicted_over_capacity(store):
+    store.put("schema", "first", CODE)
+    store.put("schema", "second", CODE)
+    store.get("schema", "first")
+    store.put("schema", "third", CODE)
+
+    assert store.get("schema", "second") is None
+    assert store.get("schema", "first") is not None
+    assert store.stats()["entries"] == 2
+
+
+def test_invalidated_code_is_forgotten(store):
+    store.put("schema", "question", CODE)
+    store.invalidate("schema", "question")
+
+    assert store.get("schema", "question") is None
+    assert store.stats()["invalidations"] == 1
+
+
+def test_bytecode_from_another_python_version_is_recompiled(store):
+    store.put("schema", "question", CODE)
+    store._conn.execute("UPDATE code SET bytecode = ?, magic = ?", (b"stale", b"\x00\x00\r\n"))
+
+    stored = store.get("schema", "question")
+
+    assert run_compiled(marshal.loads(stored.compiled), {"df": pd.DataFrame({"amount": [4]})}) == 4
+    assert store._conn.execute("SELECT magic FROM code").fetchone()[0] == importlib.util.MAGIC_NUMBER
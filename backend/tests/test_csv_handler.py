@@ -0,0 +1,69 @@
+import asyncio
+import hashlib
+import io
+import pandas as pd
+from fastapi import UploadFile
+from app.core.config import settings
+from app.utils.csv_handler import CSVHandler, SavedUpload
+from app.utils.dtype_optimizer import apply_schema
+
+
+def write_delta(tmp_path, content: bytes) -> SavedUpload:
+    delta_path = tmp_path / "data.csv.append.part"
+    delta_path.write_bytes(content)
+    return SavedUpload(
+        file_path=str(delta_path),
+        size=len(content),
+        sha256=hashlib.sha256(content).hexdigest(),
+        rows=content.count(b"\n") - 1,
+        columns=["a", "b"]
+    )
+
+
+def test_append_after_trailing_newline_adds_no_blank_line(tmp_path):
+    file_path = tmp_path / "data.csv"
+    file_path.write_bytes(b"a,b\n1,2\n3,4\n")
+
+    appended = CSVHandler.append_file(str(file_path), write_delta(tmp_path, b"a,b\n5,6\n"))
+
+    assert file_path.read_bytes() == b"a,b\n1,2\n3,4\n5,6\n"
+    assert appended.appended_rows == 1
+    assert appended.rows == 3
+
+
+def test_append_without_trailing_newline_ends_the_last_row(tmp_path):
+    file_path = tmp_path / "data.csv"
+    file_path.write_bytes(b"a,b\n1,2\n3,4")
+
+    CSVHandler.append_file(str(file_path), write_delta(tmp_path, b"a,b\n5,6\n"))
+
+    assert file_path.read_bytes() == b"a,b\n1,2\n3,4\n5,6\n"
+
+
+def test_append_that_widens_a_dtype_keeps_the_columnar_sidecar(tmp_path):
+    file_path = tmp_path / "data.csv"
+    file_path.write_bytes(b"a,b\n1,x\n2,y\n")
+    schema = {"a": "int8", "b": "category"}
+    CSVHandler.write_schema(str(file_path), schema)
+    CSVHandler.write_columnar(str(file_path), apply_schema(pd.read_csv(file_path), schema))
+
+    CSVHandler.append_file(str(file_path), write_delta(tmp_path, b"a,b\n300,z\n"))
+
+    columnar_paths = CSVHandler.get_columnar_paths(str(file_path))
+    assert len(columnar_paths) == 2
+    df = CSVHandler.read_columnar(columnar_paths)
+    assert str(df["a"].dtype) == "int16"
+    assert df["a"].tolist() == [1, 2, 300]
+    assert df["b"].astype(str).tolist() == ["x", "y", "z"]
+
+
+def test_upload_row_count_skips_newlines_in_quoted_fields(tmp_path, monkeypatch):
+    content = b'Name,Note\nAda,"line one\nline two"\nBob,"said ""hi""\nthen left"\nCy,plain'
+    # Small chunks, so quoted fields span chunk boundaries
+    monkeypatch.setattr(settings, "upload_chunk_size", 4)
+    upload = UploadFile(io.BytesIO(content), filename="notes.csv")
+
+    saved = asyncio.run(CSVHandler._receive(upload, str(tmp_path / "notes.csv"), len(content)))
+
+    assert saved.rows == 3
+    assert saved.columns == ["Name", "Note"]
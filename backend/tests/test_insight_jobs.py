@@ -0,0 +1,94 @@
+import asyncio
+import pytest
+from app.utils.insight_jobs import COMPLETED, QUEUED, RUNNING, InsightJobQueue
+
+
+@pytest.fixture
+def file_path(tmp_path):
+    path = tmp_path / "people.csv"
+    path.write_text("Name,Age\nAda,36\nBob,41\n")
+    return str(path)
+
+
+def make_queue(tmp_path, lease_seconds: float = 30.0) -> InsightJobQueue:
+    """A queue on the shared test database whose jobs finish when released."""
+    queue = InsightJobQueue(str(tmp_path / "jobs.sqlite3"), workers=1, max_stored=10, lease_seconds=lease_seconds)
+    queue.release = asyncio.Event()
+    queue.ran = []
+
+    async def run(job):
+        job.status = RUNNING
+        queue._save(job)
+        queue.ran.append(job.job_id)
+        await queue.release.wait()
+        job.result = {"insights": []}
+        queue._finish(job, COMPLETED)
+
+    queue._run = run
+    return queue
+
+
+def test_a_starting_process_leaves_jobs_another_live_process_runs(tmp_path, file_path):
+    first, second = make_queue(tmp_path), make_queue(tmp_path)
+
+    async def run():
+        job = await first.submit("people.csv", file_path)
+        await asyncio.sleep(0.01)
+        second.start()
+        taken_over = dict(second._jobs)
+        first.release.set()
+        await first.wait(job.job_id)
+        await first.stop()
+        await second.stop()
+        return job, taken_over
+
+    job, taken_over = asyncio.run(run())
+
+    assert taken_over == {}
+    assert first.ran == [job.job_id] and second.ran == []
+    assert second.get(job.job_id).status == COMPLETED
+
+
+def test_jobs_of_a_process_that_is_gone_are_taken_over_once_its_lease_expires(tmp_path, file_path):
+    crashed, survivor = make_queue(tmp_path, lease_seconds=0.05), make_queue(tmp_path, lease_seconds=0.05)
+
+    async def run():
+        job = await crashed.submit("people.csv", file_path)
+        await asyncio.sleep(0.01)
+        # The owner stops renewing without releasing its lease, as when its process dies
+        crashed._lease_task.cancel()
+        for task in crashed._workers + list(crashed._running.values()):
+            task.cancel()
+
+        survivor.start()
+        survivor.release.set()
+        await asyncio.sleep(0.2)
+        await survivor.stop()
+        return job
+
+    job = asyncio.run(run())
+
+    assert survivor.ran == [job.job_id]
+    assert survivor.get(job.job_id).status == COMPLETED
+
+
+def test_stopping_frees_unfinished_jobs_for_the_next_start(tmp_path, file_path):
+    first = make_queue(tmp_path)
+
+    async def submit_and_stop():
+        job = await first.submit("people.csv", file_path)
+        await first.stop()
+        return job
+
+    job = asyncio.run(submit_and_stop())
+    assert first.get(job.job_id).status == QUEUED
+
+    restarted = make_queue(tmp_path)
+
+    async def restart():
+        restarted.start()
+        restarted.release.set()
+        return await restarted.wait(job.job_id)
+
+    assert asyncio.run(restart()).status == COMPLETED
+    assert restarted.ran == [job.job_id]
@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from app.utils import large_files as large_files_module
+from app.utils.large_files import large_files
+from app.utils.llm_gateway import llm_gateway
+from app.utils.llm_provider import FakeChatModel
+from app.utils.result_store import result_store
+
+TOTAL_SALARY_SQL = 'SELECT SUM("Salary") AS total FROM data'
+CTE_NAMED_AFTER_FILE_SQL = 'WITH "{path}" AS (SELECT * FROM "{path}") SELECT * FROM "{path}"'
+
+
+@pytest.fixture
+def secret_path(tmp_path):
+    path = tmp_path / "secret.csv"
+    path.write_text("password\nhunter2\n")
+    return str(path)
+
+
+@pytest.fixture
+def service(tmp_path, secret_path, monkeypatch):
+    """An analysis service whose LLM replays SQL for the questions asked."""
+    monkeypatch.setattr(result_store, "directory", str(tmp_path / "results"))
+    llm = FakeChatModel(responses=[
+        {"tool": "SQLQuery", "match": "total salary", "args": {"query": TOTAL_SALARY_SQL}},
+        {"tool": "SQLQuery", "match": "other file", "args": {"query": "SELECT * FROM read_csv_auto('/etc/passwd')"}},
+        {"tool": "SQLQuery", "match": "secret", "args": {"query": CTE_NAMED_AFTER_FILE_SQL.format(path=secret_path)}},
+        {"tool": "SQLQuery", "args": {"query": 'SELECT "City", COUNT(*) AS people FROM data GROUP BY 1 ORDER BY 1'}},
+    ])
+    monkeypatch.setattr(llm_gateway, "get_llm", lambda: llm)
+    from app.utils.langchain_service import LangChainService
+    return LangChainService()
+
+
+@pytest.fixture
+def file_path(tmp_path):
+    path = tmp_path / "people.csv"
+    rows = [f"Person {i},{['Oslo', 'Lima', 'Pune'][i % 3]},{1000 + i}" for i in range(3000)]
+    path.write_text("Name,City,Salary\n" + "\n".join(rows) + "\n")
+    return str(path)
+
+
+@pytest.mark.skipif(not large_files.exact_available, reason="duckdb is not installed")
+def test_exact_answer_runs_generated_sql_out_of_core(service, file_path):
+    result = asyncio.run(service.analyze_large_file(file_path, "What is the total salary?"))
+
+    assert result["approximate"] is False
+    assert result["approximate_reason"] is None
+    assert result["code"] == TOTAL_SALARY_SQL
+    assert str(sum(1000 + i for i in range(3000))) in result["analysis"]
+
+    grouped = asyncio.run(service.analyze_large_file(file_path, "How many people live in each city?"))
+    assert grouped["result_rows"] == 3
+    assert "Oslo" in grouped["analysis"] and "1000" in grouped["analysis"]
+
+
+@pytest.mark.skipif(not large_files.exact_available, reason="duckdb is not installed")
+def test_exact_answer_rejects_sql_reading_other_files(service, file_path):
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(service.analyze_large_file(file_path, "Read the other file"))
+    assert excinfo.value.status_code == 400
+
+
+@pytest.mark.skipif(not large_files.exact_available, reason="duckdb is not installed")
+def test_exact_answer_rejects_a_cte_named_after_another_file(service, file_path):
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(service.analyze_large_file(file_path, "Show me the secret"))
+    assert excinfo.value.status_code == 400
+
+
+@pytest.mark.skipif(not large_files.exact_available, reason="duckdb is not installed")
+def test_ctes_over_the_table_are_allowed(file_path):
+    sql = 'WITH cities AS (SELECT DISTINCT "City" FROM data), n AS (SELECT COUNT(*) AS n FROM cities) SELECT n FROM n'
+
+    result, _ = large_files.query(file_path, sql)
+
+    assert result.iat[0, 0] == 3
+
+
+@pytest.mark.skipif(not large_files.exact_available, reason="duckdb is not installed")
+def test_duckdb_refuses_other_files_even_if_the_check_passes(file_path, secret_path, monkeypatch):
+    monkeypatch.setattr(large_files, "_reads_only_table", lambda conn, sql: True)
+
+    with pytest.raises(large_files_module.duckdb.PermissionException):
+        large_files.query(file_path, f"SELECT * FROM read_csv_auto('{secret_path}')")
+
+
+def test_answer_without_duckdb_says_it_is_approximate(service, file_path, monkeypatch):
+    monkeypatch.setattr(large_files_module, "duckdb", None)
+
+    result = asyncio.run(service.analyze_large_file(file_path, "How many rows are there?"))
+
+    assert result["approximate"] is True
+    assert result["approximate_reason"] == "exact_unavailable"
+    assert "not installed" in result["analysis"]
@@ -0,0 +1,166 @@
+import asyncio
+import time
+import httpx
+import pytest
+from app.utils.llm_gateway import LLMGateway
+
+
+class EchoRunnable:
+    """Stands in for a bound chat model: answers with its input."""
+
+    def __init__(self):
+        self.calls = 0
+        self.running = 0
+        self.max_running = 0
+
+    async def ainvoke(self, input):
+        self.calls += 1
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            self.running -= 1
+        return {"answer": input}
+
+    async def astream(self, input):
+        yield {"answer": input}
+
+
+class RateLimitError(Exception):
+    """Named like the provider SDKs' rate-limit errors."""
+
+    def __init__(self, retry_after):
+        super().__init__("rate limited")
+        self.response = httpx.Response(429, headers={"retry-after": str(retry_after)})
+
+
+class FlakyRunnable(EchoRunnable):
+    """Rate limited on its first few calls, then answers."""
+
+    def __init__(self, failures, error=None):
+        super().__init__()
+        self.failures = failures
+        self.error = error or RateLimitError(0.01)
+
+    async def ainvoke(self, input):
+        if self.failures:
+            self.failures -= 1
+            self.calls += 1
+            raise self.error
+        return await super().ainvoke(input)
+
+
+def make_gateway(max_concurrency=4, max_retries=2):
+    return LLMGateway(max_concurrency=max_concurrency, max_retries=max_retries, base_delay=0.01, max_delay=0.01)
+
+
+async def first_chunk(gateway: LLMGateway, input):
+    async for chunk in gateway.astream(EchoRunnable(), input):
+        return chunk
+
+
+def test_cancelling_a_call_during_the_rate_limit_cooldown_frees_its_slot():
+    gateway = LLMGateway(max_concurrency=1, max_retries=0, base_delay=0.01, max_delay=0.01)
+
+    async def run():
+        gateway._cooldown_until = time.monotonic() + 60
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(first_chunk(gateway, "question"), 0.05)
+
+        gateway._cooldown_until = 0.0
+        return await asyncio.wait_for(first_chunk(gateway, "question"), 1)
+
+    assert asyncio.run(run()) == {"answer": "question"}
+    assert gateway.stats()["in_flight"] == 0
+    assert gateway.stats()["waiting"] == 0
+
+
+def test_identical_concurrent_calls_share_one_upstream_call():
+    gateway, runnable = make_gateway(), EchoRunnable()
+
+    async def run():
+        return await asyncio.gather(*(gateway.ainvoke(runnable, {"q": "same"}) for _ in range(5)))
+
+    results = asyncio.run(run())
+
+    assert runnable.calls == 1
+    assert results == [{"answer": {"q": "same"}}] * 5
+    # Followers get their own copy to mutate
+    assert len({id(result) for result in results}) == 5
+    assert gateway.stats()["coalesced"] == 4
+
+
+def test_different_inputs_and_later_calls_are_not_coalesced():
+    gateway, runnable = make_gateway(), EchoRunnable()
+
+    async def run():
+        await asyncio.gather(gateway.ainvoke(runnable, "a"), gateway.ainvoke(runnable, "b"))
+        await gateway.ainvoke(runnable, "a")
+
+    asyncio.run(run())
+
+    assert runnable.calls == 3
+    assert gateway.stats()["coalesced"] == 0
+
+
+def test_a_cancelled_caller_does_not_cancel_the_shared_call():
+    gateway, runnable = make_gateway(), EchoRunnable()
+
+    async def run():
+        leader = asyncio.ensure_future(gateway.ainvoke(runnable, "q"))
+        follower = asyncio.ensure_future(gateway.ainvoke(runnable, "q"))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(run()) == {"answer": "q"}
+    assert runnable.calls == 1
+
+
+def test_calls_beyond_the_concurrency_limit_wait_for_a_slot():
+    gateway, runnable = make_gateway(max_concurrency=2), EchoRunnable()
+
+    async def run():
+        await asyncio.gather(*(gateway.ainvoke(runnable, i) for i in range(6)))
+
+    asyncio.run(run())
+
+    stats = gateway.stats()
+    assert runnable.calls == 6
+    assert runnable.max_running == 2
+    assert stats["in_flight"] == 0
+    assert stats["queue_wait_max_seconds"] > 0
+
+
+def test_rate_limited_calls_are_retried_after_the_requested_delay():
+    gateway, runnable = make_gateway(), FlakyRunnable(failures=2)
+
+    started = time.monotonic()
+    assert asyncio.run(gateway.ainvoke(runnable, "q")) == {"answer": "q"}
+
+    stats = gateway.stats()
+    assert time.monotonic() - started >= 0.02
+    assert runnable.calls == 3
+    assert stats["retries"] == 2
+    assert stats["rate_limited"] == 2
+
+
+def test_rate_limits_beyond_max_retries_are_raised():
+    gateway, runnable = make_gateway(max_retries=1), FlakyRunnable(failures=5)
+
+    with pytest.raises(RateLimitError):
+        asyncio.run(gateway.ainvoke(runnable, "q"))
+
+    assert runnable.calls == 2
+    assert gateway.stats()["in_flight"] == 0
+
+
+def test_other_errors_are_not_retried():
+    gateway, runnable = make_gateway(), FlakyRunnable(failures=1, error=ValueError("bad request"))
+
+    with pytest.raises(ValueError):
+        asyncio.run(gateway.ainvoke(runnable, "q"))
+
+    assert runnable.calls == 1
+    assert gateway.stats()["retries"] == 0
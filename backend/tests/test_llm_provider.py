@@ -0,0 +1,27 @@
+from langchain_experimental.tools import PythonAstREPLTool
+from app.utils.llm_provider import FakeChatModel
+
+SYSTEM_MESSAGE = (
+    "You are a data analyst. Examples of questions: "
+    "'What is the average salary by department?', 'What is the correlation between age and salary?'"
+)
+
+RESPONSES = [
+    {"tool": "python_repl_ast", "match": "average salary by department",
+     "args": {"query": "df.groupby('Department')['Salary'].mean()"}},
+    {"tool": "python_repl_ast", "match": "how many rows", "args": {"query": "len(df)"}},
+    {"tool": "python_repl_ast", "args": {"query": "df.head()"}},
+]
+
+
+def replayed_code(question: str) -> str:
+    tool = PythonAstREPLTool()
+    llm = FakeChatModel(responses=RESPONSES).bind_tools([tool], tool_choice=tool.name)
+    response = llm.invoke(f"{SYSTEM_MESSAGE}\n\nUser question: {question}")
+    return response.tool_calls[0]["args"]["query"]
+
+
+def test_recordings_match_the_question_not_the_system_prompt():
+    assert replayed_code("What is the average salary by department?") == "df.groupby('Department')['Salary'].mean()"
+    assert replayed_code("How many rows please") == "len(df)"
+    assert replayed_code("Show me some data") == "df.head()"
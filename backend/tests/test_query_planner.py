@@ -0,0 +1,81 @@
+import pandas as pd
+import pytest
+from app.utils.query_planner import PlanNotApplicable, query_planner
+
+
+@pytest.fixture
+def sales():
+    return pd.DataFrame({
+        "product_name": ["Apple", "Banana", "Cherry", "Apple"],
+        "category": ["fruit", "fruit", "berry", "fruit"],
+        "unit_price": [1.0, 0.5, 3.0, 2.0],
+        "quantity": [10, 20, 5, 30],
+    })
+
+
+def answer(query, df):
+    plan = query_planner.plan(query, df)
+    assert plan is not None, query
+    result, usage = query_planner.execute(plan, df)
+    assert set(usage) == {"wall_seconds", "cpu_seconds", "peak_rss_increase_bytes"}
+    return plan, result
+
+
+@pytest.mark.parametrize("query,template", [
+    ("What is the average unit price by category?", "group_aggregate"),
+    ("total quantity per category", "group_aggregate"),
+    ("How many products in each category?", "value_counts"),
+    ("Show me the value counts of category", "value_counts"),
+    ("What is the correlation between unit price and quantity?", "correlation"),
+    ("How many unique categories", "unique_count"),
+    ("number of distinct categories", "unique_count"),
+    ("What's the maximum quantity in the dataset?", "aggregate"),
+    ("How many rows are there?", "row_count"),
+    ("unit price of banana", "lookup"),
+])
+def test_questions_match_their_templates(sales, query, template):
+    plan = query_planner.plan(query, sales)
+
+    assert (plan.template if plan else None) == template
+
+
+def test_group_aggregate_matches_pandas(sales):
+    plan, result = answer("average unit price by category", sales)
+
+    pd.testing.assert_series_equal(result, sales.groupby("category")["unit_price"].mean())
+    assert plan.code == "df.groupby('category', observed=True)['unit_price'].mean()"
+
+
+def test_aggregate_and_counts_match_pandas(sales):
+    assert answer("total quantity", sales)[1] == 65
+    assert answer("median unit price", sales)[1] == 1.5
+    assert answer("how many rows", sales)[1] == 4
+    assert answer("number of unique product names", sales)[1] == 3
+    assert answer("breakdown by category", sales)[1].to_dict() == {"fruit": 3, "berry": 1}
+    assert answer("correlation of unit price with quantity", sales)[1] == pytest.approx(
+        sales["unit_price"].corr(sales["quantity"])
+    )
+
+
+def test_lookup_finds_the_row_by_name(sales):
+    plan, result = answer("What is the quantity of cherry?", sales)
+
+    assert result == 5
+    assert plan.code == "find_rows(df, 'product_name', 'cherry')['quantity'].iloc[0]"
+
+
+def test_lookup_of_an_unknown_name_is_not_applicable(sales):
+    plan = query_planner.plan("quantity of durian", sales)
+
+    with pytest.raises(PlanNotApplicable):
+        query_planner.execute(plan, sales)
+
+
+@pytest.mark.parametrize("query", [
+    "average category",
+    "average quantity by quantity",
+    "correlation between category and quantity",
+    "Which fruit would sell best next summer?",
+])
+def test_questions_templates_cannot_answer_are_left_to_the_llm(sales, query):
+    assert query_planner.plan(query, sales) is None
@@ -0,0 +1,143 @@
+import json
+import os
+import time
+import pandas as pd
+import pyarrow as pa
+import pytest
+from fastapi import HTTPException
+from app.utils.result_store import ResultStore, choose_encoding, compress, encode_arrow, encode_json
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultStore(str(tmp_path / "results"), max_bytes=10_000_000, ttl_seconds=60)
+
+
+def page_all(store, result_id, limit):
+    cursor, pages = 0, []
+    while cursor is not None:
+        page, total, next_cursor = store.page(result_id, cursor, limit)
+        pages.append(page)
+        cursor = next_cursor
+    return pages, total
+
+
+def test_pages_cover_every_row_once_in_order(store):
+    stored = store.put(pd.DataFrame({"n": range(25), "label": [f"row {i}" for i in range(25)]}))
+
+    pages, total = page_all(store, stored.result_id, 10)
+
+    assert (stored.rows, stored.columns, total) == (25, ["n", "label"], 25)
+    assert [page.num_rows for page in pages] == [10, 10, 5]
+    assert pa.concat_tables(pages).column("n").to_pylist() == list(range(25))
+
+
+def test_a_page_ending_on_the_last_row_has_no_next_cursor(store):
+    stored = store.put(pd.DataFrame({"n": range(20)}))
+
+    assert store.page(stored.result_id, 10, 10)[2] is None
+    assert store.page(stored.result_id, 20, 10)[0].num_rows == 0
+
+    with pytest.raises(HTTPException) as error:
+        store.page(stored.result_id, 21, 10)
+    assert error.value.status_code == 400
+
+
+def test_series_and_grouped_results_keep_their_index_as_columns(store):
+    df = pd.DataFrame({"city": ["a", "b", "a"], "sales": [1, 2, 3]})
+
+    grouped = store.put(df.groupby("city")["sales"].sum())
+    counts = store.put(df["city"].value_counts())
+    table = store.page(grouped.result_id, 0, 10)[0]
+
+    assert grouped.columns == ["city", "sales"]
+    assert table.to_pydict() == {"city": ["a", "b"], "sales": [4, 2]}
+    assert counts.columns == ["city", "count"]
+    assert store.put(df).columns == ["city", "sales"]
+
+
+def test_duplicate_and_mixed_type_columns_are_stored(store):
+    df = pd.DataFrame([[1, "x"], [2, 3]], columns=["a", "a"])
+
+    stored = store.put(df)
+
+    assert stored.columns == ["a", "a_1"]
+    assert store.page(stored.result_id, 0, 10)[0].column("a_1").to_pylist() == ["x", "3"]
+
+
+def test_other_results_are_not_stored(store):
+    assert store.put(42) is None
+    assert store.put("text") is None
+    assert store.get("not a result id") is None
+    assert store.get("0" * 32) is None
+
+
+def test_expired_results_are_gone(store):
+    stored = store.put(pd.DataFrame({"n": [1]}))
+    path = store._path(stored.result_id)
+    os.utime(path, (time.time() - 120, time.time() - 120))
+
+    assert store.get(stored.result_id) is None
+    assert not os.path.exists(path)
+    with pytest.raises(HTTPException) as error:
+        store.page(stored.result_id, 0, 10)
+    assert error.value.status_code == 404
+
+
+def test_least_recently_read_results_are_evicted_over_max_bytes(store):
+    frame = pd.DataFrame({"n": range(1000)})
+    first = store.put(frame)
+    size = os.path.getsize(store._path(first.result_id))
+    store.max_bytes = size * 2
+    second = store.put(frame)
+    store.get(first.result_id)
+
+    third = store.put(frame)
+
+    assert store.get(second.result_id) is None
+    assert store.get(first.result_id) is not None
+    assert store.get(third.result_id) is not None
+    assert store.stats()["evictions"] == 1
+    assert store.stats()["stored_bytes"] == size * 2
+
+
+def test_results_larger_than_the_store_are_rejected(store):
+    store.max_bytes = 10
+
+    assert store.put(pd.DataFrame({"n": range(100)})) is None
+    assert store.stats()["rejected"] == 1
+
+
+def test_json_pages_are_typed_columns_with_nan_as_null(store):
+    stored = store.put(pd.DataFrame({"x": [1.5, float("nan")], "name": ["a", None]}))
+    page, total, next_cursor = store.page(stored.result_id, 0, 10)
+
+    payload = json.loads(encode_json(page, stored.result_id, total, 0, next_cursor))
+
+    assert payload["total_rows"] == 2
+    assert payload["next_cursor"] is None
+    assert payload["columns"] == [
+        {"name": "x", "type": "double", "values": [1.5, None]},
+        {"name": "name", "type": "string", "values": ["a", None]},
+    ]
+
+
+def test_arrow_pages_round_trip(store):
+    stored = store.put(pd.DataFrame({"n": range(5)}))
+    page = store.page(stored.result_id, 2, 2)[0]
+
+    assert pa.ipc.open_stream(encode_arrow(page)).read_all().column("n").to_pylist() == [2, 3]
+
+
+def test_compression_follows_the_request_then_accept_encoding(monkeypatch):
+    monkeypatch.setattr("app.utils.result_store.zstandard", None)
+
+    assert choose_encoding("gzip", "") == "gzip"
+    assert choose_encoding("none", "gzip") is None
+    assert choose_encoding(None, "br, gzip;q=0.5") == "gzip"
+    assert choose_encoding(None, "zstd") is None
+    with pytest.raises(HTTPException):
+        choose_encoding("zstd", "")
+
+    assert compress(b"small", "gzip") == (b"small", None)
+    assert compress(b"x" * 100_000, "gzip")[1] == "gzip"
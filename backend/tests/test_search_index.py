@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.utils.code_sandbox import CodeSandbox
+from app.utils.csv_handler import CSVHandler
+from app.utils.search_index import ColumnSearchIndex, SearchIndexes, search_indexes
+
+NAMES = ["Ada Lovelace", "Alan Turing", "Grace Hopper", "Edsger Dijkstra", None, "Barbara Liskov"]
+
+
+@pytest.fixture
+def people(tmp_path, monkeypatch):
+    """A stored file whose name column is long enough to be indexed."""
+    monkeypatch.setattr(search_indexes, "min_rows", 10)
+    monkeypatch.setenv("SEARCH_INDEX_MIN_ROWS", "10")
+    path = tmp_path / "people.csv"
+    path.write_text("Name,Age\n" + "\n".join(f"{NAMES[i % 5] or ''},{20 + i}" for i in range(50)) + "\n")
+    return str(path)
+
+
+def test_index_lookups_match_pandas():
+    series = pd.Series(NAMES * 4, dtype=object)
+    index = ColumnSearchIndex(series)
+
+    assert list(index.contains("ing")) == list(np.flatnonzero(series.str.contains("ing", case=False, na=False)))
+    assert list(index.contains("a")) == list(np.flatnonzero(series.str.contains("a", case=False, na=False)))
+    assert list(index.equal("Grace Hopper")) == list(np.flatnonzero(series == "Grace Hopper"))
+    assert list(index.contains("nobody")) == []
+
+
+def test_index_rebuilt_from_its_arrays_answers_the_same():
+    series = pd.Series(NAMES * 4, dtype=object)
+    index = ColumnSearchIndex(series)
+
+    restored = ColumnSearchIndex.from_arrays(index.to_arrays())
+
+    for needle in ("ing", "a", "HOPPER", "x"):
+        assert list(restored.contains(needle)) == list(index.contains(needle))
+    assert list(restored.equal("Alan Turing")) == list(index.equal("Alan Turing"))
+    assert restored.nbytes == index.nbytes
+
+
+def test_lookups_build_an_index_the_second_time_a_column_is_searched():
+    indexes = SearchIndexes(max_bytes=1024 * 1024, min_rows=10)
+    df = pd.DataFrame({"Name": NAMES * 4})
+
+    first = indexes.find_rows(df, "Name", "turing")
+    second = indexes.find_rows(df.copy(deep=False), "Name", "turing")
+
+    assert first.index.tolist() == second.index.tolist() == [1, 7, 13, 19]
+    assert indexes.stats()["scans"] == 1
+    assert indexes.stats()["builds"] == 1
+    pd.testing.assert_frame_equal(indexes.match_rows(df, "Name", "Ada Lovelace"), df[df["Name"] == "Ada Lovelace"])
+
+
+def test_stored_indexes_are_loaded_for_the_same_content_only(people):
+    df = CSVHandler.read_csv(people)
+    assert CSVHandler.write_search_index(people, df) == 1
+
+    # The file loaded again, as another process would, gets the stored index rather than a new one
+    reloaded = pd.read_csv(people)
+    assert CSVHandler.read_search_index(people, reloaded) == 1
+    builds = search_indexes.stats()["builds"]
+    assert len(search_indexes.find_rows(reloaded, "Name", "hopper")) == 10
+    assert search_indexes.stats()["builds"] == builds
+
+    index_path = CSVHandler.get_sidecar_path(people, CSVHandler.SEARCH_INDEX_SUFFIX)
+    assert search_indexes.load(pd.read_csv(people), index_path, "another version") == 0
+
+
+def test_sandbox_workers_load_the_stored_index_instead_of_building_it(people):
+    df = CSVHandler.read_csv(people)
+    CSVHandler.write_search_index(people, df)
+    sandbox = CodeSandbox(1, 60, 1024 * 1024 * 1024)
+    code = (
+        "matches = find_rows(df, 'Name', 'grace')\n"
+        "stats = __import__('app.utils.search_index', fromlist=['search_indexes']).search_indexes.stats()\n"
+        "(len(matches), stats['builds'], stats['indexed_lookups'])"
+    )
+    try:
+        result, _ = sandbox.execute(code, df, people)
+    finally:
+        sandbox.shutdown()
+
+    assert result == (10, 0, 1)
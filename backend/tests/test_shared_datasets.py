@@ -0,0 +1,98 @@
+import gc
+import numpy as np
+import pandas as pd
+import pytest
+from app.utils.code_sandbox import CodeSandbox
+from app.utils.csv_handler import CSVHandler
+from app.utils.shared_datasets import SharedDatasetStore, shared_datasets
+
+
+def attachments(store: SharedDatasetStore):
+    return store._conn.execute("SELECT key FROM attachments").fetchall()
+
+
+def test_copies_keep_the_dataset_attached_after_the_frame_is_gone(tmp_path):
+    store = SharedDatasetStore(str(tmp_path), None)
+    assert store.publish("key", pd.DataFrame({"a": np.arange(1000)}))
+
+    frame = store.attach("key")
+    copied = store.copy(frame)
+    del frame
+    gc.collect()
+    assert attachments(store) == [("key",)]
+
+    del copied
+    gc.collect()
+    assert attachments(store) == []
+
+
+def test_publish_keeps_the_frame_private_when_the_directory_is_full(tmp_path, monkeypatch):
+    store = SharedDatasetStore(str(tmp_path), None)
+    monkeypatch.setattr(store, "_free_bytes", lambda: 0)
+
+    assert not store.publish("key", pd.DataFrame({"a": np.arange(1000)}))
+    assert store.attach("key") is None
+    assert store.stats()["rejected"] == 1
+
+
+def mutate(df: pd.DataFrame) -> None:
+    """In-place writes generated pandas code commonly makes."""
+    df.loc[df.Age > 30, "Age"] = 0
+    df["Score"] *= 2
+    df.iloc[0, 0] = 5
+
+
+@pytest.fixture
+def people(tmp_path):
+    path = tmp_path / "people.csv"
+    path.write_text("Age,Score,Name\n" + "\n".join(f"{20 + i % 30},{i}.5,P{i}" for i in range(200)) + "\n")
+    return str(path)
+
+
+@pytest.fixture
+def shared(monkeypatch):
+    """Share loaded frames through the scratch shared memory directory."""
+    monkeypatch.setattr(shared_datasets, "enabled", True)
+    return shared_datasets
+
+
+def test_copies_of_attached_frames_are_writable_and_private(tmp_path):
+    store = SharedDatasetStore(str(tmp_path), None)
+    original = pd.DataFrame({"Age": np.arange(100), "Score": np.arange(100.0), "Name": [f"P{i}" for i in range(100)]})
+    assert store.publish("key", original)
+    frame = store.attach("key")
+
+    copied = store.copy(frame)
+    mutate(copied)
+
+    assert copied["Age"].iloc[0] == 5 and copied["Age"].iloc[50] == 0
+    assert copied["Score"].iloc[10] == 20.0
+    pd.testing.assert_frame_equal(frame, original)
+    pd.testing.assert_frame_equal(store.attach("key"), original)
+
+
+def test_read_csv_returns_a_writable_frame_over_shared_memory(shared, people):
+    CSVHandler.optimize_dtypes(people, CSVHandler.read_csv(people))
+
+    df = CSVHandler.read_csv(people)
+    assert shared._frames.get(id(df))
+    mutate(df)
+
+    assert df["Score"].iloc[1] == 3.0
+    assert CSVHandler.read_csv(people)["Score"].iloc[1] == 1.5
+
+
+def test_sandboxed_code_can_write_to_a_frame_attached_from_shared_memory(shared, people):
+    df = CSVHandler.optimize_dtypes(people, CSVHandler.read_csv(people)).df
+    sandbox = CodeSandbox(1, 60, 1024 * 1024 * 1024)
+    code = "df.loc[df.Age > 30, 'Age'] = 0\ndf['Score'] *= 2\ndf.iloc[0, 0] = 5\nfloat(df['Score'].sum())"
+    try:
+        result, _ = sandbox.execute(code, df, people)
+        again, _ = sandbox.execute(code, df, people)
+        worker_pid = sandbox._workers[0].process.pid
+        attached_pids = {pid for (pid,) in shared._conn.execute("SELECT pid FROM attachments").fetchall()}
+    finally:
+        sandbox.shutdown()
+
+    assert worker_pid in attached_pids
+    assert result == again == 2 * sum(i + 0.5 for i in range(200))